@@ -13,6 +13,14 @@ def make_celery(app):
         broker=app.config.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
     )
     celery.conf.update(app.config)
+    # Size-class queues drained shortest first; see app/utils/scheduler.py
+    from app.utils.scheduler import celery_queue_config
+    celery.conf.update(celery_queue_config())
+    # Broker messages use the compact binary codec when msgpack is installed
+    from app.utils.artifacts import celery_serializer_config
+    celery.conf.update(celery_serializer_config())
+    # Each worker process gets its share of the cores; see app/utils/worker_runtime.py
+    from app.utils import worker_runtime  # noqa: F401  (registers the worker signals)
     print("CELERY_BROKER_URL:", app.config.get("CELERY_BROKER_URL"))
     print("CELERY_RESULT_BACKEND:", app.config.get("CELERY_RESULT_BACKEND"))
     TaskBase = celery.Task
@@ -30,6 +38,8 @@ def create_app():
     app.config['CELERY_RESULT_BACKEND'] = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     from . import routes
+    # Uploads to /process are streamed to disk so processing can start before they finish
+    app.request_class = routes.UploadRequest
     app.register_blueprint(routes.bp)
     app.celery = make_celery(app)
     return app
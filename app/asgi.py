@@ -0,0 +1,352 @@
+"""
+Asynchronous serving mode.
+Under the synchronous Flask app every upload and every /status poll holds a worker
+slot for its whole duration. Here /process, /status and /frames are served by a Quart
+app on one event loop instead: request bodies are streamed through an incremental
+multipart parser and written to disk off the loop, task state is read with the asyncio
+Redis client, and frame files are sent asynchronously. Routes and responses are the
+same as the Flask app's, whose helpers they share; every other route is still served
+by the Flask app, through an ASGI adapter.
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+
+import asyncio
+import hashlib
+import os
+
+from quart import Quart, jsonify, request, send_file
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from app.utils.result_store import PAYLOAD_FIELDS, TASK_KEY_PREFIX, decode_task_fields
+from app.utils.transcription import REDIS_URL
+
+# Connections shared by every request of a server process; requests beyond this wait
+# for a free connection instead of failing
+REDIS_MAX_CONNECTIONS = int(os.environ.get('ASYNC_REDIS_MAX_CONNECTIONS', 64))
+# Upload data is collected into writes of this size before leaving the event loop
+WRITE_BUFFER_BYTES = 1024 * 1024
+# Routes served by the async app; everything else goes to the Flask app
+ASYNC_PATHS = ('/process',)
+ASYNC_PREFIXES = ('/status/', '/frames/')
+
+PAYLOAD_NAMES = {name.encode('utf-8') for name in PAYLOAD_FIELDS}
+
+
+class UploadSink:
+    """
+    Destination of the 'video' part of a streamed /process body.
+    Writes are batched and run in a thread so disk I/O, content hashing and the
+    early-processing submission in StreamingUpload never block the event loop.
+    """
+
+    def __init__(self, filepath, tenant, options):
+        from app.routes import submit_early
+        from app.utils.early_scenes import EARLY_SCENES_ENABLED, StreamingUpload
+        self.filepath = filepath
+        self.upload = None
+        if EARLY_SCENES_ENABLED:
+            self.upload = StreamingUpload(filepath, on_faststart=lambda upload: submit_early(upload, tenant, options))
+            self._file = self.upload
+            self.digest = self.upload.digest
+        else:
+            self._file = open(filepath, 'wb')
+            self.digest = hashlib.sha256()
+        self._buffer = bytearray()
+
+    def _write(self, data):
+        self._file.write(data)
+        if self.upload is None:
+            self.digest.update(data)
+
+    async def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER_BYTES:
+            await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._write, data)
+
+    async def finish(self):
+        """
+        Write the last data once the part is complete. A StreamingUpload is left open
+        for app.routes.complete_upload to hand off.
+        """
+        await self.flush()
+        if self.upload is None:
+            await asyncio.to_thread(self._file.close)
+
+    async def abort(self):
+        """
+        Discard an upload that was not handed off, cancelling any task it started early.
+        Does nothing once it has been handed off.
+        """
+        from app.routes import abort_upload
+        if self.upload is not None:
+            if not self.upload.closed:
+                await asyncio.to_thread(abort_upload, self.upload)
+        elif not self._file.closed:
+            await asyncio.to_thread(self._file.close)
+
+
+async def parse_upload(upload_folder, tenant_headers, remote_addr):
+    """
+    Stream a multipart /process body: form fields are collected, and the 'video' file
+    is written to the upload folder as its bytes arrive.
+
+    Returns:
+        Tuple of (form MultiDict, UploadSink or None, the video part's filename or None)
+    """
+    from app.routes import allowed_file, client_tenant, transcription_options, unique_upload_path
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        # A URL-encoded form (a YouTube URL) is small enough to parse whole
+        return await request.form, None, None
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    form = MultiDict()
+    sink = None
+    filename = None
+    current = None
+    event = None
+    field_data = bytearray()
+    complete = False
+
+    async def chunks():
+        async for chunk in request.body:
+            yield chunk
+        # End of the body: the decoder now reports a truncated one as an error
+        yield None
+
+    try:
+        async for chunk in chunks():
+            decoder.receive_data(chunk)
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, Field):
+                    current, field_data = event, bytearray()
+                elif isinstance(event, File):
+                    current = event
+                    if event.name == 'video' and sink is None:
+                        filename = event.filename or ''
+                        if filename and allowed_file(filename):
+                            # Fields sent before the file count for the tenant, like in the Flask
+                            # app, and set the options of a submission started mid-upload
+                            tenant = client_tenant(tenant_headers, form, remote_addr)
+                            path = unique_upload_path(upload_folder, filename)
+                            sink = await asyncio.to_thread(UploadSink, path, tenant, transcription_options(form))
+                elif isinstance(event, Data):
+                    if isinstance(current, Field):
+                        field_data += event.data
+                        if not event.more_data:
+                            form.add(current.name, field_data.decode('utf-8', 'replace'))
+                    elif sink is not None and current.name == 'video':
+                        await sink.write(event.data)
+                event = decoder.next_event()
+        if sink is not None:
+            await sink.finish()
+            complete = True
+    finally:
+        if sink is not None and not complete:
+            # The client aborted mid-upload; this also clears the in-progress marker
+            await sink.abort()
+    return form, sink, filename
+
+
+def create_async_app(flask_app):
+    """
+    Build the Quart app serving /process, /status and /frames for a Flask app.
+    """
+    import redis.asyncio as aioredis
+    from app.utils import submissions
+
+    app = Quart(__name__)
+    app.config.update(
+        UPLOAD_FOLDER=flask_app.config['UPLOAD_FOLDER'],
+        # Like the Flask app: no size limit, and slow uploads are not cut off
+        MAX_CONTENT_LENGTH=None,
+        BODY_TIMEOUT=None,
+    )
+
+    @app.before_serving
+    async def connect_redis():
+        pool = aioredis.BlockingConnectionPool.from_url(
+            os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL), max_connections=REDIS_MAX_CONNECTIONS
+        )
+        app.redis = aioredis.Redis(connection_pool=pool)
+
+    @app.after_serving
+    async def close_redis():
+        await app.redis.aclose()
+
+    async def submit(source, is_youtube, tenant, options, digest=None):
+        # Deduplicating and scheduling probe the media and talk to Redis and the broker
+        # synchronously
+        from app.routes import submit_source
+        return await asyncio.to_thread(submit_source, source, is_youtube, tenant, options, digest)
+
+    @app.route('/process', methods=['POST'])
+    async def process_video():
+        from app.routes import (InvalidOptionsError, accepted_body, client_tenant, complete_upload, discard_upload,
+                                rate_limit_error, transcription_options)
+        # Checked before the body is read, so a rejected upload is not stored
+        retry_after = await asyncio.to_thread(submissions.check_rate_limit,
+                                              client_tenant(request.headers, None, request.remote_addr))
+        if retry_after:
+            body, headers = rate_limit_error(retry_after)
+            return jsonify(body), 429, headers
+        try:
+            form, sink, filename = await parse_upload(app.config['UPLOAD_FOLDER'], request.headers,
+                                                      request.remote_addr)
+        except InvalidOptionsError as e:
+            # Raised by fields sent ahead of the file, before any of it was stored
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            print(f"Error receiving upload: {str(e)}")
+            return jsonify({'error': f'Upload failed: {str(e)}'}), 400
+        tenant = client_tenant(request.headers, form, request.remote_addr)
+
+        if filename is None and 'youtube_url' not in form:
+            return jsonify({'error': 'No video file or YouTube URL provided'}), 400
+        try:
+            options = transcription_options(form)
+        except InvalidOptionsError as e:
+            if sink is not None:
+                # Fields sent after the file; it is not processed
+                await sink.abort()
+                await asyncio.to_thread(discard_upload, sink.filepath)
+            return jsonify({'error': str(e)}), 400
+
+        if filename is not None:
+            if sink is None:
+                return jsonify({'error': 'Invalid file type'}), 400
+            try:
+                if sink.upload is not None:
+                    task_id, duplicate = await asyncio.to_thread(complete_upload, sink.upload, tenant, options)
+                else:
+                    task_id, duplicate = await submit(sink.filepath, False, tenant, options, sink.digest.hexdigest())
+            finally:
+                await sink.abort()
+            return jsonify(accepted_body('Video upload received. Processing...', task_id, duplicate)), 202
+
+        task_id, duplicate = await submit(form['youtube_url'], True, tenant, options)
+        return jsonify(accepted_body('YouTube URL received. Processing...', task_id, duplicate)), 202
+
+    @app.route('/status/<task_id>')
+    async def get_status(task_id):
+        from app.routes import build_status, fallback_status
+        try:
+            response = build_status(task_id, 'none')
+            try:
+                key = f'{TASK_KEY_PREFIX}{task_id}'
+                # One round trip per poll; HGETALL fails harmlessly on a string key
+                pipe = app.redis.pipeline(transaction=False)
+                pipe.type(key)
+                pipe.hgetall(key)
+                key_type, fields = await pipe.execute(raise_on_error=False)
+                key_type = key_type.decode('utf-8')
+
+                if key_type == 'hash':
+                    if PAYLOAD_NAMES & fields.keys():
+                        # Finished results may be compressed or spilled to disk
+                        progress_data = await asyncio.to_thread(decode_task_fields, fields)
+                    else:
+                        progress_data = decode_task_fields(fields)
+                    response = build_status(task_id, key_type, progress_data=progress_data)
+                elif key_type == 'string':
+                    response = build_status(task_id, key_type, result_str=(await app.redis.get(key)).decode('utf-8'))
+                else:
+                    if key_type != 'none':
+                        print(f"Redis key {key} is of type {key_type}, expected hash or string")
+                    # As the Flask route does, fall back to what AsyncResult reports
+                    status = await asyncio.to_thread(fallback_status, task_id)
+                    if status:
+                        response['status'] = status
+            except Exception as e:
+                print(f"Error accessing Redis: {str(e)}")
+            return jsonify(response)
+        except Exception as e:
+            import traceback
+            print(f"Error in get_status: {str(e)}")
+            print(traceback.format_exc())
+            return jsonify({'error': str(e), 'status': 'error', 'task_id': task_id}), 500
+
+    @app.route('/frames/<task_id>/<frame_index>')
+    async def get_frame(task_id, frame_index):
+        from app.routes import FRAME_CACHE_SECONDS, parse_frame_request, resolve_frame_image
+        from app.utils.frame_store import IMAGE_FORMATS, FullResolutionUnavailable
+        try:
+            variant, error = parse_frame_request(frame_index, request.args, request.headers)
+            if error:
+                return jsonify({'error': error[0]}), error[1]
+            frame_index, width, fmt, negotiated = variant
+
+            def resolve():
+                frame_path = resolve_frame_image(task_id, frame_index, width, fmt)
+                if not os.path.exists(frame_path):
+                    # The frames were garbage collected since the path was cached
+                    resolve_frame_image.cache_clear()
+                    frame_path = resolve_frame_image(task_id, frame_index, width, fmt)
+                return frame_path
+
+            # Thumbnails are encoded on first request
+            frame_path = await asyncio.to_thread(resolve)
+            response = await send_file(
+                frame_path,
+                mimetype=IMAGE_FORMATS[fmt][1],
+                conditional=True,
+                add_etags=True,
+                cache_timeout=FRAME_CACHE_SECONDS
+            )
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            if negotiated:
+                response.vary.add('Accept')
+            return response
+
+        except FullResolutionUnavailable as e:
+            return jsonify({'error': f'Full-resolution frame unavailable: {str(e)}; request a width with ?w='}), 410
+        except (FileNotFoundError, ValueError):
+            return jsonify({'error': 'No frames available for this task'}), 404
+        except IndexError:
+            return jsonify({'error': 'Invalid frame index'}), 404
+        except Exception as e:
+            import traceback
+            print(f"Error in get_frame: {str(e)}")
+            traceback.print_exc()
+            return jsonify({'error': f'Error retrieving frame: {str(e)}'}), 500
+
+    return app
+
+
+class AsyncFrontend:
+    """
+    ASGI application sending /process, /status and /frames (and server lifespan events)
+    to the async app, and every other request to the Flask app.
+    """
+
+    def __init__(self, async_app, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+        self.async_app = async_app
+        self.flask_app = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '')
+        if scope['type'] == 'lifespan' or path in ASYNC_PATHS or path.startswith(ASYNC_PREFIXES):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.flask_app(scope, receive, send)
+
+
+def create_asgi_app():
+    """
+    The ASGI entry point: the Flask app with its hot routes served asynchronously.
+    """
+    from app import create_app
+    flask_app = create_app()
+    return AsyncFrontend(create_async_app(flask_app), flask_app)
@@ -1,10 +1,17 @@
 
-from flask import Blueprint, render_template, request, jsonify, current_app, send_file
+from flask import Blueprint, Request, render_template, request, jsonify, current_app, send_file
 from werkzeug.utils import secure_filename
 import os
 import redis
 import json
-from app.utils.transcription import celery_transcribe
+import uuid
+from functools import lru_cache
+from app.utils.transcription import cancel_task, celery_transcribe
+from app.utils.batch import MAX_BATCH_ITEMS, celery_process_batch, create_batch, get_batch_status
+from app.utils import scheduler
+from app.utils.asr_policy import ALLOWED_MODEL_SIZES
+from app.utils.early_scenes import EARLY_SCENES_ENABLED, StreamingUpload
+from app.utils import submissions
 from celery.result import AsyncResult
 
 
@@ -15,42 +22,511 @@ ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'url'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def unique_upload_path(upload_folder, filename):
+    """
+    A path of its own in the upload folder for an uploaded file, so an upload never
+    overwrites a file with the same name that an earlier job is still reading.
+    """
+    return os.path.join(upload_folder, f"{uuid.uuid4().hex[:12]}_{secure_filename(filename)}")
+
+def discard_upload(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def client_tenant(headers, form, remote_addr):
+    """
+    Client a job is accounted to for fair-share scheduling: the X-Tenant-ID header, the
+    'tenant' form field, or the client address. form may be None while it is unparsed.
+    """
+    tenant = headers.get('X-Tenant-ID') or (form.get('tenant') if form is not None else None)
+    return tenant or remote_addr or 'anonymous'
+
+def request_tenant(use_form=True):
+    """
+    Tenant of the current request.
+    The form is not available while the request body is still being parsed (use_form=False).
+    """
+    return client_tenant(request.headers, request.form if use_form else None, request.remote_addr)
+
+def submit_early(upload, tenant, options):
+    """
+    Submit an upload for processing as soon as its faststart index has arrived, so the
+    worker can caption scenes from the received part while the rest is still uploading.
+    options are the transcription options of the form fields sent before the file;
+    complete_upload resubmits if the rest of the form changes them.
+    """
+    upload.options = options
+    upload.dedup_key = submissions.submission_key('upload-head', upload.head_digest(), options)
+    upload.task_id, upload.duplicate = submissions.single_flight(upload.dedup_key, lambda task_id: scheduler.submit(
+        celery_transcribe, [upload.path, False], [scheduler.probe_duration(upload.path)], tenant,
+        kwargs=options, task_id=task_id))
+    if not upload.duplicate:
+        print(f"Faststart upload {upload.path}: processing started before the transfer completed")
+
+def abandon_early(upload, message, aborted=False):
+    """
+    Give up the task an upload started early. Must run before the upload is closed, which
+    tells the waiting task that the transfer is over. An upload attached to an earlier
+    identical one just stops waiting for its task. The task of the first upload is left
+    running while identical uploads are attached to it, unless that upload was aborted
+    and the task would read a truncated file; they are then scheduled on their own copies
+    when they complete (see complete_upload).
+
+    Returns:
+        Whether the task was cancelled
+    """
+    task_id, upload.task_id = upload.task_id, None
+    if not task_id:
+        return False
+    if upload.duplicate:
+        submissions.detach(task_id)
+        return False
+    if not submissions.abandon(upload.dedup_key, task_id) and not aborted:
+        print(f"Faststart upload {upload.path}: left {task_id} running for identical uploads attached to it")
+        return False
+    cancel_task(task_id, message)
+    print(f"Faststart upload {upload.path}: cancelled {task_id}: {message}")
+    return True
+
+def abort_upload(upload):
+    """
+    Discard a streamed upload whose request ended before it was handed off, e.g. because
+    the client disconnected; the task it started early would see a truncated file.
+    """
+    abandon_early(upload, 'Upload aborted before it completed', aborted=True)
+    upload.close()
+    discard_upload(upload.path)
+
+def submit_source(source, is_youtube, tenant, options, digest=None):
+    """
+    Schedule a video for processing unless an identical submission is already queued,
+    running or finished, in which case its task is reused and an uploaded copy deleted.
+
+    Args:
+        source: Upload path or YouTube URL
+        is_youtube: Whether source is a YouTube URL
+        tenant: Client the job is accounted to
+        options: Transcription options from transcription_options
+        digest: SHA-256 hex digest of an upload's content (computed from source if omitted)
+
+    Returns:
+        Tuple of (task ID, whether it belongs to an earlier identical submission)
+    """
+    if is_youtube:
+        key = submissions.youtube_key(source, options)
+    else:
+        key = submissions.submission_key('upload', digest or submissions.file_digest(source), options)
+
+    def schedule(task_id):
+        # Probing is skipped for duplicates
+        return scheduler.submit(celery_transcribe, [source, is_youtube],
+                                [scheduler.probe_duration(source, is_youtube=is_youtube)], tenant,
+                                kwargs=options, task_id=task_id)
+    task_id, duplicate = submissions.single_flight(key, schedule)
+    if duplicate and not is_youtube:
+        # The earlier submission's job reads its own copy
+        discard_upload(source)
+    return task_id, duplicate
+
+def complete_upload(upload, tenant, options):
+    """
+    Hand off a fully received streamed upload: keep the task it started early, or submit it.
+    An upload attached to an earlier identical one early is submitted by its whole content,
+    and so shares that upload's task only once it has completed intact.
+
+    Args:
+        upload: StreamingUpload whose last byte has been written
+        tenant: Client the job is accounted to
+        options: Transcription options of the complete form
+
+    Returns:
+        Tuple of (task ID, whether it belongs to an earlier identical submission)
+    """
+    digest = upload.digest.hexdigest()
+    early_task, early_key = upload.task_id, submissions.submission_key('upload', digest, upload.options)
+    if upload.task_id and upload.duplicate:
+        abandon_early(upload, None)
+    elif upload.task_id and options != upload.options:
+        # Fields sent after the file changed the options the early task was started with
+        if not abandon_early(upload, 'Superseded by the options sent after the video'):
+            # Left running for the uploads attached to it, which find it by content
+            submissions.claim(early_key, early_task)
+            if early_key == submissions.submission_key('upload', digest, options):
+                # The options differ only in ways that do not change the work
+                upload.task_id = early_task
+    upload.close()
+    if upload.task_id:
+        submissions.claim(early_key, upload.task_id)
+        return upload.task_id, False
+    return submit_source(upload.path, False, tenant, options, digest)
+
+def accepted_body(message, task_id, duplicate=False):
+    """
+    Body of a 202 response to a submission; duplicate marks a reused earlier task.
+    """
+    body = {'message': message, 'task_id': task_id}
+    if duplicate:
+        body['duplicate'] = True
+    return body
+
+def rate_limit_error(retry_after):
+    """
+    Body and headers of the 429 response to a client over its submission rate limit.
+    """
+    return {'error': f'Too many submissions; retry in {retry_after} seconds'}, {'Retry-After': str(retry_after)}
+
+def accepted(message, task_id, duplicate=False):
+    return jsonify(accepted_body(message, task_id, duplicate)), 202
+
+def rate_limited(retry_after):
+    body, headers = rate_limit_error(retry_after)
+    return jsonify(body), 429, headers
+
+class UploadRequest(Request):
+    """
+    Request that streams /process video uploads straight into the upload folder
+    instead of a temporary file, starting processing early for faststart MP4s.
+    """
+    streamed_upload = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not EARLY_SCENES_ENABLED or self.path != '/process' or not filename or not allowed_file(filename):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        filepath = unique_upload_path(current_app.config['UPLOAD_FOLDER'], filename)
+        self.streamed_upload = StreamingUpload(
+            filepath, on_faststart=lambda upload: submit_early(upload, request_tenant(use_form=False), {}))
+        return self.streamed_upload
+
+    def close(self):
+        # An upload process_video did not complete was aborted mid-transfer or rejected;
+        # this also clears its in-progress marker
+        if self.streamed_upload is not None and not self.streamed_upload.closed:
+            abort_upload(self.streamed_upload)
+        super().close()
+
 @bp.route('/')
 def index():
     return render_template('index.html')
 
+class InvalidOptionsError(ValueError):
+    """Raised for transcription options a client may not ask for."""
+
+def transcription_options(form=None):
+    """
+    Optional per-job transcription settings: 'model_size' pins the Whisper model, and
+    'slo_seconds' is the latency target the decoding policy plans for.
+    Raises InvalidOptionsError for a model_size not in ALLOWED_MODEL_SIZES.
+    """
+    form = request.form if form is None else form
+    options = {}
+    if form.get('model_size'):
+        if form['model_size'] not in ALLOWED_MODEL_SIZES:
+            raise InvalidOptionsError(f"Unsupported model_size {form['model_size']!r}; "
+                                      f"choose one of {', '.join(ALLOWED_MODEL_SIZES)}")
+        options['model_size'] = form['model_size']
+    slo_seconds = form.get('slo_seconds', type=float)
+    if slo_seconds:
+        options['slo_seconds'] = slo_seconds
+    return options
+
 @bp.route('/process', methods=['POST'])
 def process_video():
     import traceback
+    # Checked before the body is read, so a rejected upload is not stored
+    retry_after = submissions.check_rate_limit(request_tenant(use_form=False))
+    if retry_after:
+        return rate_limited(retry_after)
     if 'video' not in request.files and 'youtube_url' not in request.form:
         return jsonify({'error': 'No video file or YouTube URL provided'}), 400
+    try:
+        options = transcription_options()
+    except InvalidOptionsError as e:
+        # A streamed upload is discarded when the request closes
+        return jsonify({'error': str(e)}), 400
 
     if 'video' in request.files:
         file = request.files['video']
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            upload = request.streamed_upload
+            if upload is not None:
+                # Already written to filepath (and hashed) while the body was parsed
+                task_id, duplicate = complete_upload(upload, request_tenant(), options)
+                return accepted('Video upload received. Processing...', task_id, duplicate)
+            filepath = unique_upload_path(current_app.config['UPLOAD_FOLDER'], file.filename)
             file.save(filepath)
-            task = celery_transcribe.apply_async(args=[filepath, False])
-            return jsonify({'message': 'Video upload received. Processing...', 'task_id': task.id}), 202
+            task_id, duplicate = submit_source(filepath, False, request_tenant(), options)
+            return accepted('Video upload received. Processing...', task_id, duplicate)
         else:
             return jsonify({'error': 'Invalid file type'}), 400
     elif 'youtube_url' in request.form:
         youtube_url = request.form['youtube_url']
-        task = celery_transcribe.apply_async(args=[youtube_url, True])
-        return jsonify({'message': 'YouTube URL received. Processing...', 'task_id': task.id}), 202
+        task_id, duplicate = submit_source(youtube_url, True, request_tenant(), options)
+        return accepted('YouTube URL received. Processing...', task_id, duplicate)
     return jsonify({'error': 'Invalid file type'}), 400
 
+def parse_manifest(data):
+    """
+    Parse a batch manifest: a JSON array of URLs (or objects with a "url" key),
+    or plain text with one URL per line.
+    """
+    text = data.decode('utf-8').strip()
+    if text.startswith('['):
+        entries = json.loads(text)
+        return [entry['url'] if isinstance(entry, dict) else str(entry) for entry in entries]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+@bp.route('/batch', methods=['POST'])
+def process_batch():
+    """
+    Submit several videos at once. Accepts any mix of video files ('videos'),
+    YouTube URLs ('youtube_urls', repeated or one per line) and a 'manifest' file of URLs.
+    A batch counts as one submission toward the client's rate limit.
+    """
+    retry_after = submissions.check_rate_limit(request_tenant(use_form=False))
+    if retry_after:
+        return rate_limited(retry_after)
+    try:
+        options = transcription_options()
+    except InvalidOptionsError as e:
+        return jsonify({'error': str(e)}), 400
+    sources = []
+    for file in request.files.getlist('videos'):
+        if not file or not allowed_file(file.filename):
+            return jsonify({'error': f'Invalid file type: {file.filename}'}), 400
+        sources.append({'file': file, 'is_youtube': False, 'name': secure_filename(file.filename)})
+
+    urls = [line.strip() for value in request.form.getlist('youtube_urls')
+            for line in value.splitlines() if line.strip()]
+    if 'manifest' in request.files:
+        try:
+            urls.extend(parse_manifest(request.files['manifest'].read()))
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            return jsonify({'error': f'Invalid manifest: {str(e)}'}), 400
+    sources.extend({'source': url, 'is_youtube': True, 'name': url} for url in urls)
+
+    if not sources:
+        return jsonify({'error': 'No video files or YouTube URLs provided'}), 400
+    if len(sources) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'A batch holds at most {MAX_BATCH_ITEMS} videos'}), 400
+
+    for source in sources:
+        file = source.pop('file', None)
+        if file is not None:
+            filepath = unique_upload_path(current_app.config['UPLOAD_FOLDER'], source['name'])
+            file.save(filepath)
+            source['source'] = filepath
+
+    batch_id, items = create_batch(sources)
+    scheduler.submit(celery_process_batch, [batch_id, items], scheduler.probe_durations(items), request_tenant(),
+                     kwargs=options)
+    return jsonify({
+        'message': f'Batch of {len(items)} videos received. Processing...',
+        'batch_id': batch_id,
+        'items': [{'task_id': item['task_id'], 'name': item['name']} for item in items]
+    }), 202
+
+@bp.route('/batch/<batch_id>')
+def get_batch(batch_id):
+    try:
+        status = get_batch_status(batch_id)
+        if status is None:
+            return jsonify({'error': 'Unknown batch', 'batch_id': batch_id}), 404
+        return jsonify(status)
+    except Exception as e:
+        print(f"Error in get_batch: {str(e)}")
+        return jsonify({'error': str(e), 'status': 'error', 'batch_id': batch_id}), 500
+
+@bp.route('/metrics/results')
+def get_result_metrics():
+    try:
+        from app.utils.result_store import memory_report
+        return jsonify(memory_report(redis.Redis.from_url(current_app.config['CELERY_RESULT_BACKEND'])))
+    except Exception as e:
+        print(f"Error in get_result_metrics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics/queues')
+def get_queue_metrics():
+    try:
+        return jsonify(scheduler.queue_metrics())
+    except Exception as e:
+        print(f"Error in get_queue_metrics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics/asr')
+def get_asr_metrics():
+    try:
+        from app.utils.asr_policy import policy_report
+        return jsonify(policy_report())
+    except Exception as e:
+        print(f"Error in get_asr_metrics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics/submissions')
+def get_submission_metrics():
+    try:
+        return jsonify(submissions.submission_report())
+    except Exception as e:
+        print(f"Error in get_submission_metrics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/transcripts/search')
+def search_transcripts():
+    """
+    Search the transcripts of every processed video.
+
+    Query parameters:
+        q: Words and "quoted phrases" that must all appear in a segment
+        group: 'video' to return one entry per video instead of one per segment
+        limit: Number of results (default 20, at most 100)
+        offset: Number of segments to skip, for paging
+    """
+    try:
+        from app.utils.transcript_index import TranscriptIndex
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Provide a query (q)'}), 400
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        index = TranscriptIndex()
+        if request.args.get('group') == 'video':
+            results = index.search_videos(query, limit)
+        else:
+            results = index.search(query, limit, max(0, request.args.get('offset', 0, type=int)))
+        return jsonify({'query': query, 'results': results})
+    except Exception as e:
+        print(f"Error in search_transcripts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/scenes/search')
+def search_scenes():
+    """
+    Find scenes across every processed video.
+
+    Query parameters:
+        q: Text matched against scene captions
+        like: '<task_id>/<frame_index>' of a scene whose keyframe results should resemble
+        k: Number of results (default 10, at most 100)
+    """
+    try:
+        from app.utils.scene_index import get_scene_index
+        k = max(1, min(request.args.get('k', 10, type=int), 100))
+        query = request.args.get('q', '').strip()
+        like = request.args.get('like', '').strip()
+        if like:
+            task_id, _, frame_index = like.rpartition('/')
+            try:
+                results = get_scene_index().search_similar(task_id, int(frame_index), k)
+            except (KeyError, ValueError):
+                return jsonify({'error': f'Scene not indexed: {like}'}), 404
+        elif query:
+            results = get_scene_index().search_text(query, k)
+        else:
+            return jsonify({'error': 'Provide a text query (q) or a scene (like)'}), 400
+        return jsonify({'query': query or None, 'like': like or None, 'results': results})
+    except Exception as e:
+        print(f"Error in search_scenes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def fallback_status(task_id):
+    """
+    Status of a task without a hash or string key in Redis, as Celery's AsyncResult
+    reports it. Shared by the Flask route and the async server; it blocks on the
+    result backend, so the async server runs it in a thread.
+
+    Returns:
+        The lowercased Celery state (e.g. 'pending'), or None if it could not be read
+    """
+    try:
+        return AsyncResult(task_id).status.lower()
+    except Exception as e:
+        print(f"Fallback to AsyncResult failed: {str(e)}")
+        return None
+
+def build_status(task_id, key_type, progress_data=None, result_str=None):
+    """
+    The /status response body for a task, from what Redis holds for it.
+    Shared by the Flask route and the async server (app/asgi.py), which fetch the data
+    with their own Redis clients.
+
+    Args:
+        task_id: The task ID
+        key_type: Redis type of the task key ('hash', 'string' or 'none')
+        progress_data: Decoded fields of the task hash, when key_type is 'hash'
+        result_str: Value of the task key, when key_type is 'string'
+
+    Returns:
+        The response dictionary ('pending' with no progress for any other key type)
+    """
+    # Initialize response with basic info
+    response = {
+        'task_id': task_id,
+        'status': 'pending',  # Default status
+        'progress': 0,
+        'status_msg': ''
+    }
+    
+    if key_type == 'hash':
+        if progress_data:
+            # Get progress if it exists
+            if 'progress' in progress_data:
+                response['progress'] = int(progress_data['progress'])
+            
+            # Get the estimated seconds remaining if it exists
+            if 'eta_seconds' in progress_data:
+                response['eta_seconds'] = int(progress_data['eta_seconds'])
+            
+            # Get status message if it exists
+            if 'status_msg' in progress_data:
+                response['status_msg'] = progress_data['status_msg']
+            
+            # Get status if it exists
+            if 'status' in progress_data:
+                response['status'] = progress_data['status']
+            
+            # Get the transcript if it exists ('result' in hashes written by older versions)
+            transcript = progress_data.get('transcript') or progress_data.get('result')
+            if transcript:
+                response['transcript'] = transcript
+                # If we have a result and progress is 100%, set status to success
+                if response['progress'] == 100:
+                    response['status'] = 'success'
+            
+            # Get the detected source language if it exists
+            if 'language' in progress_data:
+                response['language'] = progress_data['language']
+            
+            # Scripts and scenes are decoded from their binary artifacts; JSON is
+            # only produced here, when the response is serialized
+            for field in ('structured_transcript', 'spanish_script', 'scenes'):
+                if progress_data.get(field):
+                    response[field] = progress_data[field]
+            
+            # Get error if it exists
+            if progress_data.get('error'):
+                response['error'] = progress_data['error']
+                response['status'] = 'failure'
+    elif key_type == 'string':
+        # If it's a string, try to parse it as JSON
+        try:
+            result_data = json.loads(result_str)
+            
+            # Update response with data from the JSON
+            if 'status' in result_data:
+                response['status'] = result_data['status']
+            if 'result' in result_data:
+                response['transcript'] = result_data['result']
+            if 'error' in result_data:
+                response['error'] = result_data['error']
+        except Exception as e:
+            print(f"Error parsing Redis string: {str(e)}")
+    return response
+
 @bp.route('/status/<task_id>')
 def get_status(task_id):
     try:
-        # Initialize response with basic info
-        response = {
-            'task_id': task_id,
-            'status': 'pending',  # Default status
-            'progress': 0,
-            'status_msg': ''
-        }
+        response = build_status(task_id, 'none')
         
         # Try to get progress data directly from Redis
         try:
@@ -60,101 +536,19 @@ def get_status(task_id):
             key_type = r.type(key).decode('utf-8') if r.exists(key) else 'none'
             
             if key_type == 'hash':
-                # If it's a hash, get the progress data
-                progress_data = r.hgetall(key)
-                if progress_data:
-                    # Get progress if it exists
-                    if b'progress' in progress_data:
-                        response['progress'] = int(progress_data.get(b'progress', 0))
-                    
-                    # Get status message if it exists
-                    if b'status_msg' in progress_data:
-                        response['status_msg'] = progress_data.get(b'status_msg', b'').decode('utf-8')
-                    
-                    # Get status if it exists
-                    if b'status' in progress_data:
-                        response['status'] = progress_data.get(b'status', b'pending').decode('utf-8')
-                    
-                    # Get result if it exists
-                    if b'result' in progress_data:
-                        try:
-                            result_str = progress_data.get(b'result', b'').decode('utf-8')
-                            if result_str:
-                                response['transcript'] = result_str
-                                # If we have a result and progress is 100%, set status to success
-                                if response['progress'] == 100:
-                                    response['status'] = 'success'
-                        except Exception as e:
-                            print(f"Error decoding result: {str(e)}")
-                    
-                    # Get structured transcript if it exists
-                    if b'structured_transcript' in progress_data:
-                        try:
-                            structured_transcript_str = progress_data.get(b'structured_transcript', b'').decode('utf-8')
-                            if structured_transcript_str:
-                                import json
-                                response['structured_transcript'] = json.loads(structured_transcript_str)
-                        except Exception as e:
-                            print(f"Error decoding structured transcript: {str(e)}")
-                    
-                    # Get Spanish script if it exists
-                    if b'spanish_script' in progress_data:
-                        try:
-                            script_str = progress_data.get(b'spanish_script', b'').decode('utf-8')
-                            if script_str:
-                                import json
-                                response['spanish_script'] = json.loads(script_str)
-                        except Exception as e:
-                            print(f"Error decoding Spanish script: {str(e)}")
-                    
-                    # Get scene descriptions if they exist
-                    if b'scenes' in progress_data:
-                        try:
-                            scenes_str = progress_data.get(b'scenes', b'').decode('utf-8')
-                            if scenes_str:
-                                import json
-                                response['scenes'] = json.loads(scenes_str)
-                        except Exception as e:
-                            print(f"Error decoding scene descriptions: {str(e)}")
-                            import traceback
-                            traceback.print_exc()
-                    
-                    # Get error if it exists
-                    if b'error' in progress_data:
-                        try:
-                            error_str = progress_data.get(b'error', b'').decode('utf-8')
-                            if error_str:
-                                response['error'] = error_str
-                                response['status'] = 'error'
-                        except Exception as e:
-                            print(f"Error decoding error: {str(e)}")
+                # If it's a hash, get the progress data with compressed or spilled fields decoded
+                from app.utils.result_store import read_task_fields
+                response = build_status(task_id, key_type, progress_data=read_task_fields(r, task_id))
             elif key_type == 'string':
-                # If it's a string, try to parse it as JSON
-                try:
-                    import json
-                    result_str = r.get(key).decode('utf-8')
-                    result_data = json.loads(result_str)
-                    
-                    # Update response with data from the JSON
-                    if 'status' in result_data:
-                        response['status'] = result_data['status']
-                    if 'result' in result_data:
-                        response['transcript'] = result_data['result']
-                    if 'error' in result_data:
-                        response['error'] = result_data['error']
-                except Exception as e:
-                    print(f"Error parsing Redis string: {str(e)}")
+                response = build_status(task_id, key_type, result_str=r.get(key).decode('utf-8'))
             else:
                 # If the key doesn't exist or is of an unexpected type
                 print(f"Redis key {key} is of type {key_type}, expected hash or string")
                 
                 # As a fallback, try to get basic info from AsyncResult
-                try:
-                    from celery.result import AsyncResult
-                    task_result = AsyncResult(task_id)
-                    response['status'] = task_result.status.lower()
-                except Exception as e:
-                    print(f"Fallback to AsyncResult failed: {str(e)}")
+                status = fallback_status(task_id)
+                if status:
+                    response['status'] = status
         except Exception as e:
             print(f"Error accessing Redis: {str(e)}")
             # Return a basic response even if Redis fails
@@ -167,55 +561,87 @@ def get_status(task_id):
         print(traceback.format_exc())
         return jsonify({'error': str(e), 'status': 'error', 'task_id': task_id}), 500
 
+# Frames of a task never change once stored, so clients may cache them for a year
+FRAME_CACHE_SECONDS = 365 * 24 * 3600
+
+
+@lru_cache(maxsize=4096)
+def resolve_frame_image(task_id, frame_index, width, fmt):
+    """
+    Resolve (and encode on first use) the image file for a frame variant.
+    Cached in-process so repeated gallery requests skip the store lookup entirely.
+    """
+    from app.utils.frame_store import FrameStore
+    return FrameStore().thumbnail(task_id, frame_index, width, fmt)
+
+
+def parse_frame_request(frame_index, args, headers):
+    """
+    Parse a /frames request; shared by the Flask route and the async server.
+
+    Returns:
+        Tuple of ((frame index, width, format, whether the format was negotiated), None),
+        or (None, (error message, HTTP status)) for an invalid request
+    """
+    from app.utils.frame_store import IMAGE_FORMATS, snap_width
+    try:
+        frame_index = int(frame_index)
+        width = snap_width(args.get('w', type=int))
+    except ValueError:
+        return None, ('Invalid frame index', 404)
+    
+    fmt = args.get('fmt')
+    negotiated = fmt is None
+    if negotiated:
+        fmt = 'webp' if 'image/webp' in headers.get('Accept', '') else 'jpeg'
+    if fmt not in IMAGE_FORMATS:
+        return None, (f'Unsupported image format: {fmt}', 400)
+    return (frame_index, width, fmt, negotiated), None
+
+
 @bp.route('/frames/<task_id>/<frame_index>')
 def get_frame(task_id, frame_index):
     """
     Serve a frame image from a processed video.
+
+    Query parameters:
+        w: Maximum width in pixels, snapped up to one of the pre-generated variants
+        fmt: 'webp' or 'jpeg' (default: webp when the client accepts it)
     """
+    from app.utils.frame_store import IMAGE_FORMATS, FullResolutionUnavailable
     try:
-        # Get the frame data from Redis
-        r = redis.Redis.from_url('redis://localhost:6379/0')
-        key = f'celery-task-meta-{task_id}'
+        variant, error = parse_frame_request(frame_index, request.args, request.headers)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        frame_index, width, fmt, negotiated = variant
         
-        print(f"DEBUG: Accessing frame for task {task_id}, frame {frame_index}")
-        
-        if not r.exists(key):
-            print(f"DEBUG: Task {task_id} not found in Redis")
-            return jsonify({'error': 'Task not found'}), 404
-        
-        # Get the scenes data
-        scenes_str = r.hget(key, 'scenes')
-        if not scenes_str:
-            print(f"DEBUG: No scenes data for task {task_id}")
-            return jsonify({'error': 'No scenes available for this task'}), 404
-        
-        # Parse the scenes data
-        scenes = json.loads(scenes_str.decode('utf-8'))
-        print(f"DEBUG: Found {len(scenes)} scenes for task {task_id}")
-        
-        frame_index = int(frame_index)
-        if frame_index < 0 or frame_index >= len(scenes):
-            print(f"DEBUG: Invalid frame index {frame_index}, max is {len(scenes)-1}")
-            return jsonify({'error': 'Invalid frame index'}), 404
-        
-        # Get the frame path
-        frame_path = scenes[frame_index].get('path')
-        print(f"DEBUG: Frame path for index {frame_index}: {frame_path}")
-        
-        if not frame_path:
-            print(f"DEBUG: No path found for frame {frame_index}")
-            return jsonify({'error': 'Frame path not found'}), 404
-            
+        frame_path = resolve_frame_image(task_id, frame_index, width, fmt)
         if not os.path.exists(frame_path):
-            print(f"DEBUG: Frame file does not exist at path: {frame_path}")
-            return jsonify({'error': 'Frame image file not found'}), 404
+            # The frames were garbage collected since the path was cached
+            resolve_frame_image.cache_clear()
+            frame_path = resolve_frame_image(task_id, frame_index, width, fmt)
         
-        # Serve the image file
-        print(f"DEBUG: Serving frame image from {frame_path}")
-        return send_file(frame_path, mimetype='image/jpeg')
+        response = send_file(
+            frame_path,
+            mimetype=IMAGE_FORMATS[fmt][1],
+            conditional=True,
+            etag=True,
+            max_age=FRAME_CACHE_SECONDS
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if negotiated:
+            response.vary.add('Accept')
+        return response
     
+    except FullResolutionUnavailable as e:
+        return jsonify({'error': f'Full-resolution frame unavailable: {str(e)}; request a width with ?w='}), 410
+    except (FileNotFoundError, ValueError):
+        return jsonify({'error': 'No frames available for this task'}), 404
+    except IndexError:
+        return jsonify({'error': 'Invalid frame index'}), 404
     except Exception as e:
         import traceback
-        print(f"DEBUG: Error in get_frame: {str(e)}")
+        print(f"Error in get_frame: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': f'Error retrieving frame: {str(e)}'}), 500
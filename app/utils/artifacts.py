@@ -0,0 +1,185 @@
+"""
+Typed pipeline artifacts and their binary codec.
+Stage outputs (transcriptions, scripts, scenes) are described by slotted dataclasses and
+encoded with msgpack as positional arrays, so field names are not repeated in every record.
+The codec is used wherever artifacts cross a process boundary (stage checkpoints, task result
+hashes, broker messages); JSON is only produced at the HTTP edge.
+
+Pipeline code keeps passing plain dictionaries; encode() and decode() convert at the boundary.
+"""
+
+import json
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Encoded artifacts start with a NUL byte, which never begins JSON
+MSGPACK_MARKER = b'\x00mp\x00'
+JSON_MARKER = b'\x00js\x00'
+SCHEMA_VERSION = 1
+
+
+@dataclass(slots=True)
+class Segment:
+    start: float
+    end: float
+    text: str
+
+
+@dataclass(slots=True)
+class Transcription:
+    text: str
+    language: Optional[str]
+    segments: List[Segment]
+
+
+@dataclass(slots=True)
+class ScriptSection:
+    id: str
+    title: str
+    description: str
+    content: str
+
+
+@dataclass(slots=True)
+class Script:
+    sections: List[ScriptSection]
+
+
+@dataclass(slots=True)
+class Scene:
+    index: int
+    timestamp: float
+    timestamp_formatted: str
+    description: Optional[str] = None
+    task_id: Optional[str] = None
+    url: Optional[str] = None
+    image_prompt: Optional[str] = None
+    video_prompt: Optional[str] = None
+
+
+def _field_names(cls) -> List[str]:
+    return [f.name for f in fields(cls)]
+
+
+def _drop_none(d: Dict[str, Any]) -> Dict[str, Any]:
+    # Optional fields absent from the original dictionary stay absent after a round trip
+    return {k: v for k, v in d.items() if v is not None}
+
+
+# Conversions between pipeline dictionaries, dataclasses and positional rows
+
+def segment_from_dict(d: Dict[str, Any]) -> Segment:
+    return Segment(float(d["start"]), float(d["end"]), d["text"])
+
+
+def transcription_from_dict(d: Dict[str, Any]) -> Transcription:
+    return Transcription(d["text"], d.get("language"), [segment_from_dict(s) for s in d.get("segments", [])])
+
+
+def script_from_dict(d: Dict[str, Any]) -> Script:
+    return Script([ScriptSection(s["id"], s["title"], s["description"], s["content"]) for s in d["sections"]])
+
+
+def scene_from_dict(d: Dict[str, Any]) -> Scene:
+    return Scene(**{name: d.get(name) for name in _field_names(Scene)})
+
+
+def _row(obj) -> list:
+    return [getattr(obj, name) for name in obj.__slots__]
+
+
+def _transcription_row(t: Transcription) -> list:
+    return [t.text, t.language, [_row(s) for s in t.segments]]
+
+
+def _script_row(s: Script) -> list:
+    return [_row(section) for section in s.sections]
+
+
+def _transcription_from_row(row: list) -> Dict[str, Any]:
+    text, language, segments = row
+    return asdict(Transcription(text, language, [Segment(*s) for s in segments]))
+
+
+def _script_from_row(row: list) -> Dict[str, Any]:
+    return asdict(Script([ScriptSection(*section) for section in row]))
+
+
+def _scene_from_row(row: list) -> Dict[str, Any]:
+    return _drop_none(asdict(Scene(*row)))
+
+
+# Artifact kinds: (dictionary -> row, row -> dictionary)
+KINDS = {
+    "transcription": (lambda d: _transcription_row(transcription_from_dict(d)), _transcription_from_row),
+    "script": (lambda d: _script_row(script_from_dict(d)), _script_from_row),
+    "scripts": (
+        lambda pair: [_script_row(script_from_dict(s)) for s in pair],
+        lambda rows: [_script_from_row(row) for row in rows],
+    ),
+    "scenes": (
+        lambda scenes: [_row(scene_from_dict(s)) for s in scenes],
+        lambda rows: [_scene_from_row(row) for row in rows],
+    ),
+    # Untyped values (paths, small metadata) still get the compact encoding
+    "plain": (lambda value: value, lambda value: value),
+}
+
+
+def encode(kind: str, value: Any) -> bytes:
+    """
+    Encode a pipeline value as a typed artifact.
+
+    Args:
+        kind: One of KINDS
+        value: The dictionary (or list) the pipeline produced
+
+    Returns:
+        Marker-prefixed msgpack bytes (JSON if msgpack is not installed)
+    """
+    to_row, _ = KINDS[kind]
+    payload = [SCHEMA_VERSION, to_row(value)]
+    if msgpack is not None:
+        return MSGPACK_MARKER + msgpack.packb(payload, use_bin_type=True)
+    return JSON_MARKER + json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def decode(kind: str, data: bytes) -> Any:
+    """
+    Decode an artifact back to the dictionary (or list) form the pipeline uses.
+    Plain JSON written before artifacts existed is accepted as well.
+    """
+    if data.startswith(MSGPACK_MARKER):
+        if msgpack is None:
+            raise RuntimeError("Artifact was encoded with msgpack but msgpack is not installed")
+        version, row = msgpack.unpackb(data[len(MSGPACK_MARKER):], raw=False)
+    elif data.startswith(JSON_MARKER):
+        version, row = json.loads(data[len(JSON_MARKER):])
+    else:
+        return json.loads(data)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported artifact schema version: {version}")
+    _, from_row = KINDS[kind]
+    return from_row(row)
+
+
+def is_artifact(data: bytes) -> bool:
+    return data.startswith(MSGPACK_MARKER) or data.startswith(JSON_MARKER)
+
+
+def celery_serializer_config() -> Dict[str, Any]:
+    """
+    Celery settings that send task messages as msgpack, still accepting JSON from older senders.
+    """
+    if msgpack is None:
+        return {}
+    return {
+        'task_serializer': 'msgpack',
+        'result_serializer': 'msgpack',
+        'accept_content': ['msgpack', 'json'],
+    }
@@ -0,0 +1,256 @@
+"""
+Decoding policy for Whisper transcription.
+Picks the model size, beam size, condition_on_previous_text and numeric precision of
+each job from its audio duration, the backlog of jobs waiting behind it and its latency
+SLO. Configurations are tried from most to least accurate; the first whose estimated
+transcription time fits the job's budget wins, and every few waiting jobs start the
+search one step further down, trading accuracy for throughput as the backlog grows.
+Each choice is logged with the real-time factor it achieved, and the per-configuration
+real-time factors are learned from those runs, so estimates follow the hardware.
+
+    python -m app.utils.asr_policy report
+"""
+
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.utils import scheduler
+from app.utils.transcriber import backend_name
+from app.utils.transcription import REDIS_URL
+
+RTF_KEY = 'asr:rtf'
+DECISIONS_KEY = 'asr:decisions'
+DECISION_SAMPLES = 1000
+
+# Configurations from most to least accurate, as model:beam:condition_on_previous_text
+# (beam 1 is greedy decoding; condition 0 drops the previous text from the prompt, which
+# also stops repetition loops from spreading on noisy audio)
+DEFAULT_LADDER = 'small:5:1,base:5:1,base:1:1,base:1:0,tiny:1:0'
+
+# Each this many waiting jobs start the search one configuration lower
+BACKLOG_STEP = int(os.environ.get('ASR_BACKLOG_STEP', 5))
+# From this many waiting jobs CPU workers always use int8
+INT8_BACKLOG = int(os.environ.get('ASR_INT8_BACKLOG', 10))
+# Without an explicit SLO a job should finish within this multiple of its duration
+SLO_FACTOR = float(os.environ.get('ASR_SLO_FACTOR', 1.0))
+# Share of the remaining SLO given to transcription; scripts and scenes need the rest
+SLO_SHARE = float(os.environ.get('ASR_SLO_SHARE', 0.6))
+
+# Seconds of work per audio second with greedy fp32 decoding on CPU, used until real runs
+# have been recorded
+DEFAULT_RTF = {'tiny': 0.06, 'base': 0.12, 'small': 0.35, 'medium': 1.0, 'large': 2.0}
+BEAM_COST = 1.7        # beam search relative to greedy decoding
+INT8_COST = 0.55       # dynamically quantized linear layers relative to fp32
+GPU_COST = 0.1         # fp16 on a GPU relative to fp32 on CPU
+# CTranslate2 relative to PyTorch at the same precision
+BACKEND_COST = {'whisper': 1.0, 'faster-whisper': 0.4}
+
+# Weight of the newest observation in the moving average of real-time factors
+RTF_SMOOTHING = 0.2
+
+
+def parse_ladder(spec: str) -> List[Tuple[str, int, bool]]:
+    ladder = []
+    for entry in spec.split(','):
+        model_size, beam_size, condition = entry.strip().split(':')
+        ladder.append((model_size, int(beam_size), condition == '1'))
+    return ladder
+
+
+LADDER = parse_ladder(os.environ.get('ASR_MODEL_LADDER', DEFAULT_LADDER))
+
+# Model sizes a client may request with model_size; the large models need several GB per
+# worker process
+ALLOWED_MODEL_SIZES = tuple(size.strip() for size in
+                            os.environ.get('ASR_ALLOWED_MODELS', 'tiny,base,small,medium').split(',') if size.strip())
+
+
+def _redis(redis_url: Optional[str] = None):
+    return redis.Redis.from_url(redis_url or os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+
+
+@dataclass
+class DecodingPlan:
+    """
+    Whisper configuration chosen for one job, with the inputs that led to it.
+    """
+    model_size: str
+    beam_size: Optional[int]
+    condition_on_previous_text: bool
+    precision: str
+    device: str
+    reason: str
+    task_id: Optional[str] = None
+    duration: Optional[float] = None
+    budget_seconds: Optional[float] = None
+    estimated_seconds: Optional[float] = None
+    backlog_depth: int = 0
+    backend: str = 'whisper'
+
+    @property
+    def key(self) -> str:
+        beam = self.beam_size or 1
+        key = f"{self.model_size}:b{beam}:c{int(self.condition_on_previous_text)}:{self.precision}:{self.device}"
+        # Keys without a backend are openai-whisper's, as recorded before backends were selectable
+        return key if self.backend == 'whisper' else f"{key}:{self.backend}"
+
+    def options(self) -> Dict[str, Any]:
+        """
+        Keyword arguments for Whisper's transcribe().
+        """
+        return {
+            'beam_size': self.beam_size,
+            'condition_on_previous_text': self.condition_on_previous_text,
+            'fp16': self.precision == 'fp16',
+        }
+
+    def load_model(self):
+        from app.utils.transcriber import get_transcriber
+        return get_transcriber(self.model_size, precision=self.precision, backend=self.backend)
+
+    def record(self, audio_seconds: Optional[float], elapsed_seconds: float, redis_url: Optional[str] = None):
+        """
+        Log the realized real-time factor and fold it into the learned estimate.
+        """
+        if not audio_seconds:
+            return
+        rtf = elapsed_seconds / audio_seconds
+        try:
+            r = _redis(redis_url)
+            previous = r.hget(RTF_KEY, self.key)
+            updated = rtf if previous is None else (1 - RTF_SMOOTHING) * float(previous) + RTF_SMOOTHING * rtf
+            decision = dict(asdict(self), duration=audio_seconds, elapsed_seconds=round(elapsed_seconds, 3),
+                            rtf=round(rtf, 4), finished=time.time())
+            pipe = r.pipeline()
+            pipe.hset(RTF_KEY, self.key, updated)
+            pipe.lpush(DECISIONS_KEY, json.dumps(decision))
+            pipe.ltrim(DECISIONS_KEY, 0, DECISION_SAMPLES - 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Error recording transcription decision: {str(e)}")
+        print(f"Transcribed {audio_seconds:.0f}s with {self.key} in {elapsed_seconds:.1f}s (RTF {rtf:.3f})")
+
+
+def default_rtf(model_size: str, beam_size: int, precision: str, backend: str = 'whisper') -> float:
+    rtf = DEFAULT_RTF.get(model_size.split('.')[0], 1.0) * BACKEND_COST.get(backend, 1.0)
+    if beam_size > 1:
+        rtf *= BEAM_COST
+    if precision == 'int8':
+        rtf *= INT8_COST
+    elif precision == 'fp16':
+        rtf *= GPU_COST
+    return rtf
+
+
+def choose_plan(task_id: Optional[str] = None, model_size: Optional[str] = None,
+                slo_seconds: Optional[float] = None, duration: Optional[float] = None,
+                source: Optional[str] = None, is_youtube: bool = False, device: Optional[str] = None,
+                redis_url: Optional[str] = None) -> DecodingPlan:
+    """
+    Choose the Whisper configuration for a job.
+
+    Args:
+        task_id: The job's task ID; its scheduling record supplies the probed duration and wait time
+        model_size: Model requested by the client; only precision is chosen then. A size
+                    not in ALLOWED_MODEL_SIZES is ignored
+        slo_seconds: Latency target from submission to completion (default: duration * ASR_SLO_FACTOR)
+        duration: Audio duration in seconds, if already known
+        source: File path or URL probed when the duration is not known otherwise
+        is_youtube: Whether source is a YouTube URL
+        device: 'cuda' or 'cpu' (default: the device models are loaded on)
+        redis_url: Optional Redis URL
+
+    Returns:
+        The chosen DecodingPlan
+    """
+    if model_size and model_size not in ALLOWED_MODEL_SIZES:
+        # Routes reject these; a job queued before the list changed falls back to the ladder
+        print(f"Ignoring requested model {model_size!r}; allowed: {', '.join(ALLOWED_MODEL_SIZES)}")
+        model_size = None
+    if device is None:
+        from app.utils.model_registry import default_device
+        device = default_device()
+    job = (scheduler.job_record(task_id, redis_url) if task_id else None) or {}
+    if duration is None:
+        duration = job.get('cost')
+    if duration is None and source:
+        duration = scheduler.probe_duration(source, is_youtube)
+    if duration is None:
+        duration = scheduler.DEFAULT_COST_SECONDS
+    waited = job['started'] - job['enqueued'] if 'started' in job else 0.0
+    depth = int(scheduler.backlog(redis_url)['depth'])
+    backend = backend_name()
+
+    slo = slo_seconds or duration * SLO_FACTOR
+    budget = max(0.0, slo - waited) * SLO_SHARE
+    if device == 'cuda':
+        precisions = ['fp16']
+    elif depth >= INT8_BACKLOG or backend == 'faster-whisper':
+        # CTranslate2's int8 kernels lose no measurable accuracy, so they are always used on CPU
+        precisions = ['int8']
+    else:
+        precisions = ['fp32', 'int8']
+
+    try:
+        learned = {key.decode('utf-8'): float(value) for key, value in _redis(redis_url).hgetall(RTF_KEY).items()}
+    except redis.RedisError as e:
+        print(f"Error loading real-time factors: {str(e)}")
+        learned = {}
+
+    def plan(size, beam, condition, precision, reason):
+        candidate = DecodingPlan(size, beam if beam > 1 else None, condition, precision, device, reason,
+                                 task_id=task_id, duration=duration, budget_seconds=round(budget, 1),
+                                 backlog_depth=depth, backend=backend)
+        rtf = learned.get(candidate.key, default_rtf(size, beam, precision, backend))
+        candidate.estimated_seconds = round(duration * rtf, 1)
+        return candidate
+
+    if model_size:
+        chosen = plan(model_size, 1, True, precisions[0], 'requested')
+    else:
+        chosen = None
+        start = min(len(LADDER) - 1, depth // BACKLOG_STEP)
+        for size, beam, condition in LADDER[start:]:
+            for precision in precisions:
+                candidate = plan(size, beam, condition, precision, 'fits SLO')
+                if candidate.estimated_seconds <= budget:
+                    chosen = candidate
+                    break
+            if chosen:
+                break
+        if chosen is None:
+            size, beam, condition = LADDER[-1]
+            chosen = plan(size, beam, condition, precisions[-1], 'fastest; nothing fits SLO')
+        if start:
+            chosen.reason += f' from step {start} for {depth} waiting jobs'
+    print(f"Transcription plan for {task_id}: {chosen.key} ({chosen.reason}; "
+          f"estimated {chosen.estimated_seconds}s of a {chosen.budget_seconds}s budget)")
+    return chosen
+
+
+def policy_report(redis_url: Optional[str] = None, recent: int = 50) -> Dict[str, Any]:
+    """
+    Learned real-time factors per configuration and the most recent decisions.
+    """
+    r = _redis(redis_url)
+    return {
+        'ladder': [f"{size}:b{beam}:c{int(condition)}" for size, beam, condition in LADDER],
+        'rtf': {key.decode('utf-8'): round(float(value), 4) for key, value in r.hgetall(RTF_KEY).items()},
+        'backlog': scheduler.backlog(redis_url),
+        'decisions': [json.loads(raw) for raw in r.lrange(DECISIONS_KEY, 0, recent - 1)],
+    }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command == 'report':
+        print(json.dumps(policy_report(), indent=2))
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
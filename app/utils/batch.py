@@ -0,0 +1,205 @@
+"""
+Batch processing of several videos in one worker task.
+Every video is transcribed on its own, then the translation and captioning passes run
+once over the whole batch so the models see full batches instead of one video at a time.
+Each item keeps its own task ID, so /status/<task_id> and /frames work per video.
+"""
+
+import json
+import os
+import tempfile
+import time
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from celery import shared_task
+
+from app.utils.transcription import (REDIS_URL, download_youtube_video, extract_audio, mark_task_failed,
+                                     set_task_progress, store_task_result)
+
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', 20))
+BATCH_TTL_SECONDS = 7 * 24 * 3600
+
+
+def batch_meta_key(batch_id: str) -> str:
+    return f'batch-meta-{batch_id}'
+
+
+def batch_items_key(batch_id: str) -> str:
+    return f'batch-items-{batch_id}'
+
+
+def _redis(redis_url: Optional[str] = None):
+    return redis.Redis.from_url(redis_url or os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+
+
+def create_batch(sources: List[Dict[str, Any]], redis_url: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Register a batch and assign a task ID to each of its videos.
+
+    Args:
+        sources: Dictionaries with source (file path or URL), is_youtube and name keys
+        redis_url: Optional Redis URL
+
+    Returns:
+        Tuple of (batch ID, items), where each item is its source plus a task_id
+    """
+    batch_id = str(uuid.uuid4())
+    items = [dict(source, task_id=str(uuid.uuid4())) for source in sources]
+    r = _redis(redis_url)
+    pipe = r.pipeline()
+    pipe.hset(batch_meta_key(batch_id), mapping={
+        'items': json.dumps([item['task_id'] for item in items]),
+        'created': time.time(),
+        'status': 'queued',
+    })
+    for item in items:
+        pipe.hset(batch_items_key(batch_id), item['task_id'], json.dumps({
+            'name': item.get('name'), 'status': 'queued', 'progress': 0,
+        }))
+    pipe.expire(batch_meta_key(batch_id), BATCH_TTL_SECONDS)
+    pipe.expire(batch_items_key(batch_id), BATCH_TTL_SECONDS)
+    pipe.execute()
+    return batch_id, items
+
+
+def set_item_status(batch_id: str, item: Dict[str, Any], status: str, progress: int,
+                    status_msg: Optional[str] = None, error: Optional[str] = None, redis_url: Optional[str] = None):
+    """
+    Record an item's state in the batch and mirror its progress on the item's own task.
+    """
+    entry = {'name': item.get('name'), 'status': status, 'progress': progress}
+    if error:
+        entry['error'] = error
+    _redis(redis_url).hset(batch_items_key(batch_id), item['task_id'], json.dumps(entry))
+    set_task_progress(item['task_id'], progress, status_msg or status)
+
+
+def set_batch_status(batch_id: str, status: str, redis_url: Optional[str] = None):
+    _redis(redis_url).hset(batch_meta_key(batch_id), 'status', status)
+
+
+def get_batch_status(batch_id: str, redis_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Aggregate the state of every item in a batch.
+
+    Returns:
+        Dictionary with the batch status, mean progress, per-status counts and items,
+        or None if the batch does not exist
+    """
+    r = _redis(redis_url)
+    meta = r.hgetall(batch_meta_key(batch_id))
+    if not meta:
+        return None
+    task_ids = json.loads(meta[b'items'].decode('utf-8'))
+    stored = r.hgetall(batch_items_key(batch_id))
+    items = []
+    counts: Dict[str, int] = {}
+    for task_id in task_ids:
+        raw = stored.get(task_id.encode('utf-8'))
+        entry = json.loads(raw.decode('utf-8')) if raw else {'status': 'queued', 'progress': 0}
+        entry['task_id'] = task_id
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        items.append(entry)
+    return {
+        'batch_id': batch_id,
+        'status': meta.get(b'status', b'queued').decode('utf-8'),
+        'progress': round(sum(item['progress'] for item in items) / len(items)) if items else 0,
+        'counts': counts,
+        'items': items,
+    }
+
+
+@shared_task(bind=True, ignore_result=True)
+def celery_process_batch(self, batch_id, items, model_size=None, slo_seconds=None):
+    """
+    Process every video of a batch, sharing the translation and captioning passes.
+    As for single videos, the Whisper configuration is chosen by app.utils.asr_policy
+    unless a model_size is requested; it is chosen once, for the whole batch.
+
+    Args:
+        batch_id: ID returned by create_batch
+        items: Items returned by create_batch
+        model_size: Whisper model size requested for every video
+        slo_seconds: Latency target for the whole batch
+    """
+    from app.utils.asr_policy import choose_plan
+    from app.utils.pipeline import build_scripts_batch, extract_scenes_batch
+    from app.utils.transcript_index import index_transcript
+    from app.utils.transcription import get_audio_duration, transcribe_audio_segments
+
+    set_batch_status(batch_id, 'processing')
+    try:
+        asr_plan = choose_plan(self.request.id, model_size=model_size, slo_seconds=slo_seconds)
+        whisper_model = asr_plan.load_model()
+    except Exception as e:
+        print(f"Error loading the transcription model for batch {batch_id}: {str(e)}")
+        traceback.print_exc()
+        for item in items:
+            set_item_status(batch_id, item, 'failed', 100, f'Failed: {str(e)}', error=str(e))
+            mark_task_failed(item['task_id'], f'Failed: {str(e)}')
+        set_batch_status(batch_id, 'failed')
+        return {'batch_id': batch_id, 'completed': 0, 'failed': len(items)}
+    model_size = asr_plan.model_size
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prepared = []
+        for item in items:
+            try:
+                item_dir = os.path.join(tmpdir, item['task_id'])
+                os.makedirs(item_dir)
+                if item['is_youtube']:
+                    set_item_status(batch_id, item, 'downloading', 5, 'Downloading YouTube video and audio')
+                    video_path, audio_path = download_youtube_video(item['source'], item_dir)
+                else:
+                    set_item_status(batch_id, item, 'extracting_audio', 5, 'Extracting audio')
+                    video_path = item['source']
+                    audio_path = os.path.join(item_dir, 'audio.wav')
+                    extract_audio(video_path, audio_path)
+
+                set_item_status(batch_id, item, 'transcribing', 20, 'Transcribing audio')
+                audio_duration = get_audio_duration(audio_path)
+                started = time.monotonic()
+                transcription = transcribe_audio_segments(audio_path, model_size=model_size, model=whisper_model,
+                                                          options=asr_plan.options())
+                asr_plan.record(audio_duration, time.monotonic() - started)
+                prepared.append({
+                    'item': item,
+                    'video_path': video_path,
+                    'audio_path': audio_path,
+                    'audio_duration': audio_duration,
+                    'transcription': transcription,
+                })
+                set_item_status(batch_id, item, 'transcribed', 50, 'Waiting for the rest of the batch')
+            except Exception as e:
+                print(f"Error processing batch item {item['task_id']}: {str(e)}")
+                traceback.print_exc()
+                set_item_status(batch_id, item, 'failed', 100, f'Failed: {str(e)}', error=str(e))
+                mark_task_failed(item['task_id'], f'Failed: {str(e)}')
+
+        if prepared:
+            for entry in prepared:
+                set_item_status(batch_id, entry['item'], 'translating', 60, 'Generating Spanish script')
+            scripts = build_scripts_batch(prepared, model_size=model_size, whisper_model=whisper_model)
+
+            for entry in prepared:
+                set_item_status(batch_id, entry['item'], 'describing', 75, 'Extracting and describing scenes')
+            scenes = extract_scenes_batch([(entry['video_path'], entry['item']['task_id']) for entry in prepared])
+
+            for entry, (structured_transcript, spanish_script), item_scenes in zip(prepared, scripts, scenes):
+                transcription = entry['transcription']
+                store_task_result(entry['item']['task_id'], {
+                    "transcript": transcription['text'],
+                    "language": transcription['language'],
+                    "segments": transcription['segments'],
+                    "structured_transcript": structured_transcript,
+                    "spanish_script": spanish_script,
+                    "scenes": item_scenes,
+                })
+                index_transcript(entry['item']['task_id'], transcription['segments'], transcription['language'])
+                set_item_status(batch_id, entry['item'], 'success', 100, 'Completed')
+
+    set_batch_status(batch_id, 'completed')
+    return {'batch_id': batch_id, 'completed': len(prepared), 'failed': len(items) - len(prepared)}
@@ -0,0 +1,142 @@
+"""
+Pipeline stage checkpoints.
+Each completed stage of a task persists its output under the task ID, tagged with a hash of
+the source content, so a retried or redelivered task resumes from the last completed stage
+instead of starting over from the download. Checkpoints are removed once the result is
+stored, and directories of tasks that never finished are garbage collected after a TTL.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Optional
+
+from app.utils import artifacts
+from app.utils.task_dirs import TaskDirectoryStore
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_ROOT = os.path.join(PROJECT_ROOT, 'checkpoints')
+DEFAULT_TTL_SECONDS = 2 * 24 * 3600
+
+MANIFEST_FILE = 'manifest.json'
+MEDIA_DIR = 'media'
+
+# Artifact kind of each stage's output (see app.utils.artifacts); other stages are stored untyped
+STAGE_KINDS = {'transcribe': 'transcription', 'scripts': 'scripts', 'scenes': 'scenes'}
+
+
+def source_content_hash(source: str, is_youtube: bool = False) -> str:
+    """
+    Hash identifying the content a task works on: the file bytes for uploads, the URL for YouTube.
+    """
+    digest = hashlib.sha256()
+    if is_youtube:
+        digest.update(source.encode('utf-8'))
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class NullCheckpoints:
+    """
+    Checkpoints that store nothing, used when a caller does not need to resume.
+    """
+
+    def load(self, stage):
+        return None
+
+    def save(self, stage, data):
+        pass
+
+
+class TaskCheckpoints:
+    """
+    Completed stage outputs of one task.
+    """
+
+    def __init__(self, directory: str, content_hash: str):
+        self.directory = directory
+        self.content_hash = content_hash
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None or manifest.get("content_hash") != content_hash:
+            # New task, or the same task ID now points at different content
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            self._write(MANIFEST_FILE, json.dumps({"content_hash": content_hash, "created": time.time()}).encode('utf-8'))
+
+    def _write(self, name: str, data: bytes):
+        # Write atomically so a crash mid-write never leaves a half checkpoint behind
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def media_dir(self, clean: bool = False) -> str:
+        """
+        Directory for media files that must survive a retry (downloads, extracted audio).
+
+        Args:
+            clean: Remove partial files left by an interrupted attempt
+        """
+        path = os.path.join(self.directory, MEDIA_DIR)
+        if clean:
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def load(self, stage: str) -> Optional[Any]:
+        """
+        Return the saved output of a stage, or None if the stage has not completed.
+        """
+        try:
+            with open(os.path.join(self.directory, f"{stage}.bin"), 'rb') as f:
+                data = artifacts.decode(STAGE_KINDS.get(stage, 'plain'), f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        print(f"Resuming from checkpoint: {stage}")
+        return data
+
+    def save(self, stage: str, data: Any):
+        self._write(f"{stage}.bin", artifacts.encode(STAGE_KINDS.get(stage, 'plain'), data))
+
+    def delete(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CheckpointStore(TaskDirectoryStore):
+    """
+    Root directory holding one checkpoint directory per task.
+    """
+
+    label = 'Checkpoint'
+
+    def __init__(self, root: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory for checkpoints (default: CHECKPOINT_ROOT or <project>/checkpoints);
+                  must be shared between workers for a retry on another host to resume
+            ttl_seconds: Age after which abandoned checkpoints are deleted (default: CHECKPOINT_TTL or 2 days)
+        """
+        if ttl_seconds is None:
+            ttl_seconds = int(os.environ.get('CHECKPOINT_TTL', DEFAULT_TTL_SECONDS))
+        super().__init__(root or os.environ.get('CHECKPOINT_ROOT', DEFAULT_ROOT), ttl_seconds)
+
+    def for_task(self, task_id: str, content_hash: str) -> TaskCheckpoints:
+        return TaskCheckpoints(self.task_dir(task_id), content_hash)
+
+
+if __name__ == "__main__":
+    store = CheckpointStore()
+    print(f"Removed {store.collect_garbage()} expired checkpoint directories from {store.root}")
@@ -0,0 +1,415 @@
+"""
+Speculative scene captioning while a video is still being transferred.
+MP4 files written with faststart keep their index (the moov box) ahead of the media data,
+so the part received so far can already be decoded. Uploads are streamed to disk next to
+a marker file, and yt-dlp downloads into a growing file; a background thread samples the
+scene frames whose data has arrived and captions them, tracking which timestamps are
+covered. Once the transfer completes the remaining gaps are filled from the full file,
+so captions are mostly ready when the upload finishes instead of after transcription.
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+EARLY_SCENES_ENABLED = os.environ.get('EARLY_SCENES', '1') not in ('0', 'false', 'no')
+
+# Marker file present next to an upload until its last byte has been written
+UPLOADING_SUFFIX = '.uploading'
+
+POLL_SECONDS = float(os.environ.get('EARLY_SCENES_POLL_SECONDS', 2))
+# A frame is only taken from a partial file once a frame this far ahead decodes as well,
+# so its data is known to be complete (media data arrives in timeline order)
+LOOKAHEAD_SECONDS = 5
+# Give up on an upload whose file has not grown for this long
+UPLOAD_STALL_SECONDS = float(os.environ.get('UPLOAD_STALL_SECONDS', 300))
+CAPTION_BATCH_SIZE = 8
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+def moov_end_offset(path: str) -> Optional[int]:
+    """
+    Walk the top-level MP4 boxes of a (possibly partial) file.
+
+    Returns:
+        End offset of the moov box if it comes before the media data (faststart),
+        0 if the media data comes first or the file is not an MP4, or None if not
+        enough bytes have arrived to tell
+    """
+    try:
+        with open(path, 'rb') as f:
+            offset = 0
+            while True:
+                f.seek(offset)
+                header = f.read(16)
+                if len(header) < 8:
+                    return None
+                size, box_type = struct.unpack('>I4s', header[:8])
+                if offset == 0 and box_type != b'ftyp':
+                    return 0
+                if size == 1:
+                    if len(header) < 16:
+                        return None
+                    size = struct.unpack('>Q', header[8:16])[0]
+                elif size == 0:
+                    # Box runs to the end of the file
+                    return 0
+                if box_type == b'moov':
+                    return offset + size
+                if box_type in (b'mdat', b'moof') or size < 8:
+                    return 0
+                offset += size
+    except OSError:
+        return None
+
+
+def is_faststart(path: str) -> Optional[bool]:
+    """
+    Whether an MP4 has its moov box ahead of the media data; None if still undecided.
+    """
+    end = moov_end_offset(path)
+    return None if end is None else end > 0
+
+
+def upload_in_progress(path: str) -> bool:
+    return os.path.exists(path + UPLOADING_SUFFIX)
+
+
+class StreamingUpload:
+    """
+    Writable file an upload is streamed into while the request body is parsed.
+    Calls on_faststart once the complete moov box of a faststart MP4 has been written,
+    and hashes the content as it is written (digest).
+    """
+
+    def __init__(self, path: str, on_faststart: Optional[Callable] = None):
+        self.path = path
+        self.on_faststart = on_faststart
+        self.task_id = None
+        # Whether task_id belongs to an earlier identical upload
+        self.duplicate = False
+        # Transcription options and deduplication key task_id was submitted with
+        self.options = None
+        self.dedup_key = None
+        self.moov_end = None
+        self._notified = False
+        self.digest = hashlib.sha256()
+        open(path + UPLOADING_SUFFIX, 'w').close()
+        # Every upload gets a path of its own; never truncate a file a job may be reading
+        self._file = open(path, 'xb+')
+
+    def head_digest(self) -> str:
+        """
+        SHA-256 of the file up to the end of its moov box. The moov box indexes every
+        sample of the file, so this identifies a faststart upload before it is complete.
+        """
+        with open(self.path, 'rb') as f:
+            return hashlib.sha256(f.read(self.moov_end)).hexdigest()
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        self.digest.update(data)
+        if self.moov_end is None:
+            self._file.flush()
+            self.moov_end = moov_end_offset(self.path)
+        if self.moov_end and not self._notified and self._file.tell() >= self.moov_end:
+            self._notified = True
+            self._file.flush()
+            if self.on_faststart:
+                try:
+                    self.on_faststart(self)
+                except Exception as e:
+                    # The upload still completes; processing is just submitted afterwards
+                    print(f"Error starting early processing: {str(e)}")
+        return written
+
+    def close(self):
+        """
+        Finish the file and clear the in-progress marker. Safe to call more than once.
+        """
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path + UPLOADING_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush... go to the underlying file
+        return getattr(self._file, name)
+
+
+def latest_video_file(directory: str) -> Optional[str]:
+    """
+    Most recently modified video file in a yt-dlp download directory, including .part files.
+    """
+    candidates = []
+    for name in os.listdir(directory):
+        base = name[:-len('.part')] if name.endswith('.part') else name
+        if name.startswith('video_') and base.endswith(VIDEO_EXTENSIONS):
+            path = os.path.join(directory, name)
+            try:
+                candidates.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    return max(candidates)[1] if candidates else None
+
+
+def _format_timestamp(seconds: float) -> str:
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+
+class EarlySceneCaptioner:
+    """
+    Samples and captions scene frames of a video while it is still being transferred.
+    """
+
+    def __init__(self, task_id: str, locate: Callable[[], Optional[str]], transfer_complete: Callable[[], bool],
+                 interval_seconds: float, max_frames: int, scene_extractor=None,
+                 stall_seconds: Optional[float] = None, on_progress: Optional[Callable] = None):
+        """
+        Initialize the captioner.
+
+        Args:
+            task_id: Task the frames are stored under
+            locate: Returns the path of the file being written, or None if it does not exist yet
+            transfer_complete: Returns True once the transfer has finished (or failed)
+            interval_seconds: Interval between frames in seconds
+            max_frames: Maximum number of frames to extract
+            scene_extractor: Optional preloaded SceneExtractor
+            stall_seconds: Fail if the file stops growing for this long (None: wait indefinitely)
+            on_progress: Optional callable(covered, planned) invoked when new scenes are captioned
+        """
+        self.task_id = task_id
+        self.locate = locate
+        self.transfer_complete = transfer_complete
+        self.interval_seconds = interval_seconds
+        self.max_frames = max_frames
+        self.scene_extractor = scene_extractor
+        self.stall_seconds = stall_seconds
+        self.on_progress = on_progress
+
+        self.fps = None
+        self.positions: List[int] = []
+        self.stored = None
+        self.source_size = None
+        # Slot of the planned frame -> caption, for every timestamp covered so far
+        self.covered: Dict[int, str] = {}
+        self.covered_early = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _extractor(self):
+        if self.scene_extractor is None:
+            from app.utils.scene_extraction import SceneExtractor
+            self.scene_extractor = SceneExtractor()
+        return self.scene_extractor
+
+    def start(self) -> 'EarlySceneCaptioner':
+        self._thread = threading.Thread(target=self._run, name=f'early-scenes-{self.task_id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last_size, last_growth = -1, time.monotonic()
+        while not self._stop.is_set() and not self.transfer_complete():
+            path = self.locate()
+            try:
+                size = os.path.getsize(path) if path else 0
+            except OSError:
+                size = 0
+            now = time.monotonic()
+            if size != last_size:
+                last_size, last_growth = size, now
+            elif self.stall_seconds and now - last_growth > self.stall_seconds:
+                self.error = f"Transfer stalled: no data for {self.stall_seconds:.0f} seconds"
+                return
+            end = moov_end_offset(path) if path else None
+            if end and size >= end:
+                try:
+                    self.sample(path)
+                except Exception as e:
+                    # The file may be mid-rename or not decodable yet; try again on the next poll
+                    print(f"Early scene sampling of {path} failed: {str(e)}")
+            self._stop.wait(POLL_SECONDS)
+
+    def wait_for_transfer(self):
+        """
+        Block until the transfer completes, captioning scenes as their data arrives.
+        """
+        if self._thread is not None:
+            self._thread.join()
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def discard(self):
+        """
+        Stop sampling and delete the frames captioned so far, for a cancelled transfer.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.stored is not None:
+            self._extractor().frame_store.delete(self.task_id)
+
+    def coverage(self) -> List[float]:
+        """
+        Timestamps in seconds whose scenes have been captioned so far.
+        """
+        return [self.positions[slot] / self.fps for slot in sorted(self.covered)]
+
+    def _plan(self, fps: float, total_frames: int, height: int, width: int) -> bool:
+        from app.utils.scene_extraction import frame_positions
+        positions = frame_positions(fps, total_frames, self.interval_seconds, self.max_frames)
+        if not positions:
+            return False
+        if positions == self.positions and fps == self.fps and self.stored.shape[1:3] == (height, width):
+            return True
+        # First plan, or the file now reports a different length (fragmented downloads grow
+        # their index as they go); keep the frames already captioned whose positions still hold
+        import numpy as np
+        kept = {}
+        if self.stored is not None and fps == self.fps and self.stored.shape[1:3] == (height, width):
+            kept = {self.positions[slot]: (np.array(self.stored[slot]), caption)
+                    for slot, caption in self.covered.items()}
+        self.fps = fps
+        self.positions = positions
+        self.stored = self._extractor().frame_store.create(self.task_id, len(positions), height, width)
+        self.covered = {}
+        for slot, position in enumerate(positions):
+            if position in kept:
+                self.stored[slot], self.covered[slot] = kept[position]
+        return True
+
+    def _read(self, path: str, position: int):
+        from app.utils.frame_store import decode_frame
+        height, width = self.stored.shape[1:3]
+        return decode_frame(path, position / self.fps, (width, height))
+
+    def sample(self, path: str, final: bool = False) -> int:
+        """
+        Decode and caption the planned frames not covered yet.
+
+        Args:
+            path: Video file, possibly still growing
+            final: The file is complete; read every gap instead of stopping at the first
+                   frame whose data has not arrived
+
+        Returns:
+            Number of scenes newly captioned
+        """
+        import cv2
+        from app.utils.frame_store import analysis_size
+        # Container metadata only; frames are decoded by ffmpeg at the analysis size
+        video = cv2.VideoCapture(path)
+        if not video.isOpened():
+            return 0
+        fps = video.get(cv2.CAP_PROP_FPS)
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.source_size = (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        video.release()
+        width, height = analysis_size(*self.source_size)
+        if fps <= 0 or not self._plan(fps, total_frames, height, width):
+            return 0
+
+        new_slots = []
+        lookahead = int(fps * LOOKAHEAD_SECONDS)
+        for slot, position in enumerate(self.positions):
+            if slot in self.covered:
+                continue
+            image = self._read(path, position)
+            if image is not None and not final:
+                confirmed = (position + lookahead < total_frames
+                             and self._read(path, position + lookahead) is not None)
+                if not confirmed:
+                    image = None
+            if image is None:
+                if final:
+                    continue
+                break
+            self.stored[slot] = image
+            new_slots.append(slot)
+
+        extractor = self._extractor()
+        for start in range(0, len(new_slots), CAPTION_BATCH_SIZE):
+            batch = new_slots[start:start + CAPTION_BATCH_SIZE]
+            for slot, caption in zip(batch, extractor.caption_images([self.stored[slot] for slot in batch])):
+                self.covered[slot] = caption
+        if new_slots and not final:
+            self.covered_early = len(self.covered)
+            print(f"Early captioning: {len(self.covered)}/{len(self.positions)} scenes of {self.task_id}")
+            if self.on_progress:
+                self.on_progress(len(self.covered), len(self.positions))
+        return len(new_slots)
+
+    def finish(self, video_path: str) -> List[Dict]:
+        """
+        Stop sampling, fill the gaps from the complete file and commit the frames.
+
+        Args:
+            video_path: The complete video file
+
+        Returns:
+            Frame dictionaries with descriptions, as from SceneExtractor.describe_frames
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample(video_path, final=True)
+        if not self.positions:
+            raise Exception(f"Could not read frames from video file: {video_path}")
+
+        # Slots that never decoded are dropped, keeping the stored frames contiguous
+        frames = []
+        timestamps = []
+        for slot, position in enumerate(self.positions):
+            if slot not in self.covered:
+                continue
+            i = len(frames)
+            if i != slot:
+                self.stored[i] = self.stored[slot]
+            timestamp = position / self.fps
+            timestamps.append(timestamp)
+            frames.append({
+                "index": i,
+                "timestamp": timestamp,
+                "timestamp_formatted": _format_timestamp(timestamp),
+                "task_id": self.task_id,
+                "url": f"/frames/{self.task_id}/{i}",
+                "description": self.covered[slot],
+            })
+        frame_store = self._extractor().frame_store
+        frame_store.commit(self.task_id, self.stored, timestamps, source_path=video_path,
+                           source_size=self.source_size)
+        frame_store.maybe_collect_garbage()
+        print(f"Captioned {self.covered_early} of {len(frames)} scenes before the transfer completed")
+        return frames
+
+
+def watch_upload(task_id: str, path: str, interval_seconds: float, max_frames: int,
+                 on_progress: Optional[Callable] = None) -> EarlySceneCaptioner:
+    """
+    Start captioning an upload that is still being streamed to path.
+    """
+    return EarlySceneCaptioner(
+        task_id, lambda: path, lambda: not upload_in_progress(path), interval_seconds, max_frames,
+        stall_seconds=UPLOAD_STALL_SECONDS, on_progress=on_progress
+    ).start()
+
+
+def watch_download(task_id: str, download_dir: str, done: threading.Event, interval_seconds: float,
+                   max_frames: int, on_progress: Optional[Callable] = None) -> EarlySceneCaptioner:
+    """
+    Start captioning a yt-dlp download into download_dir; set done when the download returns.
+    """
+    return EarlySceneCaptioner(
+        task_id, lambda: latest_video_file(download_dir), done.is_set, interval_seconds, max_frames,
+        on_progress=on_progress
+    ).start()
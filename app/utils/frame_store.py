@@ -0,0 +1,302 @@
+"""
+Frame artifact store.
+Keeps each task's decoded frames in a single memory-mapped NumPy array (frames.npy)
+next to an index of timestamps (index.json). Consumers map the array instead of
+re-reading image files, thumbnails are encoded only when first requested, and task
+directories older than a TTL are garbage collected.
+
+Stored frames are analysis copies, scaled down by the decoder to at most
+ANALYSIS_FRAME_SIZE pixels on their longer side. Full-resolution frames are decoded
+from the source video only when a frame is requested at full size. The store does not
+keep sources: once a task's source is gone (YouTube downloads are deleted with the
+task's checkpoints) full-size requests raise FullResolutionUnavailable, while
+width-bounded requests are served from the stored frames.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.task_dirs import TaskDirectoryStore
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_ROOT = os.path.join(PROJECT_ROOT, 'frame_store')
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+FRAMES_FILE = 'frames.npy'
+INDEX_FILE = 'index.json'
+THUMBS_DIR = 'thumbs'
+
+IMAGE_FORMATS = {'jpeg': ('JPEG', 'image/jpeg'), 'webp': ('WEBP', 'image/webp')}
+
+# Widths served to galleries; requests are snapped up to the nearest one
+THUMBNAIL_WIDTHS = (160, 320, 640)
+
+# Longer side of the frames decoded for sampling and captioning; captioning resizes to
+# 384 pixels anyway, and the default still covers the largest gallery variant
+ANALYSIS_FRAME_SIZE = int(os.environ.get('ANALYSIS_FRAME_SIZE', 640))
+
+
+class FullResolutionUnavailable(Exception):
+    """
+    Raised when a frame is requested at full size but its source video is no longer available.
+    """
+
+
+def analysis_size(width: int, height: int, max_side: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Size frames are decoded at for analysis: the longer side capped at max_side
+    (default ANALYSIS_FRAME_SIZE), aspect ratio kept, never upscaled.
+
+    Returns:
+        Tuple of (width, height), both even as the scaler expects
+    """
+    max_side = max_side or ANALYSIS_FRAME_SIZE
+    scale = min(1.0, max_side / max(width, height))
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def decode_frame(video_path: str, timestamp: float, size: Tuple[int, int]) -> Optional[np.ndarray]:
+    """
+    Decode the frame at a timestamp with ffmpeg, scaled inside ffmpeg's filter graph.
+    Only the scaled RGB frame leaves the decoder, so a 4K source never materializes
+    full-size frames in this process.
+
+    Args:
+        video_path: Path to the video file (may still be growing)
+        timestamp: Position in seconds
+        size: Output (width, height)
+
+    Returns:
+        RGB array of shape (height, width, 3), or None if the frame could not be decoded
+    """
+    width, height = size
+    command = [
+        'ffmpeg', '-v', 'error', '-nostdin',
+        '-ss', f'{timestamp:.3f}', '-i', video_path,
+        '-frames:v', '1', '-an', '-sn',
+        '-vf', f'scale={width}:{height}:flags=area',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1',
+    ]
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        print(f"Could not run ffmpeg: {str(e)}")
+        return None
+    if completed.returncode != 0 or len(completed.stdout) != width * height * 3:
+        return None
+    return np.frombuffer(completed.stdout, dtype=np.uint8).reshape(height, width, 3)
+
+
+def snap_width(width: Optional[int]) -> Optional[int]:
+    """
+    Round a requested width up to a THUMBNAIL_WIDTHS variant, or None for full size.
+    """
+    if not width:
+        return None
+    for variant in THUMBNAIL_WIDTHS:
+        if width <= variant:
+            return variant
+    return None
+
+
+class FrameStore(TaskDirectoryStore):
+    """
+    Stores decoded video frames per task in memory-mapped arrays.
+    """
+
+    label = 'Frame store'
+
+    def __init__(self, root: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding one subdirectory per task (default: FRAME_STORE_ROOT or <project>/frame_store)
+            ttl_seconds: Age after which a task's frames are deleted (default: FRAME_STORE_TTL or 7 days)
+        """
+        if ttl_seconds is None:
+            ttl_seconds = int(os.environ.get('FRAME_STORE_TTL', DEFAULT_TTL_SECONDS))
+        super().__init__(root or os.environ.get('FRAME_STORE_ROOT', DEFAULT_ROOT), ttl_seconds)
+
+    def on_collected(self, task_ids: List[str]):
+        # Scenes whose keyframes are gone must not be returned by searches any more
+        from app.utils.scene_index import remove_indexed_tasks
+        removed = remove_indexed_tasks(task_ids)
+        if removed:
+            print(f"Removed {removed} scenes of {len(task_ids)} expired tasks from the scene index")
+
+    def create(self, task_id: str, count: int, height: int, width: int) -> np.memmap:
+        """
+        Allocate a writable memory-mapped array for up to count RGB frames.
+
+        Args:
+            task_id: Task the frames belong to
+            count: Maximum number of frames
+            height: Frame height in pixels
+            width: Frame width in pixels
+
+        Returns:
+            Writable array of shape (count, height, width, 3)
+        """
+        task_dir = self.task_dir(task_id)
+        if os.path.exists(task_dir):
+            shutil.rmtree(task_dir)
+        os.makedirs(task_dir)
+        return np.lib.format.open_memmap(
+            os.path.join(task_dir, FRAMES_FILE), mode='w+', dtype=np.uint8, shape=(count, height, width, 3)
+        )
+
+    def commit(self, task_id: str, frames: np.memmap, timestamps: List[float], source_path: Optional[str] = None,
+               source_size: Optional[Tuple[int, int]] = None):
+        """
+        Flush the frames and write the index, making them visible to readers.
+
+        Args:
+            task_id: Task the frames belong to
+            frames: Array returned by create
+            timestamps: Timestamp in seconds of each frame written, in order
+            source_path: Optional path of the source video
+            source_size: Optional (width, height) of the source, when larger than the stored frames
+        """
+        frames.flush()
+        index = {
+            "count": len(timestamps),
+            "timestamps": timestamps,
+            "height": int(frames.shape[1]),
+            "width": int(frames.shape[2]),
+            "source_path": source_path,
+            "created": time.time(),
+        }
+        if source_size:
+            index["source_width"], index["source_height"] = source_size
+        # Write the index atomically so readers never see a partial file
+        index_path = os.path.join(self.task_dir(task_id), INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def exists(self, task_id: str) -> bool:
+        return os.path.exists(os.path.join(self.task_dir(task_id), INDEX_FILE))
+
+    def open(self, task_id: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Map a task's frames read-only.
+
+        Returns:
+            Tuple of (frames array of shape (count, height, width, 3), index dictionary)
+        """
+        task_dir = self.task_dir(task_id)
+        index_path = os.path.join(task_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"No frames stored for task: {task_id}")
+        with open(index_path) as f:
+            index = json.load(f)
+        frames = np.load(os.path.join(task_dir, FRAMES_FILE), mmap_mode='r')
+        return frames[:index["count"]], index
+
+    def frame(self, task_id: str, frame_index: int) -> np.ndarray:
+        """
+        Return one frame as a read-only RGB array view.
+        """
+        frames, index = self.open(task_id)
+        if frame_index < 0 or frame_index >= index["count"]:
+            raise IndexError(f"Invalid frame index {frame_index} for task {task_id}")
+        return frames[frame_index]
+
+    def full_resolution(self, task_id: str, frame_index: int) -> np.ndarray:
+        """
+        Decode a frame at the source's full resolution. The stored frame is returned
+        as is when it already has the source's size.
+
+        Raises:
+            FullResolutionUnavailable: The source video is gone or could not be decoded
+        """
+        frame = self.frame(task_id, frame_index)
+        _, index = self.open(task_id)
+        source_size = (index.get("source_width"), index.get("source_height"))
+        if not all(source_size) or source_size == (index["width"], index["height"]):
+            return frame
+        source_path = index.get("source_path")
+        if not source_path or not os.path.exists(source_path):
+            raise FullResolutionUnavailable(f"Source video of task {task_id} is no longer available")
+        full = decode_frame(source_path, index["timestamps"][frame_index], source_size)
+        if full is None:
+            raise FullResolutionUnavailable(f"Could not decode frame {frame_index} of task {task_id} from its source")
+        return full
+
+    def thumbnail(self, task_id: str, frame_index: int, width: Optional[int] = None, fmt: str = 'jpeg') -> str:
+        """
+        Return the path of an encoded image of a frame, encoding it on first request.
+
+        Args:
+            task_id: Task the frame belongs to
+            frame_index: Index of the frame
+            width: Optional maximum width in pixels; the aspect ratio is kept
+            fmt: 'jpeg' or 'webp'
+
+        Returns:
+            Path to the encoded image file
+
+        Raises:
+            FullResolutionUnavailable: A full-size image was requested (width None) and
+                the source video is no longer available
+        """
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        pil_format, _ = IMAGE_FORMATS[fmt]
+        suffix = f"_{width}" if width else ""
+        thumb_path = os.path.join(self.task_dir(task_id), THUMBS_DIR, f"{frame_index:03d}{suffix}.{fmt}")
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        from PIL import Image
+        frame = self.frame(task_id, frame_index)
+        if width is None:
+            frame = self.full_resolution(task_id, frame_index)
+        elif width > frame.shape[1]:
+            # More pixels than the analysis copy holds: decode this one frame at full size;
+            # the width is only an upper bound, so the stored frame still serves without the source
+            try:
+                frame = self.full_resolution(task_id, frame_index)
+            except FullResolutionUnavailable:
+                pass
+        image = Image.fromarray(np.asarray(frame))
+        if width and width < image.width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, format=pil_format, quality=85)
+        os.replace(tmp_path, thumb_path)
+        return thumb_path
+
+    def pregenerate_thumbnails(self, task_id: str, widths=THUMBNAIL_WIDTHS, formats=('webp', 'jpeg')) -> int:
+        """
+        Encode every size-bounded variant of every frame ahead of the first request.
+        Variants wider than the stored frames are left to be decoded from the source on demand.
+
+        Returns:
+            Number of frames processed
+        """
+        _, index = self.open(task_id)
+        widths = [width for width in widths if width <= index["width"]]
+        for frame_index in range(index["count"]):
+            for width in widths:
+                for fmt in formats:
+                    self.thumbnail(task_id, frame_index, width, fmt)
+        return index["count"]
+
+    def delete(self, task_id: str):
+        shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    store = FrameStore()
+    print(f"Removed {store.collect_garbage()} expired task directories from {store.root}")
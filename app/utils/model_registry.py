@@ -0,0 +1,205 @@
+"""
+Process-wide model registry.
+Models are loaded on first use and shared by every later caller in the same process,
+so a worker pays the load cost once instead of once per task. Speech recognition models
+are hundreds of megabytes to gigabytes each, and the decoding policy switches between
+sizes and precisions, so only the most recently used few of them are kept.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+TRANSLATION_MODEL_TEMPLATE = 'Helsinki-NLP/opus-mt-{source}-{target}'
+
+# A load that failed for another reason than the model not existing (hub, network or
+# disk trouble) is retried after this many seconds
+LOAD_RETRY_SECONDS = float(os.environ.get('MODEL_LOAD_RETRY_SECONDS', 60))
+
+# Speech recognition models (Whisper sizes and precisions, either backend) kept per process
+ASR_MODEL_CACHE_SIZE = max(1, int(os.environ.get('ASR_MODEL_CACHE_SIZE', 2)))
+
+# Least recently used first
+_models: Dict[Hashable, Any] = OrderedDict()
+# Key of every model loaded in a bounded group to its group name
+_groups: Dict[Hashable, str] = {}
+# Failed loads: message, whether the model does not exist, and when to retry (None: never)
+_unavailable: Dict[Hashable, Tuple[str, bool, Optional[float]]] = {}
+_lock = threading.Lock()
+
+
+class ModelUnavailableError(Exception):
+    """
+    Raised when a model cannot be loaded. missing is True when the model does not
+    exist (e.g. no such model on the hub) rather than failing to load for now.
+    """
+
+    def __init__(self, message: str, missing: bool = False):
+        super().__init__(message)
+        self.missing = missing
+
+
+def _model_missing(error: BaseException) -> bool:
+    """
+    Whether a load failed because the model does not exist on the Hugging Face hub.
+    """
+    try:
+        from huggingface_hub.utils import RepositoryNotFoundError
+    except ImportError:
+        return False
+    while error is not None:
+        if isinstance(error, RepositoryNotFoundError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _evict(group: str, keep: int):
+    """
+    Drop the least recently used models of a group until at most keep remain.
+    Callers still holding one keep it alive until they are done with it.
+    """
+    members = [key for key in _models if _groups.get(key) == group]
+    evicted = members[:max(0, len(members) - keep)]
+    for key in evicted:
+        del _models[key]
+        del _groups[key]
+        print(f"Unloaded model {key} to make room for another {group} model")
+    if evicted:
+        gc.collect()
+
+
+def get_model(key: Hashable, loader: Callable[[], Any], group: Optional[str] = None,
+              capacity: Optional[int] = None) -> Any:
+    """
+    Return the cached model for key, loading it with loader on first use.
+    A model that does not exist is remembered for good; other failed loads are retried
+    after LOAD_RETRY_SECONDS.
+
+    Args:
+        key: Cache key identifying the model
+        loader: Zero-argument callable that loads the model
+        group: Optional name of a group of models of which at most capacity are kept;
+               the least recently used is unloaded before another one is loaded
+        capacity: Models kept in group
+
+    Returns:
+        The loaded model
+    """
+    with _lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+        if key in _unavailable:
+            message, missing, retry_at = _unavailable[key]
+            if retry_at is None or time.monotonic() < retry_at:
+                raise ModelUnavailableError(message, missing)
+            del _unavailable[key]
+        if group is not None:
+            # Unloaded first, so two large models are never resident at once
+            _evict(group, capacity - 1)
+        try:
+            _models[key] = loader()
+        except Exception as e:
+            missing = _model_missing(e)
+            message = f"Could not load model {key}: {str(e)}"
+            _unavailable[key] = (message, missing, None if missing else time.monotonic() + LOAD_RETRY_SECONDS)
+            raise ModelUnavailableError(message, missing) from e
+        if group is not None:
+            _groups[key] = group
+        return _models[key]
+
+
+def default_device() -> str:
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def get_whisper_model(model_size: str = 'base', precision: Optional[str] = None):
+    """
+    Return a cached Whisper model of the given size.
+
+    Args:
+        model_size: Whisper model size
+        precision: 'int8' for a CPU model with dynamically quantized linear layers;
+                   anything else loads the regular model (fp16 is chosen per call)
+    """
+    if precision != 'int8':
+        def load():
+            import whisper
+            print(f"Loading Whisper model {model_size}...")
+            return whisper.load_model(model_size)
+        return get_model(('whisper', model_size), load, group='asr', capacity=ASR_MODEL_CACHE_SIZE)
+
+    def load_int8():
+        import torch
+        import whisper
+        print(f"Loading Whisper model {model_size} (int8)...")
+        model = whisper.load_model(model_size, device='cpu')
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return get_model(('whisper', model_size, 'int8'), load_int8, group='asr', capacity=ASR_MODEL_CACHE_SIZE)
+
+
+# CTranslate2 compute types for each precision name used by app.utils.asr_policy
+COMPUTE_TYPES = {'fp32': 'float32', 'fp16': 'float16', 'int8': 'int8'}
+
+
+def get_faster_whisper_model(model_size: str = 'base', precision: Optional[str] = None):
+    """
+    Return a cached faster-whisper (CTranslate2) model of the given size.
+
+    Args:
+        model_size: Whisper model size
+        precision: 'fp32', 'fp16' or 'int8' (default: int8 on CPU, fp16 on a GPU)
+    """
+    device = default_device()
+    if precision is None:
+        precision = 'fp16' if device == 'cuda' else 'int8'
+    compute_type = COMPUTE_TYPES[precision]
+
+    def load():
+        from faster_whisper import WhisperModel
+        from app.utils.worker_runtime import intra_op_threads
+        print(f"Loading faster-whisper model {model_size} ({compute_type}) on {device}...")
+        # CTranslate2 keeps its own thread pool; size it like torch's in this process
+        return WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=intra_op_threads())
+    return get_model(('faster-whisper', model_size, compute_type, device), load, group='asr',
+                     capacity=ASR_MODEL_CACHE_SIZE)
+
+
+def translation_model_name(source_language: str, target_language: str = 'es') -> str:
+    """
+    Name of the Marian model translating source_language into target_language.
+    """
+    return TRANSLATION_MODEL_TEMPLATE.format(source=source_language, target=target_language)
+
+
+def get_translation_model(model_name: str, device: str) -> Tuple[Any, Any]:
+    """
+    Return a cached (tokenizer, model) pair for a Marian translation model.
+    """
+    def load():
+        from transformers import MarianMTModel, MarianTokenizer
+        print(f"Loading translation model {model_name} on {device}...")
+        tokenizer = MarianTokenizer.from_pretrained(model_name)
+        model = MarianMTModel.from_pretrained(model_name).to(device)
+        print("Translation model loaded.")
+        return tokenizer, model
+    return get_model(('marian', model_name, device), load)
+
+
+def get_caption_model(model_name: str, device: str) -> Tuple[Any, Any]:
+    """
+    Return a cached (processor, model) pair for a BLIP image captioning model.
+    """
+    def load():
+        from transformers import BlipForConditionalGeneration, BlipProcessor
+        print(f"Loading image captioning model {model_name} on {device}...")
+        processor = BlipProcessor.from_pretrained(model_name)
+        model = BlipForConditionalGeneration.from_pretrained(model_name).to(device)
+        print("Model loaded successfully!")
+        return processor, model
+    return get_model(('blip', model_name, device), load)
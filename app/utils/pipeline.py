@@ -0,0 +1,477 @@
+"""
+Core video processing pipeline shared by the Celery worker and the Streamlit front end.
+Takes a video and its extracted audio through transcription, Spanish script generation,
+scene extraction and prompt generation. Front ends only handle input, progress and storage.
+"""
+
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.checkpoints import NullCheckpoints
+from app.utils.scene_index import index_scenes
+from app.utils.transcription import get_audio_duration, transcribe_audio_segments
+
+DEFAULT_INTERVAL_SECONDS = 30  # Extract a frame every 30 seconds
+DEFAULT_MAX_FRAMES = 6         # Maximum 6 frames to avoid long processing
+
+
+class NullTracker:
+    """
+    Progress tracker that ignores every update, used when nobody is watching progress.
+    """
+
+    def set_total(self, stage, units):
+        pass
+
+    def start_stage(self, stage, status_msg=None, total=None, learn=True):
+        pass
+
+    def restore_stage(self, stage, status_msg=None):
+        pass
+
+    def advance(self, units=1.0):
+        pass
+
+    def update(self, units_done):
+        pass
+
+    def finish_stage(self):
+        pass
+
+
+def pipeline_stages(is_youtube: bool, model_size: str, max_frames: int = DEFAULT_MAX_FRAMES) -> List[Tuple[str, float]]:
+    """
+    Stages reported by the pipeline, with placeholder sizes until the audio duration is known.
+
+    Args:
+        is_youtube: Whether the first stage is a YouTube download rather than audio extraction
+        model_size: Whisper model size, part of the transcription stage key
+        max_frames: Maximum number of frames extracted
+
+    Returns:
+        Ordered list of (stage key, expected units) pairs for a ProgressTracker
+    """
+    return [
+        ('download' if is_youtube else 'extract_audio', 1),
+        (f'transcribe:{model_size}', 60),
+        ('translate', 1),
+        ('describe', max_frames),
+        ('prompts', max_frames),
+    ]
+
+
+def error_scripts(message: str, spanish_message: Optional[str] = None) -> Tuple[Dict, Dict]:
+    """
+    Build placeholder original and Spanish scripts carrying an error message.
+    """
+    structured_transcript = {
+        "sections": [
+            {
+                "id": "error",
+                "title": "Error",
+                "description": "Error in transcript structure",
+                "content": message
+            }
+        ]
+    }
+    spanish_script = {
+        "sections": [
+            {
+                "id": "error",
+                "title": "Error",
+                "description": "Error en la estructura del guión",
+                "content": spanish_message or message
+            }
+        ]
+    }
+    return structured_transcript, spanish_script
+
+
+def build_scripts(transcription: Dict[str, Any], audio_path: str, audio_duration: Optional[float],
+                  model_size: str = 'base', tracker=None, whisper_model=None) -> Tuple[Dict, Dict]:
+    """
+    Generate the structured original script and the Spanish script, or error
+    placeholders (see error_scripts) if generation fails.
+    Takes the same arguments as generate_scripts.
+    """
+    try:
+        return generate_scripts(transcription, audio_path, audio_duration, model_size=model_size,
+                                tracker=tracker, whisper_model=whisper_model)
+    except Exception as e:
+        print(f"Error generating Spanish script: {str(e)}")
+        traceback.print_exc()
+        # Return a valid structure even on error
+        return error_scripts(str(e))
+
+
+def generate_scripts(transcription: Dict[str, Any], audio_path: str, audio_duration: Optional[float],
+                     model_size: str = 'base', tracker=None, whisper_model=None) -> Tuple[Dict, Dict]:
+    """
+    Generate the structured original script and the Spanish script, raising on failure.
+
+    Args:
+        transcription: Output of transcribe_audio_segments
+        audio_path: Path to the audio, used for Whisper's translate task when needed
+        audio_duration: Audio length in seconds, if known
+        model_size: Whisper model size
+        tracker: Optional progress tracker
+        whisper_model: Optional preloaded Transcriber (or bare openai-whisper model)
+
+    Returns:
+        Tuple of (structured transcript, Spanish script)
+    """
+    tracker = tracker or NullTracker()
+    from app.utils.script_generation import generate_structured_scripts, translation_route
+    language = transcription['language']
+    route = translation_route(language)
+    print(f"Detected language: {language}, translation route: {route}")
+    source_language = language
+    pivot_segments = None
+    if route == 'skip':
+        tracker.set_total('translate', 1)
+    elif route == 'whisper':
+        # No direct model to Spanish: let Whisper translate the speech to English first
+        pivot_segments = transcribe_audio_segments(audio_path, model_size=model_size, task='translate',
+                                                   model=whisper_model)['segments']
+        source_language = 'en'
+    structured_scripts = generate_structured_scripts(
+        transcription['text'],
+        video_duration=audio_duration,
+        progress_callback=tracker.advance,
+        segments=transcription['segments'],
+        source_language=source_language,
+        pivot_segments=pivot_segments
+    )
+    # Extract both original structured transcript and Spanish script
+    structured_transcript = structured_scripts["original"]
+    spanish_script = structured_scripts["spanish"]
+    # Ensure the scripts have the expected structure
+    fallback = error_scripts("The transcript does not have the expected structure.",
+                             "El guión no tiene la estructura esperada.")
+    if not isinstance(structured_transcript, dict) or 'sections' not in structured_transcript:
+        structured_transcript = fallback[0]
+    if not isinstance(spanish_script, dict) or 'sections' not in spanish_script:
+        spanish_script = fallback[1]
+    return structured_transcript, spanish_script
+
+
+def error_scenes(message: str) -> List[Dict[str, Any]]:
+    """
+    Build a placeholder scene list carrying an error message.
+    """
+    return [{
+        "index": 0,
+        "timestamp": 0,
+        "timestamp_formatted": "00:00",
+        "description": f"Error extracting scenes: {message}"
+    }]
+
+
+def extract_scenes(video_path: str, task_id: Optional[str] = None, tracker=None,
+                   interval_seconds: int = DEFAULT_INTERVAL_SECONDS, max_frames: int = DEFAULT_MAX_FRAMES,
+                   scene_extractor=None, prompt_generator=None, early_scenes=None) -> List[Dict[str, Any]]:
+    """
+    Extract frames, caption them and generate AI prompts for each scene, or an error
+    placeholder (see error_scenes) if extraction fails.
+    Takes the same arguments as generate_scenes.
+    """
+    try:
+        return generate_scenes(video_path, task_id=task_id, tracker=tracker, interval_seconds=interval_seconds,
+                               max_frames=max_frames, scene_extractor=scene_extractor,
+                               prompt_generator=prompt_generator, early_scenes=early_scenes)
+    except Exception as e:
+        print(f"Error extracting scenes: {str(e)}")
+        traceback.print_exc()
+        # Return a valid structure even on error
+        return error_scenes(str(e))
+
+
+def generate_scenes(video_path: str, task_id: Optional[str] = None, tracker=None,
+                    interval_seconds: int = DEFAULT_INTERVAL_SECONDS, max_frames: int = DEFAULT_MAX_FRAMES,
+                    scene_extractor=None, prompt_generator=None, early_scenes=None) -> List[Dict[str, Any]]:
+    """
+    Extract frames, caption them and generate AI prompts for each scene, raising on failure.
+
+    Args:
+        video_path: Path to the video file
+        task_id: Optional task ID used to name the frame directory
+        tracker: Optional progress tracker
+        interval_seconds: Interval between frames in seconds
+        max_frames: Maximum number of frames to extract
+        scene_extractor: Optional preloaded SceneExtractor
+        prompt_generator: Optional PromptGenerator
+        early_scenes: Optional EarlySceneCaptioner that has been captioning the video while it
+                      was transferred; only the scenes it has not covered are extracted here
+
+    Returns:
+        List of scene dictionaries with descriptions and prompts
+    """
+    tracker = tracker or NullTracker()
+    # Scenes captioned during the transfer took no time in this stage, so its duration
+    # says nothing about the cost per frame
+    tracker.start_stage('describe', 'Extracting and describing scenes', learn=early_scenes is None)
+    if early_scenes is not None:
+        scenes = early_scenes.finish(video_path)
+        scene_extractor = early_scenes.scene_extractor
+        tracker.set_total('describe', len(scenes))
+        tracker.set_total('prompts', len(scenes))
+        tracker.advance(len(scenes))
+    else:
+        if scene_extractor is None:
+            from app.utils.scene_extraction import SceneExtractor
+            scene_extractor = SceneExtractor()
+        frames = scene_extractor.extract_frames(
+            video_path,
+            interval_seconds=interval_seconds,
+            max_frames=max_frames,
+            task_id=task_id  # Pass the task ID for frame directory naming
+        )
+        tracker.set_total('describe', len(frames))
+        tracker.set_total('prompts', len(frames))
+        scenes = scene_extractor.describe_frames(frames, progress_callback=tracker.advance)
+    if scenes:
+        # Galleries request small variants, so encode them while the frames are hot
+        scene_extractor.frame_store.pregenerate_thumbnails(scenes[0]["task_id"])
+    index_scenes(scenes, frame_store=scene_extractor.frame_store)
+
+    # Generate AI prompts for each scene
+    tracker.start_stage('prompts', 'Generating AI prompts for scenes')
+    if prompt_generator is None:
+        from app.utils.prompt_generation import PromptGenerator
+        prompt_generator = PromptGenerator()
+    scenes_with_prompts = prompt_generator.generate_prompts_for_scenes(scenes)
+    tracker.finish_stage()
+    return scenes_with_prompts
+
+
+def run_pipeline(video_path: str, audio_path: str, model_size: str = 'base', task_id: Optional[str] = None,
+                 tracker=None, interval_seconds: int = DEFAULT_INTERVAL_SECONDS,
+                 max_frames: int = DEFAULT_MAX_FRAMES, whisper_model=None, scene_extractor=None,
+                 prompt_generator=None, checkpoints=None, early_scenes=None, asr_plan=None) -> Dict[str, Any]:
+    """
+    Run every stage after audio extraction.
+
+    Args:
+        video_path: Path to the video file
+        audio_path: Path to the extracted 16 kHz mono WAV
+        model_size: Whisper model size
+        task_id: Optional task ID used to name the frame directory
+        tracker: Optional progress tracker; its first stage must already be started or restored
+        interval_seconds: Interval between frames in seconds
+        max_frames: Maximum number of frames to extract
+        whisper_model: Optional preloaded Transcriber (or bare openai-whisper model)
+        scene_extractor: Optional preloaded SceneExtractor
+        prompt_generator: Optional PromptGenerator
+        checkpoints: Optional TaskCheckpoints; completed stages are loaded from it instead
+                     of being recomputed, and stages that newly completed without error
+                     are saved to it
+        early_scenes: Optional EarlySceneCaptioner started while the video was transferred
+        asr_plan: Optional DecodingPlan from app.utils.asr_policy; transcription then uses its
+                  model and decoding options, and its realized real-time factor is recorded
+
+    Returns:
+        Dictionary with transcript, language, segments, structured_transcript,
+        spanish_script and scenes
+    """
+    tracker = tracker or NullTracker()
+    checkpoints = checkpoints or NullCheckpoints()
+    transcribe_stage = f'transcribe:{model_size}'
+
+    audio_duration = get_audio_duration(audio_path)
+    if audio_duration:
+        tracker.set_total(transcribe_stage, audio_duration)
+        # A 512-token translation chunk holds roughly two minutes of speech
+        tracker.set_total('translate', max(1, round(audio_duration / 120)))
+        frame_count = min(max_frames, int(audio_duration // interval_seconds) + 1)
+        tracker.set_total('describe', frame_count)
+        tracker.set_total('prompts', frame_count)
+
+    transcription = checkpoints.load('transcribe')
+    if transcription is not None:
+        # Restored stages advance progress without skewing the learned stage costs
+        tracker.restore_stage(transcribe_stage, 'Transcribing audio')
+    else:
+        tracker.start_stage(transcribe_stage, 'Transcribing audio')
+        if asr_plan is not None and whisper_model is None:
+            whisper_model = asr_plan.load_model()
+        started = time.monotonic()
+        transcription = transcribe_audio_segments(audio_path, model_size=model_size,
+                                                  progress_callback=tracker.update, model=whisper_model,
+                                                  options=asr_plan.options() if asr_plan else None)
+        if asr_plan is not None:
+            asr_plan.record(audio_duration, time.monotonic() - started)
+        checkpoints.save('transcribe', transcription)
+
+    # Generate Spanish script
+    scripts = checkpoints.load('scripts')
+    if scripts is not None:
+        tracker.restore_stage('translate', 'Generating Spanish script')
+    else:
+        tracker.start_stage('translate', 'Generating Spanish script')
+        try:
+            scripts = generate_scripts(
+                transcription, audio_path, audio_duration, model_size=model_size, tracker=tracker,
+                whisper_model=whisper_model
+            )
+            checkpoints.save('scripts', scripts)
+        except Exception as e:
+            # The placeholder goes into the result but not the checkpoint, so a retry
+            # generates the scripts again instead of resuming into the failure
+            print(f"Error generating Spanish script: {str(e)}")
+            traceback.print_exc()
+            scripts = error_scripts(str(e))
+    structured_transcript, spanish_script = scripts
+
+    # Extract and describe scenes from the video
+    scenes = checkpoints.load('scenes')
+    if scenes is not None:
+        tracker.restore_stage('describe', 'Extracting and describing scenes')
+        tracker.restore_stage('prompts', 'Generating AI prompts for scenes')
+    else:
+        try:
+            scenes = generate_scenes(
+                video_path, task_id=task_id, tracker=tracker,
+                interval_seconds=interval_seconds, max_frames=max_frames,
+                scene_extractor=scene_extractor, prompt_generator=prompt_generator,
+                early_scenes=early_scenes
+            )
+            checkpoints.save('scenes', scenes)
+        except Exception as e:
+            print(f"Error extracting scenes: {str(e)}")
+            traceback.print_exc()
+            scenes = error_scenes(str(e))
+
+    return {
+        "transcript": transcription['text'],
+        "language": transcription['language'],
+        "segments": transcription['segments'],
+        "structured_transcript": structured_transcript,
+        "spanish_script": spanish_script,
+        "scenes": scenes,
+    }
+
+
+def build_scripts_batch(items: List[Dict[str, Any]], model_size: str = 'base',
+                        whisper_model=None) -> List[Tuple[Dict, Dict]]:
+    """
+    Generate scripts for several videos, sharing one translation pass per source language.
+    Section texts of every video with the same source language go through a single
+    batched Marian call instead of one call per video.
+
+    Args:
+        items: Dictionaries with transcription, audio_path and audio_duration keys
+        model_size: Whisper model size
+        whisper_model: Optional preloaded Transcriber (or bare openai-whisper model)
+
+    Returns:
+        List of (structured transcript, Spanish script) tuples, in the order of items
+    """
+    from app.utils.script_generation import ScriptGenerator, translation_route
+    results: List[Optional[Tuple[Dict, Dict]]] = [None] * len(items)
+    groups: Dict[str, List[Tuple[int, Dict[str, Any], Optional[List[Dict]]]]] = {}
+
+    for i, item in enumerate(items):
+        transcription = item['transcription']
+        if not transcription.get('segments'):
+            # Nothing to section by time; the single-video text path handles it
+            results[i] = build_scripts(transcription, item['audio_path'], item['audio_duration'],
+                                       model_size=model_size, whisper_model=whisper_model)
+            continue
+        try:
+            language = transcription['language']
+            route = translation_route(language)
+            print(f"Detected language: {language}, translation route: {route}")
+            source_language = language
+            pivot_segments = None
+            if route == 'whisper':
+                pivot_segments = transcribe_audio_segments(item['audio_path'], model_size=model_size,
+                                                           task='translate', model=whisper_model)['segments']
+                source_language = 'en'
+            groups.setdefault(source_language, []).append((i, item, pivot_segments))
+        except Exception as e:
+            print(f"Error generating Spanish script: {str(e)}")
+            traceback.print_exc()
+            results[i] = error_scripts(str(e))
+
+    for source_language, members in groups.items():
+        try:
+            generator = ScriptGenerator(source_language=source_language)
+            sectioned = [
+                generator.segment_section_texts(item['transcription']['segments'], item['audio_duration'],
+                                                pivot_segments=pivot_segments)
+                for _, item, pivot_segments in members
+            ]
+            flat_texts = [text for _, to_translate in sectioned for text in to_translate]
+            print(f"Translating {len(flat_texts)} sections from {len(members)} videos ({source_language})")
+            translations = generator.translate_texts(flat_texts)
+            section_count = len(flat_texts) // len(members)
+            for k, ((i, _, _), (originals, _)) in enumerate(zip(members, sectioned)):
+                scripts = generator.format_scripts(
+                    originals, translations[k * section_count:(k + 1) * section_count]
+                )
+                results[i] = (scripts["original"], scripts["spanish"])
+        except Exception as e:
+            print(f"Error generating Spanish scripts for {source_language}: {str(e)}")
+            traceback.print_exc()
+            for i, _, _ in members:
+                results[i] = error_scripts(str(e))
+
+    return results
+
+
+def extract_scenes_batch(videos: List[Tuple[str, str]], interval_seconds: int = DEFAULT_INTERVAL_SECONDS,
+                         max_frames: int = DEFAULT_MAX_FRAMES, scene_extractor=None,
+                         prompt_generator=None) -> List[List[Dict[str, Any]]]:
+    """
+    Extract and describe scenes for several videos with one batched captioning pass.
+
+    Args:
+        videos: List of (video path, task ID) pairs
+        interval_seconds: Interval between frames in seconds
+        max_frames: Maximum number of frames to extract per video
+        scene_extractor: Optional preloaded SceneExtractor
+        prompt_generator: Optional PromptGenerator
+
+    Returns:
+        List of scene lists, in the order of videos
+    """
+    if scene_extractor is None:
+        from app.utils.scene_extraction import SceneExtractor
+        scene_extractor = SceneExtractor()
+    if prompt_generator is None:
+        from app.utils.prompt_generation import PromptGenerator
+        prompt_generator = PromptGenerator()
+
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(videos)
+    extracted: List[Tuple[int, List[Dict[str, Any]]]] = []
+    for i, (video_path, task_id) in enumerate(videos):
+        try:
+            frames = scene_extractor.extract_frames(
+                video_path, interval_seconds=interval_seconds, max_frames=max_frames, task_id=task_id
+            )
+            if frames:
+                scene_extractor.frame_store.pregenerate_thumbnails(frames[0]["task_id"])
+            extracted.append((i, frames))
+        except Exception as e:
+            print(f"Error extracting scenes: {str(e)}")
+            traceback.print_exc()
+            results[i] = error_scenes(str(e))
+
+    try:
+        # Caption every video's frames together so BLIP runs on full batches
+        all_frames = [frame for _, frames in extracted for frame in frames]
+        all_scenes = scene_extractor.describe_frames(all_frames)
+        index_scenes(all_scenes, frame_store=scene_extractor.frame_store)
+        offset = 0
+        for i, frames in extracted:
+            scenes = all_scenes[offset:offset + len(frames)]
+            offset += len(frames)
+            results[i] = prompt_generator.generate_prompts_for_scenes(scenes)
+    except Exception as e:
+        print(f"Error describing scenes: {str(e)}")
+        traceback.print_exc()
+        for i, _ in extracted:
+            results[i] = error_scenes(str(e))
+
+    return results
@@ -0,0 +1,215 @@
+"""
+Work-based progress reporting for pipeline tasks.
+Progress is computed from the units of work each stage has completed (audio seconds
+transcribed, chunks translated, frames captioned), weighted by per-stage cost estimates
+learned from previous runs, and written to Redis at a bounded rate.
+"""
+
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+
+STAGE_COSTS_KEY = 'pipeline:stage-costs'
+
+# Seconds of work per unit, used until real runs have been recorded
+DEFAULT_STAGE_COSTS = {
+    'download': 20.0,         # per video
+    'extract_audio': 2.0,     # per video
+    'transcribe': 0.5,        # per audio second
+    'translate': 4.0,         # per chunk
+    'describe': 3.0,          # per frame
+    'prompts': 0.01,          # per scene
+}
+
+# Weight of the newest observation in the moving average of stage costs
+COST_SMOOTHING = 0.2
+
+
+def _base_stage(stage: str) -> str:
+    # Stage keys may carry a variant suffix, e.g. "transcribe:base"
+    return stage.split(':', 1)[0]
+
+
+class ProgressTracker:
+    """
+    Tracks the units of work done per stage and reports weighted progress and an ETA.
+    """
+
+    def __init__(self, task_id: str, stages: List[Tuple[str, float]], redis_url: Optional[str] = None,
+                 min_interval: Optional[float] = None, reporter: Optional[Callable] = None):
+        """
+        Initialize the tracker.
+
+        Args:
+            task_id: The ID of the task being tracked
+            stages: Ordered list of (stage key, expected units) pairs
+            redis_url: Redis URL holding the learned stage costs
+            min_interval: Minimum seconds between progress writes
+            reporter: Callable(task_id, progress, status_msg, eta_seconds) that stores progress
+        """
+        self.task_id = task_id
+        self.redis_url = redis_url or os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+        if min_interval is None:
+            min_interval = float(os.environ.get('PROGRESS_MIN_INTERVAL', 1.0))
+        self.min_interval = min_interval
+        if reporter is None:
+            from app.utils.transcription import set_task_progress
+            reporter = set_task_progress
+        self.reporter = reporter
+
+        self.order = [stage for stage, _ in stages]
+        self.totals = {stage: max(float(units), 1e-9) for stage, units in stages}
+        self.done = {stage: 0.0 for stage in self.order}
+        self.costs = self._load_costs()
+
+        self.current = None
+        self.status_msg = None
+        self._stage_started = None
+        self._learn = True
+        self._last_write = 0.0
+        self._last_progress = 0
+
+    def _load_costs(self) -> Dict[str, float]:
+        costs = {stage: DEFAULT_STAGE_COSTS.get(_base_stage(stage), 1.0) for stage in self.order}
+        try:
+            stored = redis.Redis.from_url(self.redis_url).hgetall(STAGE_COSTS_KEY)
+            for stage in self.order:
+                value = stored.get(stage.encode('utf-8'))
+                if value:
+                    costs[stage] = float(value)
+        except Exception as e:
+            print(f"Error loading stage costs: {str(e)}")
+        return costs
+
+    def _record_cost(self, stage: str, seconds_per_unit: float):
+        # Exponential moving average so the estimates follow hardware and model changes
+        previous = self.costs.get(stage, seconds_per_unit)
+        updated = (1 - COST_SMOOTHING) * previous + COST_SMOOTHING * seconds_per_unit
+        self.costs[stage] = updated
+        try:
+            redis.Redis.from_url(self.redis_url).hset(STAGE_COSTS_KEY, stage, updated)
+        except Exception as e:
+            print(f"Error recording stage cost: {str(e)}")
+
+    def set_total(self, stage: str, units: float):
+        """
+        Replace the expected units of a stage once the real amount of work is known.
+
+        Args:
+            stage: Stage key
+            units: Expected number of units
+        """
+        self.totals[stage] = max(float(units), 1e-9)
+
+    def start_stage(self, stage: str, status_msg: Optional[str] = None, total: Optional[float] = None,
+                    learn: bool = True):
+        """
+        Mark the beginning of a stage and report it immediately.
+
+        Args:
+            stage: Stage key
+            status_msg: Status message shown to users
+            total: Expected units, if now known
+            learn: Learn the stage's cost per unit when it finishes; False when part of
+                   its work was done elsewhere, so its duration is no estimate
+        """
+        if self.current and self.current != stage:
+            self.finish_stage()
+        if total is not None:
+            self.set_total(stage, total)
+        self.current = stage
+        self.status_msg = status_msg
+        self._stage_started = time.monotonic()
+        self._learn = learn
+        self.report(force=True)
+
+    def restore_stage(self, stage: str, status_msg: Optional[str] = None):
+        """
+        Mark a stage whose output already exists (e.g. restored from a checkpoint) as
+        done, without learning a cost from it.
+
+        Args:
+            stage: Stage key
+            status_msg: Status message shown to users
+        """
+        if self.current and self.current != stage:
+            self.finish_stage()
+        self.done[stage] = self.totals[stage]
+        self.current = None
+        self.status_msg = status_msg
+        self.report(force=True)
+
+    def advance(self, units: float = 1.0):
+        """
+        Add completed units to the current stage.
+
+        Args:
+            units: Number of units completed since the last call
+        """
+        if self.current is None:
+            return
+        self.update(self.done[self.current] + units)
+
+    def update(self, units_done: float):
+        """
+        Set the absolute number of completed units in the current stage.
+
+        Args:
+            units_done: Units completed so far
+        """
+        if self.current is None:
+            return
+        self.done[self.current] = min(float(units_done), self.totals[self.current])
+        self.report()
+
+    def finish_stage(self):
+        """
+        Complete the current stage and learn its cost per unit (unless started with learn=False).
+        """
+        stage = self.current
+        if stage is None:
+            return
+        elapsed = time.monotonic() - self._stage_started
+        units = self.totals[stage]
+        self.done[stage] = units
+        if units >= 1 and self._learn:
+            self._record_cost(stage, elapsed / units)
+        self.current = None
+
+    def _remaining_seconds(self) -> float:
+        remaining = 0.0
+        for stage in self.order:
+            left = self.totals[stage] - self.done[stage]
+            cost = self.costs[stage]
+            if stage == self.current and self.done[stage] > 0:
+                # Prefer the rate observed in this run for the stage in progress
+                cost = (time.monotonic() - self._stage_started) / self.done[stage]
+            remaining += left * cost
+        return remaining
+
+    def progress(self) -> int:
+        """
+        Weighted percentage of work completed, capped at 99 until the task completes.
+        """
+        total_cost = sum(self.totals[s] * self.costs[s] for s in self.order)
+        done_cost = sum(self.done[s] * self.costs[s] for s in self.order)
+        percentage = int(100 * done_cost / total_cost) if total_cost > 0 else 0
+        # Stage totals can be revised upwards, so never report going backwards
+        return max(self._last_progress, min(percentage, 99))
+
+    def report(self, force: bool = False):
+        """
+        Write progress to the backend, throttled to one write per min_interval seconds.
+
+        Args:
+            force: Write even if the minimum interval has not elapsed
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        self._last_progress = self.progress()
+        self.reporter(self.task_id, self._last_progress, self.status_msg,
+                      eta_seconds=int(self._remaining_seconds()))
@@ -5,17 +5,40 @@ This module generates AI image and video prompts from scene descriptions.
 
 import re
 import random
-from typing import List, Dict, Any, Optional
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Tuple
+
+# Non-descriptive phrases stripped from captions
+FILLER_PATTERN = re.compile(r'(image of|picture of|photo of|showing|depicting)')
+
+DEFAULT_DESCRIPTION = "A professional video scene with good lighting and composition"
+
+# Scene types that also get a mood enhancement
+MOOD_SCENE_TYPES = frozenset(["interview", "presentation", "group"])
+
+# Video-specific elements appended to image prompts
+VIDEO_ELEMENTS = [
+    "smooth camera movement",
+    "15 second clip",
+    "natural motion",
+    "realistic movement",
+    "professional video quality"
+]
 
 class PromptGenerator:
     """
     Generates AI image and video prompts from scene descriptions.
     """
     
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         """
         Initialize the prompt generator with style templates and enhancement phrases.
+        
+        Args:
+            seed: Optional seed for reproducible prompts
         """
+        self.rng = random.Random(seed)
+        
         # Style templates for different visual aesthetics
         self.style_templates = [
             "photorealistic, detailed, 8k resolution, professional photography",
@@ -63,52 +86,93 @@ class PromptGenerator:
             "product": ["product", "device", "gadget", "technology", "item"],
             "group": ["group", "people", "crowd", "audience", "team"]
         }
+        
+        # Scene keywords compiled into a single pattern
+        self._compile_keywords()
     
-    def enhance_description(self, description: str) -> str:
+    def _compile_keywords(self):
         """
-        Enhance a basic scene description with more details.
+        Compile every scene keyword into one alternation scanned in a single pass.
+        The lookahead reports overlapping occurrences, and alternatives are ordered so
+        that when keywords start at the same position the earlier scene type wins.
+        """
+        self._keyword_types = {}
+        for stype, keywords in self.scene_keywords.items():
+            for keyword in keywords:
+                self._keyword_types.setdefault(keyword, stype)
+        self._type_rank = {stype: rank for rank, stype in enumerate(self.scene_keywords)}
+        alternatives = sorted(self._keyword_types, key=lambda keyword: self._type_rank[self._keyword_types[keyword]])
+        self._keyword_pattern = re.compile('(?=(' + '|'.join(map(re.escape, alternatives)) + '))')
+    
+    def clean_description(self, description: str) -> Optional[str]:
+        """
+        Lower-case a caption and strip non-descriptive phrases.
         
-        Args:
-            description: The original scene description
-            
         Returns:
-            Enhanced description with more details
+            The cleaned description, or None if there is nothing to describe
         """
-        # Clean the description
         description = description.strip().lower()
         if not description or description == "no description available":
-            return "A professional video scene with good lighting and composition"
-        
-        # Remove any non-descriptive phrases
-        description = re.sub(r'(image of|picture of|photo of|showing|depicting)', '', description)
-        
-        # Determine scene type based on keywords
-        scene_type = "general"
-        for stype, keywords in self.scene_keywords.items():
-            if any(keyword in description for keyword in keywords):
-                scene_type = stype
-                break
-        
-        # Add enhancements based on scene type
-        enhancements = []
-        
-        # Always add quality enhancement
-        enhancements.append(random.choice(self.enhancement_phrases["quality"]))
-        
-        # Add lighting enhancement
-        enhancements.append(random.choice(self.enhancement_phrases["lighting"]))
+            return None
+        return FILLER_PATTERN.sub('', description)
+    
+    def classify_descriptions(self, descriptions: List[Optional[str]]) -> List[str]:
+        """
+        Determine the scene type of many cleaned descriptions with one scan over all of them.
         
-        # Add camera enhancement
-        enhancements.append(random.choice(self.enhancement_phrases["camera"]))
+        Args:
+            descriptions: Cleaned descriptions (None entries are classified as general)
+            
+        Returns:
+            Scene type of each description; the first matching type in scene_keywords order
+        """
+        starts = []
+        offset = 0
+        for description in descriptions:
+            starts.append(offset)
+            offset += len(description or '') + 1
+        joined = '\n'.join(description or '' for description in descriptions)
+        
+        scene_types = ["general"] * len(descriptions)
+        ranks = [len(self._type_rank)] * len(descriptions)
+        for match in self._keyword_pattern.finditer(joined):
+            i = bisect_right(starts, match.start()) - 1
+            stype = self._keyword_types[match.group(1)]
+            if self._type_rank[stype] < ranks[i]:
+                ranks[i] = self._type_rank[stype]
+                scene_types[i] = stype
+        return scene_types
+    
+    def _enhance(self, description: Optional[str], scene_type: str) -> str:
+        if description is None:
+            return DEFAULT_DESCRIPTION
+        
+        # Always add quality, lighting and camera enhancements
+        enhancements = [
+            self.rng.choice(self.enhancement_phrases["quality"]),
+            self.rng.choice(self.enhancement_phrases["lighting"]),
+            self.rng.choice(self.enhancement_phrases["camera"]),
+        ]
         
         # Add mood enhancement for certain scene types
-        if scene_type in ["interview", "presentation", "group"]:
-            enhancements.append(random.choice(self.enhancement_phrases["mood"]))
+        if scene_type in MOOD_SCENE_TYPES:
+            enhancements.append(self.rng.choice(self.enhancement_phrases["mood"]))
         
         # Combine the original description with enhancements
-        enhanced = f"{description}, {', '.join(enhancements)}"
+        return f"{description}, {', '.join(enhancements)}"
+    
+    def enhance_description(self, description: str) -> str:
+        """
+        Enhance a basic scene description with more details.
         
-        return enhanced
+        Args:
+            description: The original scene description
+            
+        Returns:
+            Enhanced description with more details
+        """
+        cleaned = self.clean_description(description)
+        return self._enhance(cleaned, self.classify_descriptions([cleaned])[0])
     
     def generate_image_prompt(self, scene: Dict[str, Any]) -> str:
         """
@@ -120,19 +184,13 @@ class PromptGenerator:
         Returns:
             AI image prompt string
         """
-        description = scene.get("description", "")
-        timestamp = scene.get("timestamp_formatted", "")
-        
-        # Enhance the basic description
-        enhanced_desc = self.enhance_description(description)
-        
-        # Add a style template
-        style = random.choice(self.style_templates)
-        
-        # Construct the final prompt
-        prompt = f"{enhanced_desc}. {style}"
-        
-        return prompt
+        enhanced_desc = self.enhance_description(scene.get("description", ""))
+        return f"{enhanced_desc}. {self.rng.choice(self.style_templates)}"
+    
+    def _video_prompt(self, image_prompt: str) -> str:
+        # Add 3 random video elements
+        selected_elements = self.rng.sample(VIDEO_ELEMENTS, k=min(3, len(VIDEO_ELEMENTS)))
+        return f"{image_prompt}, {', '.join(selected_elements)}"
     
     def generate_video_prompt(self, scene: Dict[str, Any]) -> str:
         """
@@ -144,25 +202,26 @@ class PromptGenerator:
         Returns:
             AI video prompt string
         """
-        # Start with the image prompt
-        image_prompt = self.generate_image_prompt(scene)
-        
-        # Add video-specific elements
-        video_elements = [
-            "smooth camera movement",
-            "15 second clip",
-            "natural motion",
-            "realistic movement",
-            "professional video quality"
-        ]
-        
-        # Add 2-3 random video elements
-        selected_elements = random.sample(video_elements, k=min(3, len(video_elements)))
-        
-        # Construct the final video prompt
-        prompt = f"{image_prompt}, {', '.join(selected_elements)}"
+        return self._video_prompt(self.generate_image_prompt(scene))
+    
+    def generate_prompts_batch(self, descriptions: List[str]) -> List[Tuple[str, str]]:
+        """
+        Generate image and video prompts for many scene descriptions at once.
+        Scenes are classified in one pass, and each scene's video prompt extends its
+        image prompt instead of enhancing the description a second time.
         
-        return prompt
+        Args:
+            descriptions: Scene descriptions
+            
+        Returns:
+            List of (image prompt, video prompt) tuples
+        """
+        cleaned = [self.clean_description(description) for description in descriptions]
+        prompts = []
+        for description, scene_type in zip(cleaned, self.classify_descriptions(cleaned)):
+            image_prompt = f"{self._enhance(description, scene_type)}. {self.rng.choice(self.style_templates)}"
+            prompts.append((image_prompt, self._video_prompt(image_prompt)))
+        return prompts
     
     def generate_prompts_for_scenes(self, scenes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -174,8 +233,9 @@ class PromptGenerator:
         Returns:
             List of scene dictionaries with added prompt fields
         """
-        for scene in scenes:
-            scene["image_prompt"] = self.generate_image_prompt(scene)
-            scene["video_prompt"] = self.generate_video_prompt(scene)
+        prompts = self.generate_prompts_batch([scene.get("description", "") for scene in scenes])
+        for scene, (image_prompt, video_prompt) in zip(scenes, prompts):
+            scene["image_prompt"] = image_prompt
+            scene["video_prompt"] = video_prompt
         
         return scenes
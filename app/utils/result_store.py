@@ -0,0 +1,336 @@
+"""
+Lifecycle of task results in Redis.
+Large result fields of the celery-task-meta-* hashes are compressed (zstd when installed,
+gzip otherwise) and, above a size threshold, spilled to a content-addressed object store on
+disk, so identical payloads are stored once and Redis keeps only a short reference. Task
+hashes expire after a TTL, and a sweeper sets missing TTLs, compacts hashes written before
+this scheme, and deletes objects no hash refers to.
+
+    python -m app.utils.result_store report
+    python -m app.utils.result_store sweep
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from app.utils import artifacts
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_ROOT = os.path.join(PROJECT_ROOT, 'result_store')
+
+TASK_KEY_PREFIX = 'celery-task-meta-'
+SWEEP_LOCK_KEY = 'result-store:last-sweep'
+
+# Hash fields holding result payloads; everything else is small progress metadata
+PAYLOAD_FIELDS = ('transcript', 'structured_transcript', 'spanish_script', 'scenes')
+
+# Payload fields stored as typed artifacts (see app.utils.artifacts); the rest is text
+FIELD_KINDS = {'structured_transcript': 'script', 'spanish_script': 'script', 'scenes': 'scenes'}
+
+RESULT_TTL_SECONDS = int(os.environ.get('RESULT_TTL', 7 * 24 * 3600))
+COMPRESS_MIN_BYTES = int(os.environ.get('RESULT_COMPRESS_MIN_BYTES', 1024))
+SPILL_MIN_BYTES = int(os.environ.get('RESULT_SPILL_MIN_BYTES', 64 * 1024))
+SWEEP_INTERVAL_SECONDS = 3600
+# Objects younger than this are never collected, so a result being written is safe
+GC_GRACE_SECONDS = 3600
+
+# Encoded values start with a NUL byte, which never begins plain text or JSON
+ZSTD_MARKER = b'\x00zst\x00'
+GZIP_MARKER = b'\x00gz\x00'
+REF_MARKER = b'\x00ref\x00'
+
+
+def compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return ZSTD_MARKER + zstandard.ZstdCompressor(level=10).compress(data)
+    return GZIP_MARKER + gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def decompress(raw: bytes) -> bytes:
+    if raw.startswith(ZSTD_MARKER):
+        if zstandard is None:
+            raise RuntimeError("Result was compressed with zstd but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(raw[len(ZSTD_MARKER):])
+    if raw.startswith(GZIP_MARKER):
+        return gzip.decompress(raw[len(GZIP_MARKER):])
+    return raw
+
+
+class ObjectStore:
+    """
+    Content-addressed store for spilled result payloads.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory for objects (default: RESULT_STORE_ROOT or <project>/result_store);
+                  must be shared by the web and worker processes
+        """
+        self.root = root or os.environ.get('RESULT_STORE_ROOT', DEFAULT_ROOT)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+            raise ValueError(f"Invalid object digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, digest: str, data: bytes):
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Same content already stored; refresh it so collection sees it as recent
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def usage(self) -> Dict[str, int]:
+        objects = size = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                objects += 1
+                size += os.path.getsize(os.path.join(dirpath, name))
+        return {"objects": objects, "bytes": size}
+
+    def collect_garbage(self, live: Iterable[str], grace_seconds: int = GC_GRACE_SECONDS) -> int:
+        """
+        Delete objects that no task hash refers to.
+
+        Returns:
+            Number of objects removed
+        """
+        live = set(live)
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name in live:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+_object_store: Optional[ObjectStore] = None
+
+
+def get_object_store() -> ObjectStore:
+    global _object_store
+    if _object_store is None:
+        _object_store = ObjectStore()
+    return _object_store
+
+
+def encode_value(value, store: Optional[ObjectStore] = None) -> bytes:
+    """
+    Encode a payload for a hash field: small values as they are, larger ones compressed,
+    and the largest spilled to the object store behind a reference.
+    """
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    if len(data) < COMPRESS_MIN_BYTES:
+        return data
+    compressed = compress(data)
+    if len(compressed) < SPILL_MIN_BYTES:
+        return compressed
+    digest = hashlib.sha256(data).hexdigest()
+    (store or get_object_store()).put(digest, compressed)
+    return REF_MARKER + digest.encode('ascii')
+
+
+def decode_value(raw: Optional[bytes], store: Optional[ObjectStore] = None) -> Optional[bytes]:
+    """
+    Undo encode_value: resolve object store references and decompress.
+    """
+    if raw is None:
+        return None
+    if raw.startswith(REF_MARKER):
+        raw = (store or get_object_store()).get(raw[len(REF_MARKER):].decode('ascii'))
+    return decompress(raw)
+
+
+def encode_field(name: str, value: Any, store: Optional[ObjectStore] = None) -> bytes:
+    """
+    Encode a payload field: artifacts with the binary codec, text as UTF-8, then encode_value.
+    """
+    if name in FIELD_KINDS:
+        value = artifacts.encode(FIELD_KINDS[name], value)
+    return encode_value(value, store)
+
+
+def decode_field(name: str, raw: Optional[bytes], store: Optional[ObjectStore] = None) -> Any:
+    """
+    Decode a hash field: artifacts (or legacy JSON) to Python values, everything else to text.
+    """
+    data = decode_value(raw, store)
+    if data is None:
+        return None
+    if name in FIELD_KINDS:
+        return artifacts.decode(FIELD_KINDS[name], data) if data else None
+    return data.decode('utf-8')
+
+
+def referenced_digest(raw: Optional[bytes]) -> Optional[str]:
+    if raw and raw.startswith(REF_MARKER):
+        return raw[len(REF_MARKER):].decode('ascii')
+    return None
+
+
+def write_task_fields(r, task_id: str, fields: Dict[str, Any], ttl: Optional[int] = None):
+    """
+    Write fields to a task hash, encoding payload fields, and (re)arm its TTL.
+    """
+    mapping = {
+        name: encode_field(name, value) if name in PAYLOAD_FIELDS else value
+        for name, value in fields.items()
+    }
+    key = f'{TASK_KEY_PREFIX}{task_id}'
+    pipe = r.pipeline()
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, ttl or RESULT_TTL_SECONDS)
+    pipe.execute()
+
+
+def decode_task_fields(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    """
+    Decode the fields of a task hash as returned by HGETALL: scripts and scenes to
+    Python values, everything else to text.
+    """
+    return {name.decode('utf-8'): decode_field(name.decode('utf-8'), value) for name, value in raw.items()}
+
+
+def read_task_fields(r, task_id: str) -> Dict[str, Any]:
+    """
+    Read a task hash with every field decoded.
+    """
+    return decode_task_fields(r.hgetall(f'{TASK_KEY_PREFIX}{task_id}'))
+
+
+def sweep(r, store: Optional[ObjectStore] = None, ttl: Optional[int] = None,
+          grace_seconds: int = GC_GRACE_SECONDS) -> Dict[str, int]:
+    """
+    Bring every task hash under the lifecycle and delete unreferenced objects.
+    Hashes without a TTL get one, uncompressed payloads are re-encoded, the legacy
+    'result' copy of the transcript is dropped, and orphaned objects are removed.
+
+    Returns:
+        Counts of hashes scanned, TTLs set, fields compacted and objects removed
+    """
+    store = store or get_object_store()
+    stats = {"scanned": 0, "ttl_set": 0, "compacted": 0, "objects_removed": 0}
+    live = set()
+    for key in r.scan_iter(match=f'{TASK_KEY_PREFIX}*', count=500):
+        if r.type(key) != b'hash':
+            continue
+        stats["scanned"] += 1
+        values = r.hmget(key, PAYLOAD_FIELDS)
+        updates = {}
+        for name, raw in zip(PAYLOAD_FIELDS, values):
+            digest = referenced_digest(raw)
+            if digest:
+                live.add(digest)
+            elif raw and not raw.startswith(b'\x00') and (name in FIELD_KINDS or len(raw) >= COMPRESS_MIN_BYTES):
+                # Written before this scheme: plain text, with scripts and scenes as JSON
+                value = json.loads(raw) if name in FIELD_KINDS else raw
+                updates[name] = encode_field(name, value, store)
+                digest = referenced_digest(updates[name])
+                if digest:
+                    live.add(digest)
+        pipe = r.pipeline()
+        if updates:
+            pipe.hset(key, mapping=updates)
+            stats["compacted"] += len(updates)
+        if values[0] is not None:
+            pipe.hdel(key, 'result')
+        pipe.ttl(key)
+        ttl_left = pipe.execute()[-1]
+        if ttl_left == -1:
+            r.expire(key, ttl or RESULT_TTL_SECONDS)
+            stats["ttl_set"] += 1
+    stats["objects_removed"] = store.collect_garbage(live, grace_seconds)
+    return stats
+
+
+def maybe_sweep(r) -> Optional[Dict[str, int]]:
+    """
+    Sweep unless some process already did within the last SWEEP_INTERVAL_SECONDS.
+    """
+    try:
+        if not r.set(SWEEP_LOCK_KEY, time.time(), nx=True, ex=SWEEP_INTERVAL_SECONDS):
+            return None
+        stats = sweep(r)
+        print(f"Result sweep: {json.dumps(stats)}")
+        return stats
+    except Exception as e:
+        print(f"Error sweeping results: {str(e)}")
+        return None
+
+
+def memory_report(r, store: Optional[ObjectStore] = None, sample_size: int = 200) -> Dict[str, Any]:
+    """
+    Report Redis memory use, the share taken by task hashes, and object store usage.
+    Task hash memory is measured on a sample and extrapolated to all hashes.
+    """
+    store = store or get_object_store()
+    info = r.info('memory')
+    count = without_ttl = 0
+    sampled = []
+    for key in r.scan_iter(match=f'{TASK_KEY_PREFIX}*', count=500):
+        count += 1
+        if len(sampled) < sample_size:
+            sampled.append(key)
+    if sampled:
+        pipe = r.pipeline()
+        for key in sampled:
+            pipe.memory_usage(key)
+            pipe.ttl(key)
+        results = pipe.execute()
+        sizes = [size or 0 for size in results[0::2]]
+        without_ttl = sum(1 for ttl in results[1::2] if ttl == -1)
+        mean_size = sum(sizes) / len(sizes)
+    else:
+        mean_size = 0
+    return {
+        "redis_used_memory": info.get('used_memory'),
+        "redis_used_memory_human": info.get('used_memory_human'),
+        "task_hashes": count,
+        "task_hash_mean_bytes": round(mean_size),
+        "task_hashes_estimated_bytes": round(mean_size * count),
+        "sampled_without_ttl": without_ttl,
+        "sampled": len(sampled),
+        "object_store": store.usage(),
+        "compression": "zstd" if zstandard is not None else "gzip",
+    }
+
+
+if __name__ == "__main__":
+    import redis
+    client = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'))
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command == 'sweep':
+        print(json.dumps(sweep(client), indent=2))
+    else:
+        print(json.dumps(memory_report(client), indent=2))
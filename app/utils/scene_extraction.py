@@ -4,60 +4,60 @@ This module extracts frames from videos and generates descriptions using pre-tra
 """
 
 import os
+import uuid
 import cv2
 import numpy as np
 import torch
-from PIL import Image
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
+from app.utils.frame_store import FrameStore, analysis_size, decode_frame
+from app.utils.model_registry import default_device, get_caption_model
+
+def frame_positions(fps: float, total_frames: int, interval_seconds: float, max_frames: int) -> List[int]:
+    """
+    Frame numbers sampled from a video: one every interval_seconds, at most max_frames.
+    """
+    interval_frames = max(1, int(fps * interval_seconds))
+    return list(range(0, total_frames, interval_frames))[:max_frames]
 
 class SceneExtractor:
     """
     Extracts frames from videos and generates descriptions using computer vision models.
     """
     
-    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base"):
+    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base", frame_store: Optional[FrameStore] = None):
         """
         Initialize the scene extractor with the specified image captioning model.
         
         Args:
             model_name: The name of the pre-trained model to use for image captioning
+            frame_store: Where decoded frames are kept (default: FrameStore())
         """
         self.model_name = model_name
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        print(f"Loading image captioning model {model_name} on {self.device}...")
-        self.processor = BlipProcessor.from_pretrained(model_name)
-        self.model = BlipForConditionalGeneration.from_pretrained(model_name).to(self.device)
-        print("Model loaded successfully!")
+        self.frame_store = frame_store or FrameStore()
+        self.device = default_device()
+        self.processor, self.model = get_caption_model(model_name, self.device)
         
     def extract_frames(self, video_path: str, interval_seconds: int = 10, max_frames: int = 10, task_id: str = None) -> List[Dict]:
         """
-        Extract frames from a video at regular intervals.
+        Extract frames from a video at regular intervals into the frame store.
+        Frames are scaled down to the analysis size by ffmpeg as they are decoded;
+        the full resolution is only decoded later for frames viewed at full size.
         
         Args:
             video_path: Path to the video file
             interval_seconds: Interval between frames in seconds
             max_frames: Maximum number of frames to extract
-            task_id: Optional task ID to use in the frame directory name
+            task_id: Optional task ID the frames are stored under (a random one is used if omitted)
             
         Returns:
-            List of dictionaries containing frame data with timestamps and file paths
+            List of dictionaries containing frame data with timestamps and image URLs
         """
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video file not found: {video_path}")
         
-        # Create a permanent directory for frames in the static folder
-        static_frames_dir = '/home/jose/NLP_CV_Final_Project/app/static/frames'
-        os.makedirs(static_frames_dir, exist_ok=True)
-        
-        # Create a task-specific directory for frames
-        video_name = os.path.basename(video_path).split('.')[0]
-        task_prefix = f"{task_id[:8]}_" if task_id else ""
-        frames_dir = os.path.join(static_frames_dir, f"{task_prefix}{video_name}")
-        os.makedirs(frames_dir, exist_ok=True)
+        task_id = task_id or uuid.uuid4().hex
         
-        # Open the video file
+        # Open the video file; only its container metadata is read here
         video = cv2.VideoCapture(video_path)
         if not video.isOpened():
             raise Exception(f"Could not open video file: {video_path}")
@@ -66,83 +66,106 @@ class SceneExtractor:
         fps = video.get(cv2.CAP_PROP_FPS)
         total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = total_frames / fps if fps > 0 else 0
+        width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video.release()
         
-        print(f"Video properties: FPS={fps}, Duration={duration}s, Total frames={total_frames}")
+        size = analysis_size(width, height)
+        print(f"Video properties: FPS={fps}, Duration={duration}s, Total frames={total_frames}, "
+              f"Size={width}x{height}, Analysis size={size[0]}x{size[1]}")
         
         # Calculate frame extraction positions
-        interval_frames = int(fps * interval_seconds)
-        frame_positions = []
+        positions = frame_positions(fps, total_frames, interval_seconds, max_frames)
         
-        current_frame = 0
-        while current_frame < total_frames and len(frame_positions) < max_frames:
-            frame_positions.append(current_frame)
-            current_frame += interval_frames
-        
-        # Extract frames
+        # Decode frames straight into the task's memory-mapped array
+        stored = self.frame_store.create(task_id, len(positions), size[1], size[0])
+        timestamps = []
         frames = []
-        for i, frame_pos in enumerate(frame_positions):
-            video.set(cv2.CAP_PROP_POS_FRAMES, frame_pos)
-            success, frame = video.read()
-            if not success:
-                continue
-            
+        for frame_pos in positions:
             timestamp = frame_pos / fps
-            frame_filename = f"frame_{i:03d}_{int(timestamp)}s.jpg"
-            frame_path = os.path.join(frames_dir, frame_filename)
-            cv2.imwrite(frame_path, frame)
+            frame = decode_frame(video_path, timestamp, size)
+            if frame is None:
+                continue
             
-            # Create a URL path that can be accessed via the /static route
-            frame_url_path = f"/static/frames/{task_prefix}{video_name}/{frame_filename}"
+            i = len(timestamps)
+            stored[i] = frame
+            timestamps.append(timestamp)
             
             frames.append({
                 "index": i,
                 "timestamp": timestamp,
                 "timestamp_formatted": self._format_timestamp(timestamp),
-                "path": frame_path,
-                "url": frame_url_path
+                "task_id": task_id,
+                "url": f"/frames/{task_id}/{i}"
             })
         
-        video.release()
+        self.frame_store.commit(task_id, stored, timestamps, source_path=video_path, source_size=(width, height))
+        self.frame_store.maybe_collect_garbage()
         print(f"Extracted {len(frames)} frames from video")
         return frames
     
-    def describe_frames(self, frames: List[Dict]) -> List[Dict]:
+    def describe_frames(self, frames: List[Dict], progress_callback: Optional[Callable] = None, batch_size: int = 8) -> List[Dict]:
         """
         Generate descriptions for a list of video frames.
         
         Args:
-            frames: List of frame dictionaries with paths
+            frames: List of frame dictionaries from extract_frames (may span several tasks)
+            progress_callback: Optional callable invoked with the number of frames described
+            batch_size: Number of frames captioned per model call
             
         Returns:
             Updated list of frame dictionaries with descriptions
         """
+        stored = {}
+        pending = []
         for frame in frames:
-            frame_path = frame["path"]
-            if not os.path.exists(frame_path):
+            try:
+                # Frames are read straight from the memory-mapped store, without copies
+                task_id = frame["task_id"]
+                if task_id not in stored:
+                    stored[task_id] = self.frame_store.open(task_id)[0]
+                pending.append((frame, stored[task_id][frame["index"]]))
+            except (KeyError, FileNotFoundError, IndexError):
                 frame["description"] = "Frame image not found"
-                continue
-            
-            # Load and process the image
-            image = Image.open(frame_path).convert("RGB")
-            inputs = self.processor(images=image, return_tensors="pt").to(self.device)
-            
-            # Generate caption
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs, 
-                    max_length=50,
-                    do_sample=True,
-                    top_k=50,
-                    top_p=0.95
-                )
-            
-            # Decode the generated caption
-            generated_text = self.processor.decode(outputs[0], skip_special_tokens=True)
-            
-            frame["description"] = generated_text
+                if progress_callback:
+                    progress_callback(1)
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            generated_texts = self.caption_images([image for _, image in batch])
+            for (frame, _), generated_text in zip(batch, generated_texts):
+                frame["description"] = generated_text
+            if progress_callback:
+                progress_callback(len(batch))
             
         return frames
     
+    def caption_images(self, images: List[np.ndarray]) -> List[str]:
+        """
+        Caption a batch of RGB images in one model call.
+        
+        Args:
+            images: RGB arrays of shape (height, width, 3)
+            
+        Returns:
+            One caption per image
+        """
+        # Process the images
+        inputs = self.processor(images=images, return_tensors="pt").to(self.device)
+        
+        # Generate captions
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs, 
+                max_length=50,
+                do_sample=True,
+                top_k=50,
+                top_p=0.95
+            )
+        
+        # Decode the generated captions
+        return self.processor.batch_decode(outputs, skip_special_tokens=True)
+    
     def extract_and_describe(self, video_path: str, interval_seconds: int = 10, max_frames: int = 10, task_id: str = None) -> List[Dict]:
         """
         Extract frames from a video and generate descriptions.
@@ -151,10 +174,10 @@ class SceneExtractor:
             video_path: Path to the video file
             interval_seconds: Interval between frames in seconds
             max_frames: Maximum number of frames to extract
-            task_id: Optional task ID to use in the frame directory name
+            task_id: Optional task ID the frames are stored under
             
         Returns:
-            List of dictionaries containing frame data with timestamps, file paths, and descriptions
+            List of dictionaries containing frame data with timestamps, image URLs, and descriptions
         """
         frames = self.extract_frames(video_path, interval_seconds, max_frames, task_id)
         return self.describe_frames(frames)
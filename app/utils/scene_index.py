@@ -0,0 +1,321 @@
+"""
+Scene retrieval index.
+Every described scene is appended to a flat vector index on disk: caption text embeddings
+in one float32 file, keyframe image embeddings in another, and one metadata line per row.
+The vector files are memory mapped at query time and scored with a single matrix-vector
+product, so searching all processed videos never touches the Redis task hashes.
+A reprocessed task appends its scenes again; queries only see the newest row of each
+scene. When the frame store garbage collects a task, its rows are removed and the files
+are rewritten without them (and without superseded rows).
+
+Both embedders are plain NumPy (feature hashing for text, a colour layout and histogram
+for images), so the web process can embed queries without loading any model.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_ROOT = os.path.join(PROJECT_ROOT, 'scene_index')
+
+TEXT_DIM = 512
+IMAGE_GRID = 8         # Mean colour of an 8x8 grid of cells
+IMAGE_HIST_BINS = 4    # 4x4x4 RGB histogram
+IMAGE_DIM = IMAGE_GRID * IMAGE_GRID * 3 + IMAGE_HIST_BINS ** 3
+
+TEXT_FILE = 'text.f32'
+IMAGE_FILE = 'images.f32'
+META_FILE = 'meta.jsonl'
+LOCK_FILE = '.lock'
+
+# Rows copied per read while pruning, bounding memory use on large indexes
+PRUNE_BLOCK_ROWS = 4096
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Caption words that say nothing about the content
+STOPWORDS = frozenset("a an the of in on at with and is are there this that to".split())
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def embed_text(text: str, dim: int = TEXT_DIM) -> np.ndarray:
+    """
+    Embed text by signed feature hashing of its words and word pairs.
+
+    Returns:
+        L2-normalized float32 vector of length dim
+    """
+    words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        vector[value % dim] += 1.0 if (value >> 63) else -1.0
+    return _normalize(vector)
+
+
+def embed_image(frame: np.ndarray) -> np.ndarray:
+    """
+    Embed an RGB frame by its coarse colour layout and colour histogram.
+
+    Returns:
+        L2-normalized float32 vector of length IMAGE_DIM
+    """
+    frame = np.asarray(frame)
+    height, width = frame.shape[:2]
+    cell_h, cell_w = max(1, height // IMAGE_GRID), max(1, width // IMAGE_GRID)
+    cropped = frame[:cell_h * IMAGE_GRID, :cell_w * IMAGE_GRID].astype(np.float32) / 255.0
+    layout = cropped.reshape(IMAGE_GRID, cell_h, IMAGE_GRID, cell_w, 3).mean(axis=(1, 3)).ravel()
+    layout -= layout.mean()
+
+    # Histogram over a strided sample of pixels; the layout already covers every pixel
+    sample = frame[::4, ::4].reshape(-1, 3) // (256 // IMAGE_HIST_BINS)
+    bins = (sample[:, 0].astype(np.int64) * IMAGE_HIST_BINS + sample[:, 1]) * IMAGE_HIST_BINS + sample[:, 2]
+    histogram = np.bincount(bins, minlength=IMAGE_HIST_BINS ** 3).astype(np.float32)
+    histogram = np.sqrt(histogram / max(1, len(bins)))
+
+    return _normalize(np.concatenate([_normalize(layout), _normalize(histogram)]).astype(np.float32))
+
+
+class SceneIndex:
+    """
+    Flat vector index over scenes of every processed video, appended to as tasks complete.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            root: Index directory (default: SCENE_INDEX_ROOT or <project>/scene_index)
+        """
+        self.root = root or os.environ.get('SCENE_INDEX_ROOT', DEFAULT_ROOT)
+        os.makedirs(self.root, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        self._meta: List[Dict[str, Any]] = []
+        self._meta_offset = 0
+        self._meta_inode = None
+        # Row of the newest entry of each (task_id, index), and which rows are such entries
+        self._latest: Dict[Tuple[str, int], int] = {}
+        self._live = np.zeros(0, dtype=bool)
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        # Several worker processes may append at once, and pruning rewrites the files under readers
+        with open(os.path.join(self.root, LOCK_FILE), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add_scenes(self, scenes: List[Dict[str, Any]], frame_store=None) -> int:
+        """
+        Append described scenes to the index.
+
+        Args:
+            scenes: Scene dictionaries from describe_frames (with task_id and index)
+            frame_store: Optional FrameStore; when given, keyframe image embeddings are indexed too
+
+        Returns:
+            Number of scenes indexed
+        """
+        rows = [scene for scene in scenes if scene.get("task_id") and scene.get("description")]
+        if not rows:
+            return 0
+        text_vectors = np.stack([embed_text(scene["description"]) for scene in rows])
+        image_vectors = np.zeros((len(rows), IMAGE_DIM), dtype=np.float32)
+        if frame_store is not None:
+            for i, scene in enumerate(rows):
+                try:
+                    image_vectors[i] = embed_image(frame_store.frame(scene["task_id"], scene["index"]))
+                except (FileNotFoundError, IndexError, KeyError, ValueError):
+                    pass  # Scores zero against every image query
+        meta_lines = ''.join(json.dumps({
+            "task_id": scene["task_id"],
+            "index": scene["index"],
+            "timestamp": scene.get("timestamp"),
+            "timestamp_formatted": scene.get("timestamp_formatted"),
+            "description": scene["description"],
+            "url": scene.get("url"),
+        }) + '\n' for scene in rows)
+
+        with self._locked():
+            # Drop anything a crashed writer left past the last complete row
+            rows_indexed = len(self._load_meta())
+            meta_path = os.path.join(self.root, META_FILE)
+            if os.path.exists(meta_path):
+                os.truncate(meta_path, self._meta_offset)
+            for name, dim in ((TEXT_FILE, TEXT_DIM), (IMAGE_FILE, IMAGE_DIM)):
+                path = os.path.join(self.root, name)
+                if os.path.exists(path):
+                    os.truncate(path, rows_indexed * dim * 4)
+
+            # Vectors first: readers only trust rows that also have a metadata line
+            with open(os.path.join(self.root, TEXT_FILE), 'ab') as f:
+                f.write(text_vectors.astype(np.float32).tobytes())
+            with open(os.path.join(self.root, IMAGE_FILE), 'ab') as f:
+                f.write(image_vectors.tobytes())
+            with open(os.path.join(self.root, META_FILE), 'a') as f:
+                f.write(meta_lines)
+        return len(rows)
+
+    def _load_meta(self) -> List[Dict[str, Any]]:
+        # Only read the lines appended since the last call, unless pruning replaced the file
+        path = os.path.join(self.root, META_FILE)
+        if not os.path.exists(path):
+            if self._meta:
+                self._reset()
+            return self._meta
+        with open(path) as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._meta_inode:
+                self._reset()
+                self._meta_inode = inode
+            f.seek(self._meta_offset)
+            added = []
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # Still being written
+                added.append(json.loads(line))
+                self._meta_offset += len(line.encode('utf-8'))
+        if added:
+            first = len(self._meta)
+            self._meta.extend(added)
+            self._live = np.concatenate((self._live, np.ones(len(added), dtype=bool)))
+            for row, entry in enumerate(added, first):
+                key = (entry["task_id"], entry["index"])
+                if key in self._latest:
+                    self._live[self._latest[key]] = False
+                self._latest[key] = row
+        return self._meta
+
+    def _vectors(self, name: str, dim: int, rows: int) -> np.ndarray:
+        path = os.path.join(self.root, name)
+        available = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+        rows = min(rows, available)
+        if rows == 0:
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode='r', shape=(rows, dim))
+
+    def __len__(self) -> int:
+        return len(self._load_meta())
+
+    def _top_k(self, vectors: np.ndarray, query: np.ndarray, k: int,
+               exclude: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        meta = self._meta
+        if len(vectors) == 0 or not np.any(query):
+            return []
+        # Rows superseded by a reprocessed task's newer ones never match
+        scores = np.where(self._live[:len(vectors)], np.asarray(vectors @ query), -np.inf)
+        candidates = min(len(scores), k + 1)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        results = []
+        for row in top[np.argsort(-scores[top])]:
+            entry = meta[row]
+            if (entry["task_id"], entry["index"]) == exclude or scores[row] <= 0:
+                continue
+            results.append(dict(entry, score=round(float(scores[row]), 4)))
+            if len(results) == k:
+                break
+        return results
+
+    def search_text(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Return the k scenes whose captions best match a text query.
+        """
+        with self._locked(shared=True):
+            rows = len(self._load_meta())
+            return self._top_k(self._vectors(TEXT_FILE, TEXT_DIM, rows), embed_text(query), k)
+
+    def search_similar(self, task_id: str, frame_index: int, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Return the k scenes that look most like a given scene's keyframe.
+        """
+        with self._locked(shared=True):
+            meta = self._load_meta()
+            vectors = self._vectors(IMAGE_FILE, IMAGE_DIM, len(meta))
+            row = self._latest.get((task_id, frame_index))
+            if row is None or row >= len(vectors):
+                raise KeyError(f"Scene {task_id}/{frame_index} is not indexed")
+            return self._top_k(vectors, np.array(vectors[row]), k, exclude=(task_id, frame_index))
+
+    def remove_tasks(self, task_ids: Iterable[str]) -> int:
+        """
+        Remove every scene of the given tasks, rewriting the index files without them.
+        Rows superseded by a reprocessed task's newer ones are dropped in the same pass.
+
+        Args:
+            task_ids: Tasks whose scenes are removed
+
+        Returns:
+            Number of rows removed
+        """
+        task_ids = set(task_ids)
+        with self._locked():
+            meta = self._load_meta()
+            keep = [row for row, entry in enumerate(meta) if self._live[row] and entry["task_id"] not in task_ids]
+            if len(keep) == len(meta):
+                return 0
+            # Vectors first, metadata last: readers reload once the metadata file changes
+            for name, dim in ((TEXT_FILE, TEXT_DIM), (IMAGE_FILE, IMAGE_DIM)):
+                vectors = self._vectors(name, dim, len(meta))
+                tmp_path = os.path.join(self.root, f"{name}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    for start in range(0, len(keep), PRUNE_BLOCK_ROWS):
+                        f.write(np.asarray(vectors[keep[start:start + PRUNE_BLOCK_ROWS]]).tobytes())
+                os.replace(tmp_path, os.path.join(self.root, name))
+            tmp_path = os.path.join(self.root, f"{META_FILE}.tmp")
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(meta[row]) + '\n' for row in keep)
+            os.replace(tmp_path, os.path.join(self.root, META_FILE))
+            self._reset()
+        return len(meta) - len(keep)
+
+
+_shared_index: Optional[SceneIndex] = None
+
+
+def get_scene_index() -> SceneIndex:
+    """
+    Return the process-wide index, whose metadata is read incrementally between calls.
+    """
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = SceneIndex()
+    return _shared_index
+
+
+def index_scenes(scenes: List[Dict[str, Any]], frame_store=None) -> int:
+    """
+    Add scenes to the shared index, logging instead of failing the pipeline on errors.
+    """
+    try:
+        return get_scene_index().add_scenes(scenes, frame_store=frame_store)
+    except Exception as e:
+        print(f"Error indexing scenes: {str(e)}")
+        return 0
+
+
+def remove_indexed_tasks(task_ids: Iterable[str]) -> int:
+    """
+    Remove tasks from the shared index, logging instead of failing on errors.
+    """
+    try:
+        return get_scene_index().remove_tasks(task_ids)
+    except Exception as e:
+        print(f"Error removing tasks from the scene index: {str(e)}")
+        return 0
@@ -0,0 +1,296 @@
+"""
+Job scheduler for the processing queue.
+Estimates each job's cost from its media duration at submit time and routes it to a
+size-class queue (shortest job first), with a per-tenant priority inside the queue so
+one tenant's backlog cannot starve everyone else. Queue depth and wait times are kept
+in Redis for the /metrics/queues endpoint.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import redis
+from celery.signals import task_postrun, task_prerun
+
+from app.utils.transcription import REDIS_URL
+
+QUEUE_PREFIX = 'transcribe'
+
+# Size classes by estimated cost in seconds of media, checked in order; workers drain
+# the earlier queues first, so short clips never wait behind a long upload
+SIZE_CLASSES = [
+    ('short', float(os.environ.get('SCHEDULER_SHORT_SECONDS', 5 * 60))),
+    ('medium', float(os.environ.get('SCHEDULER_MEDIUM_SECONDS', 30 * 60))),
+    ('long', float('inf')),
+]
+QUEUE_NAMES = [f'{QUEUE_PREFIX}.{name}' for name, _ in SIZE_CLASSES]
+
+# Cost assumed when the duration cannot be probed
+DEFAULT_COST_SECONDS = float(os.environ.get('SCHEDULER_DEFAULT_COST', 10 * 60))
+
+# A batch's probes run in the web request: on this many threads, and for at most this
+# many seconds in total; sources not probed by then cost DEFAULT_COST_SECONDS
+PROBE_WORKERS = int(os.environ.get('SCHEDULER_PROBE_WORKERS', 4))
+PROBE_BUDGET_SECONDS = float(os.environ.get('SCHEDULER_PROBE_BUDGET_SECONDS', 10))
+
+# Seconds of a tenant's outstanding media that cost one priority step
+FAIR_SHARE_SECONDS = float(os.environ.get('SCHEDULER_FAIR_SHARE_SECONDS', 10 * 60))
+PRIORITY_LEVELS = 10  # Celery's Redis transport: 0 is served first, 9 last
+
+# Celery's Redis transport keeps one list per priority step, named queue + sep + step
+PRIORITY_SEP = ':'
+
+JOBS_KEY = 'scheduler:jobs'
+TENANT_LOAD_KEY = 'scheduler:tenant-load'
+WAIT_KEY_TEMPLATE = 'scheduler:wait:{queue}'
+WAIT_SAMPLES = 1000
+
+
+def celery_queue_config() -> Dict[str, Any]:
+    """
+    Celery settings that make workers consume the size-class queues in priority order.
+    """
+    from kombu import Queue
+    return {
+        'task_queues': [Queue(name) for name in QUEUE_NAMES] + [Queue('celery')],
+        'broker_transport_options': {
+            'queue_order_strategy': 'priority',
+            'priority_steps': list(range(PRIORITY_LEVELS)),
+            'sep': PRIORITY_SEP,
+            # Tasks ack late, so an unacked job is redelivered after this long; it must
+            # outlast the longest job or a healthy run gets a duplicate
+            'visibility_timeout': int(os.environ.get('BROKER_VISIBILITY_TIMEOUT', 6 * 3600)),
+        },
+        # A worker holding prefetched long jobs would defeat shortest-job-first
+        'worker_prefetch_multiplier': 1,
+    }
+
+
+def _redis(redis_url: Optional[str] = None):
+    return redis.Redis.from_url(redis_url or os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+
+
+def probe_duration(source: str, is_youtube: bool = False, timeout: int = 30) -> Optional[float]:
+    """
+    Probe the duration of a media file or YouTube video without downloading it.
+
+    Args:
+        source: File path or YouTube URL
+        is_youtube: Whether source is a YouTube URL
+        timeout: Seconds to wait for the probe
+
+    Returns:
+        Duration in seconds, or None if it could not be determined
+    """
+    if is_youtube:
+        tool = shutil.which('yt-dlp')
+        command = [tool, '--skip-download', '--no-playlist', '--print', 'duration', source]
+    else:
+        tool = shutil.which('ffprobe')
+        command = [tool, '-v', 'error', '-show_entries', 'format=duration',
+                   '-of', 'default=noprint_wrappers=1:nokey=1', source]
+    if not tool:
+        return None
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        if completed.returncode != 0:
+            return None
+        return float(completed.stdout.decode('utf-8').strip().splitlines()[-1])
+    except (subprocess.TimeoutExpired, ValueError, IndexError, OSError) as e:
+        print(f"Could not probe duration of {source}: {str(e)}")
+        return None
+
+
+def probe_durations(sources: List[Dict[str, Any]], budget: Optional[float] = None) -> List[Optional[float]]:
+    """
+    Probe several sources concurrently; each item needs source and is_youtube keys.
+    Returns within budget seconds (default PROBE_BUDGET_SECONDS); sources whose probe
+    has not finished by then are reported as unknown (None).
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+    budget = PROBE_BUDGET_SECONDS if budget is None else budget
+    pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+    # Each probe's own timeout is the budget, so probes still running afterwards end soon too
+    futures = [pool.submit(probe_duration, item['source'], item['is_youtube'], budget) for item in sources]
+    wait(futures, timeout=budget)
+    pool.shutdown(wait=False, cancel_futures=True)
+    durations = [future.result() if future.done() and not future.cancelled() else None for future in futures]
+    unfinished = sum(1 for future in futures if not future.done() or future.cancelled())
+    if unfinished:
+        print(f"{unfinished} of {len(sources)} duration probes did not finish within {budget:g}s")
+    return durations
+
+
+def size_class_queue(cost: float) -> str:
+    for (_, limit), queue in zip(SIZE_CLASSES, QUEUE_NAMES):
+        if cost <= limit:
+            return queue
+    return QUEUE_NAMES[-1]
+
+
+def fair_share_priority(tenant_load: float) -> int:
+    """
+    Priority inside a queue from the media seconds a tenant already has outstanding.
+    A tenant's first job is served first; each FAIR_SHARE_SECONDS more drops one step.
+    """
+    return min(PRIORITY_LEVELS - 1, int(tenant_load // FAIR_SHARE_SECONDS))
+
+
+def submit(task, args: List[Any], durations: List[Optional[float]], tenant: str,
+           redis_url: Optional[str] = None, kwargs: Optional[Dict[str, Any]] = None,
+           task_id: Optional[str] = None) -> str:
+    """
+    Schedule a task by estimated cost and tenant share.
+
+    Args:
+        task: Celery task to run
+        args: Positional arguments for the task
+        durations: Probed media durations of the job's videos (None when unknown)
+        tenant: Client the job is accounted to
+        redis_url: Optional Redis URL
+        kwargs: Optional keyword arguments for the task
+        task_id: Optional task ID to schedule the job under (default: a new one)
+
+    Returns:
+        The task ID
+    """
+    cost = sum(DEFAULT_COST_SECONDS if d is None else d for d in durations)
+    queue = size_class_queue(cost)
+    task_id = task_id or str(uuid.uuid4())
+    r = _redis(redis_url)
+    try:
+        tenant_load = float(r.hget(TENANT_LOAD_KEY, tenant) or 0)
+        pipe = r.pipeline()
+        pipe.hset(JOBS_KEY, task_id, json.dumps({
+            'tenant': tenant, 'cost': cost, 'queue': queue, 'enqueued': time.time(),
+        }))
+        pipe.hincrbyfloat(TENANT_LOAD_KEY, tenant, cost)
+        pipe.execute()
+    except redis.RedisError as e:
+        # Scheduling metadata is best effort; the job still runs
+        print(f"Error recording scheduled job: {str(e)}")
+        tenant_load = 0
+    priority = fair_share_priority(tenant_load)
+    print(f"Scheduling {task_id} for {tenant}: cost {cost:.0f}s, queue {queue}, priority {priority}")
+    task.apply_async(args=args, kwargs=kwargs, task_id=task_id, queue=queue, priority=priority)
+    return task_id
+
+
+def job_record(task_id: str, redis_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Scheduling record of a job: tenant, cost (probed seconds of media), queue, and the
+    enqueued and started times; None if the job was not scheduled through submit.
+    """
+    try:
+        raw = _redis(redis_url).hget(JOBS_KEY, task_id)
+        return json.loads(raw) if raw else None
+    except redis.RedisError as e:
+        print(f"Error reading job record: {str(e)}")
+        return None
+
+
+def backlog(redis_url: Optional[str] = None) -> Dict[str, float]:
+    """
+    Jobs waiting to start across every queue, and their total estimated cost in seconds.
+    """
+    try:
+        jobs = [json.loads(raw) for raw in _redis(redis_url).hvals(JOBS_KEY)]
+    except redis.RedisError as e:
+        print(f"Error reading backlog: {str(e)}")
+        return {'depth': 0, 'seconds': 0.0}
+    waiting = [job for job in jobs if 'started' not in job]
+    return {'depth': len(waiting), 'seconds': sum(job['cost'] for job in waiting)}
+
+
+@task_prerun.connect
+def record_job_start(task_id=None, **kwargs):
+    """
+    Record how long a scheduled job waited in its queue.
+    """
+    try:
+        r = _redis()
+        raw = r.hget(JOBS_KEY, task_id)
+        if not raw:
+            return
+        job = json.loads(raw)
+        if 'started' in job:
+            return  # Redelivered; the first start already counted
+        job['started'] = time.time()
+        pipe = r.pipeline()
+        pipe.hset(JOBS_KEY, task_id, json.dumps(job))
+        wait_key = WAIT_KEY_TEMPLATE.format(queue=job['queue'])
+        pipe.lpush(wait_key, round(job['started'] - job['enqueued'], 3))
+        pipe.ltrim(wait_key, 0, WAIT_SAMPLES - 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Error recording job start: {str(e)}")
+
+
+@task_postrun.connect
+def record_job_end(task_id=None, state=None, **kwargs):
+    """
+    Release a finished job's cost from its tenant's outstanding load.
+    """
+    if state == 'RETRY':
+        return
+    try:
+        r = _redis()
+        raw = r.hget(JOBS_KEY, task_id)
+        if not raw:
+            return
+        job = json.loads(raw)
+        pipe = r.pipeline()
+        pipe.hdel(JOBS_KEY, task_id)
+        pipe.hincrbyfloat(TENANT_LOAD_KEY, job['tenant'], -job['cost'])
+        pipe.execute()
+        if float(r.hget(TENANT_LOAD_KEY, job['tenant']) or 0) <= 0:
+            r.hdel(TENANT_LOAD_KEY, job['tenant'])
+    except redis.RedisError as e:
+        print(f"Error recording job end: {str(e)}")
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+def queue_metrics(redis_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Current queue depth and recent wait times per size-class queue, and tenant load.
+
+    Returns:
+        Dictionary with a queues mapping (depth, waiting jobs' oldest age, wait p50/p95/max
+        over the last WAIT_SAMPLES starts) and the outstanding seconds of media per tenant
+    """
+    r = _redis(redis_url)
+    now = time.time()
+    jobs = [json.loads(raw) for raw in r.hvals(JOBS_KEY)]
+    queues = {}
+    for queue in QUEUE_NAMES:
+        pipe = r.pipeline()
+        for step in range(PRIORITY_LEVELS):
+            # Step 0 lives under the bare queue name
+            pipe.llen(f'{queue}{PRIORITY_SEP}{step}' if step else queue)
+        depth = sum(pipe.execute())
+        waits = [float(w) for w in r.lrange(WAIT_KEY_TEMPLATE.format(queue=queue), 0, -1)]
+        waiting = [now - job['enqueued'] for job in jobs if job['queue'] == queue and 'started' not in job]
+        queues[queue] = {
+            'depth': depth,
+            'oldest_waiting_seconds': round(max(waiting), 3) if waiting else 0,
+            'wait_seconds': {
+                'p50': _percentile(waits, 0.5),
+                'p95': _percentile(waits, 0.95),
+                'max': round(max(waits), 3) if waits else None,
+                'samples': len(waits),
+            },
+        }
+    tenant_load = {key.decode('utf-8'): round(float(value), 1)
+                   for key, value in r.hgetall(TENANT_LOAD_KEY).items()}
+    return {'queues': queues, 'tenant_load_seconds': tenant_load}
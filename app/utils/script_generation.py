@@ -1,73 +1,38 @@
 import re
 import json
-import requests
-from transformers import MarianMTModel, MarianTokenizer
-import torch
-import nltk
-from nltk.tokenize import sent_tokenize
 import os
+from app.utils.model_registry import (
+    ModelUnavailableError, default_device, get_translation_model, translation_model_name
+)
 
-# Set NLTK data path to include our local directory
+# NLTK data is installed at build time by download_nltk_data.py into <project>/nltk_data.
+# nltk itself is imported on first use so importing this module stays cheap.
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 local_nltk_data = os.path.join(project_root, 'nltk_data')
-if os.path.exists(local_nltk_data):
-    nltk.data.path.append(local_nltk_data)
-
-# Download NLTK data if not already present
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    print("Downloading NLTK punkt tokenizer data...")
-    nltk.download('punkt', quiet=False)
-    print("NLTK punkt tokenizer data downloaded successfully.")
-
-# Create punkt_tab resource if it doesn't exist
-try:
-    nltk.data.find('tokenizers/punkt_tab/english')
-    print("punkt_tab resource found.")
-except LookupError:
-    print("Creating punkt_tab resource...")
-    # Create punkt_tab directory structure
-    punkt_dir = os.path.join(nltk.data.find('tokenizers/punkt'))
-    punkt_tab_dir = os.path.join(os.path.dirname(punkt_dir), 'punkt_tab', 'english')
-    os.makedirs(punkt_tab_dir, exist_ok=True)
-    
-    # Copy punkt files to punkt_tab location
-    import shutil
-    for file in os.listdir(punkt_dir):
-        if file.endswith('.pickle'):
-            src = os.path.join(punkt_dir, file)
-            dst = os.path.join(punkt_tab_dir, file)
-            shutil.copy2(src, dst)
-            print(f"Copied {src} to {dst}")
-    print("Created punkt_tab resource successfully.")
-
-# Create collocations.tab file if it doesn't exist
-collocations_tab_path = os.path.join(nltk.data.path[0], 'tokenizers', 'punkt_tab', 'english', 'collocations.tab')
-if not os.path.exists(collocations_tab_path):
-    print(f"Creating collocations.tab file at: {collocations_tab_path}")
-    try:
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(collocations_tab_path), exist_ok=True)
-        
-        # Create the collocations.tab file with common abbreviations
-        with open(collocations_tab_path, 'w') as f:
-            f.write("a.m.\na.m\np.m.\np.m\ne.g.\ni.e.\nU.S.\nU.S.A.\nMr.\nMrs.\nMs.\nDr.\nProf.\nJan.\nFeb.\nMar.\nApr.\nJun.\nJul.\nAug.\nSep.\nOct.\nNov.\nDec.\nSt.\nAve.\nBlvd.\n")
-        print(f"Created collocations.tab file successfully.")
-    except Exception as e:
-        print(f"Error creating collocations.tab file: {str(e)}")
+
+_sent_tokenize = None
+
+
+def _get_sent_tokenize():
+    global _sent_tokenize
+    if _sent_tokenize is None:
+        import nltk
+        from nltk.tokenize import sent_tokenize
+        if os.path.exists(local_nltk_data) and local_nltk_data not in nltk.data.path:
+            nltk.data.path.append(local_nltk_data)
+        _sent_tokenize = sent_tokenize
+    return _sent_tokenize
 
 # Custom tokenize function to handle NLTK errors
 def safe_sent_tokenize(text):
     """Safely tokenize text into sentences, with fallback methods if NLTK fails."""
     try:
         # Try using NLTK's sent_tokenize
-        return sent_tokenize(text)
+        return _get_sent_tokenize()(text)
     except Exception as e:
         print(f"NLTK tokenization failed: {str(e)}")
         # Fallback method 1: Simple split by common sentence terminators
         try:
-            import re
             sentences = re.split(r'(?<=[.!?])\s+', text)
             if len(sentences) > 1:
                 return sentences
@@ -90,68 +55,167 @@ def safe_sent_tokenize(text):
         # Last resort: return the whole text as one sentence
         return [text]
 
+TARGET_LANGUAGE = 'es'
+# The only language Whisper's translate task produces
+PIVOT_LANGUAGE = 'en'
+
+# Script sections in order
+SECTION_IDS = ("hook", "intro", "main_content", "call_to_action", "outro")
+
+
+def translation_route(source_language):
+    """Decide how a transcript in source_language is turned into Spanish.
+
+    Returns 'skip' when the source is already Spanish, 'marian' when it is English or a
+    direct source-to-Spanish Marian model exists, or 'whisper' when no such model exists
+    and the audio must first be translated to English with Whisper's translate task.
+    A model that exists but fails to load is still routed to 'marian'; translating
+    reports the failure.
+    """
+    source_language = source_language or PIVOT_LANGUAGE
+    if source_language == TARGET_LANGUAGE:
+        return 'skip'
+    if source_language == PIVOT_LANGUAGE:
+        return 'marian'
+    try:
+        get_translation_model(translation_model_name(source_language, TARGET_LANGUAGE), default_device())
+        return 'marian'
+    except ModelUnavailableError as e:
+        if not e.missing:
+            print(f"Translation model for '{source_language}' failed to load: {str(e)}")
+            return 'marian'
+        print(f"No direct translation model for '{source_language}': {str(e)}")
+        return 'whisper'
+
+
 class ScriptGenerator:
-    def __init__(self, model_name='Helsinki-NLP/opus-mt-en-es'):
-        """Initialize the script generator with a translation model."""
-        self.model_name = model_name
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"Loading translation model on {self.device}...")
-        self.tokenizer = MarianTokenizer.from_pretrained(model_name)
-        self.model = MarianMTModel.from_pretrained(model_name).to(self.device)
-        print("Translation model loaded.")
+    def __init__(self, model_name=None, progress_callback=None, source_language='en'):
+        """Initialize the script generator with a translation model.
+
+        The Marian model is picked from the source language unless model_name is given,
+        and no model is loaded at all when the source is already Spanish.
+        progress_callback, if given, is called once for every chunk translated.
+        """
+        self.source_language = source_language or PIVOT_LANGUAGE
+        self.model_name = model_name or translation_model_name(self.source_language, TARGET_LANGUAGE)
+        self.progress_callback = progress_callback
+        self.device = default_device()
+        if self.source_language == TARGET_LANGUAGE and model_name is None:
+            print("Transcript is already in Spanish; translation will be skipped.")
+            self.tokenizer = self.model = None
+        else:
+            self.tokenizer, self.model = get_translation_model(self.model_name, self.device)
+
+    def split_into_chunks(self, text, max_chunk_size=512):
+        """Split text into sentence-aligned chunks that fit the model's max token length."""
+        # Use our safe tokenization function
+        sentences = safe_sent_tokenize(text)
+        chunks = []
+        current_chunk = []
+        current_length = 0
+        
+        for sentence in sentences:
+            try:
+                tokens = self.tokenizer.tokenize(sentence)
+                token_length = len(tokens)
+            except Exception as e:
+                print(f"Error tokenizing sentence: {str(e)}")
+                # Estimate token length as 1.5 times character length
+                token_length = int(len(sentence) * 1.5)
+                
+            if current_chunk and current_length + token_length > max_chunk_size:
+                chunks.append(' '.join(current_chunk))
+                current_chunk = [sentence]
+                current_length = token_length
+            else:
+                current_chunk.append(sentence)
+                current_length += token_length
+        
+        if current_chunk:
+            chunks.append(' '.join(current_chunk))
+        return chunks
+
+    def translate_texts(self, texts, batch_size=8):
+        """Translate several texts to Spanish, batching chunks across texts."""
+        if self.model is None:
+            return list(texts)
+
+        # Split every text into chunks, remembering which text each chunk belongs to
+        owners = []
+        chunks = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            for chunk in self.split_into_chunks(text):
+                owners.append(i)
+                chunks.append(chunk)
+
+        import torch
+
+        # Translate the chunks in padded batches
+        translated_chunks = []
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            try:
+                inputs = self.tokenizer(batch, return_tensors="pt", padding=True).to(self.device)
+                with torch.no_grad():
+                    outputs = self.model.generate(**inputs)
+                translated_chunks.extend(
+                    self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+                )
+            except Exception as e:
+                print(f"Error translating chunk: {str(e)}")
+                # Fall back to a simple message
+                translated_chunks.extend([f"[Error traduciendo: {str(e)}]"] * len(batch))
+            if self.progress_callback:
+                self.progress_callback(len(batch))
+
+        # Reassemble the chunks in their original texts
+        translated = [[] for _ in texts]
+        for owner, chunk in zip(owners, translated_chunks):
+            translated[owner].append(chunk)
+        return [' '.join(parts) for parts in translated]
 
     def translate_text(self, text):
-        """Translate text from English to Spanish."""
+        """Translate text to Spanish."""
         try:
-            # Split text into chunks to avoid exceeding max token length
-            max_chunk_size = 512  # Maximum tokens for the model
-            
-            # Use our safe tokenization function
-            sentences = safe_sent_tokenize(text)
-            chunks = []
-            current_chunk = []
-            current_length = 0
-            
-            for sentence in sentences:
-                try:
-                    tokens = self.tokenizer.tokenize(sentence)
-                    token_length = len(tokens)
-                except Exception as e:
-                    print(f"Error tokenizing sentence: {str(e)}")
-                    # Estimate token length as 1.5 times character length
-                    token_length = int(len(sentence) * 1.5)
-                    
-                if current_length + token_length > max_chunk_size:
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = [sentence]
-                    current_length = token_length
-                else:
-                    current_chunk.append(sentence)
-                    current_length += token_length
-            
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
-            
-            # Translate each chunk
-            translated_chunks = []
-            for chunk in chunks:
-                try:
-                    inputs = self.tokenizer(chunk, return_tensors="pt", padding=True).to(self.device)
-                    with torch.no_grad():
-                        outputs = self.model.generate(**inputs)
-                    translated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-                    translated_chunks.append(translated_text)
-                except Exception as e:
-                    print(f"Error translating chunk: {str(e)}")
-                    # Fall back to a simple message
-                    translated_chunks.append(f"[Error traduciendo: {str(e)}]")
-            
-            return ' '.join(translated_chunks)
+            return self.translate_texts([text])[0]
         except Exception as e:
             print(f"Error in translate_text: {str(e)}")
             return f"Error en la traducción: {str(e)}"
 
-    def structure_script(self, transcript, video_duration=None):
+    def section_segments(self, segments, video_duration=None):
+        """
+        Group timestamped transcript segments into script sections by time.
+
+        Hook covers 0-15s and Intro/Branding 15-30s; the Call to Action and Outro
+        take the last 15% and 5% of the video. Each segment goes to the section
+        its midpoint falls in.
+
+        Returns:
+            Dictionary mapping section id to a list of segments
+        """
+        duration = video_duration or max((seg["end"] for seg in segments), default=0)
+        cta_start = max(30.0, duration * 0.85)
+        outro_start = max(cta_start, duration * 0.95)
+        windows = [
+            ("hook", 0.0, 15.0),
+            ("intro", 15.0, 30.0),
+            ("main_content", 30.0, cta_start),
+            ("call_to_action", cta_start, outro_start),
+            ("outro", outro_start, float("inf")),
+        ]
+
+        sections = {section_id: [] for section_id, _, _ in windows}
+        for seg in segments:
+            midpoint = (seg["start"] + seg["end"]) / 2
+            for section_id, window_start, window_end in windows:
+                if window_start <= midpoint < window_end:
+                    sections[section_id].append(seg)
+                    break
+        return sections
+
+    def structure_script(self, transcript, video_duration=None, segments=None, pivot_segments=None):
         """
         Structure the transcript into a proper script with sections while preserving the original flow.
         
@@ -161,27 +225,30 @@ class ScriptGenerator:
         - Main Content
         - Call to Action
         - Outro (Optional)
+
+        When Whisper segments (dicts with start, end and text) are given, sections are
+        cut by their timestamps; otherwise they are cut by sentence proportions.
+        pivot_segments are English segments of the same audio, translated in place of
+        the originals when there is no direct model for the source language.
         """
         try:
-            # First, translate the entire transcript to preserve the original flow
-            full_translated_transcript = self.translate_text(transcript)
-            
             # Initialize variables
             hook = intro = main_content = call_to_action = outro = ""
             translated_hook = translated_intro = translated_main = translated_cta = translated_outro = ""
             
             # Divide the transcript into sections
-            if video_duration:
-                # Time-based sectioning (just use the full transcript for now)
-                hook = intro = main_content = call_to_action = outro = transcript
+            if segments:
+                # Time-based sectioning from the segment timestamps
+                originals, section_texts = self.segment_section_texts(segments, video_duration, pivot_segments)
+                hook, intro, main_content, call_to_action, outro = originals
                 
-                # Translate each section individually
-                translated_hook = self.translate_text(transcript[:100])  # Just take first 100 chars for hook
-                translated_intro = self.translate_text(transcript[100:300])  # Next 200 chars for intro
-                translated_main = self.translate_text(transcript[300:-200])  # Middle part for main content
-                translated_cta = self.translate_text(transcript[-200:-50])  # Last part for call to action
-                translated_outro = self.translate_text(transcript[-50:])  # Very end for outro
+                # Translate only the text of each section, in one batched pass
+                translated_hook, translated_intro, translated_main, translated_cta, translated_outro = \
+                    self.translate_texts(section_texts)
             else:
+                # First, translate the entire transcript to preserve the original flow
+                full_translated_transcript = self.translate_text(transcript)
+
                 # Text-based sectioning
                 sentences = safe_sent_tokenize(transcript)
                 total_sentences = len(sentences)
@@ -225,6 +292,40 @@ class ScriptGenerator:
             translated_cta = "Gracias por su comprensión."
             translated_outro = ""
         
+        return self.format_scripts(
+            [hook, intro, main_content, call_to_action, outro],
+            [translated_hook, translated_intro, translated_main, translated_cta, translated_outro]
+        )
+
+    def segment_section_texts(self, segments, video_duration=None, pivot_segments=None):
+        """
+        Cut timestamped segments into the five section texts.
+
+        Returns:
+            Tuple of (original section texts, section texts to translate), both ordered as
+            SECTION_IDS; the texts to translate come from pivot_segments when given
+        """
+        sectioned = self.section_segments(segments, video_duration)
+        originals = [
+            ' '.join(seg["text"].strip() for seg in sectioned[section_id]).strip()
+            for section_id in SECTION_IDS
+        ]
+        to_translate = originals
+        if pivot_segments:
+            pivot_sectioned = self.section_segments(pivot_segments, video_duration)
+            to_translate = [
+                ' '.join(seg["text"].strip() for seg in pivot_sectioned[section_id]).strip()
+                for section_id in SECTION_IDS
+            ]
+        return originals, to_translate
+
+    def format_scripts(self, originals, translations):
+        """
+        Format original and translated section texts (ordered as SECTION_IDS) into scripts.
+        """
+        hook, intro, main_content, call_to_action, outro = originals
+        translated_hook, translated_intro, translated_main, translated_cta, translated_outro = translations
+
         # Format both original and translated scripts with ordered sections
         original_script = {
             "sections": [
@@ -305,7 +406,9 @@ class ScriptGenerator:
             
         return {"original": original_script, "spanish": spanish_script}
 
-def generate_structured_scripts(transcript, video_duration=None):
-    """Generate structured scripts (original and Spanish) from an English transcript."""
-    generator = ScriptGenerator()
-    return generator.structure_script(transcript, video_duration)
+def generate_structured_scripts(transcript, video_duration=None, progress_callback=None, segments=None,
+                                source_language='en', pivot_segments=None):
+    """Generate structured scripts (original and Spanish) from a transcript in source_language."""
+    generator = ScriptGenerator(progress_callback=progress_callback, source_language=source_language)
+    return generator.structure_script(transcript, video_duration, segments=segments,
+                                      pivot_segments=pivot_segments)
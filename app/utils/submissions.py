@@ -0,0 +1,332 @@
+"""
+Submit-time deduplication and rate limiting.
+A double-click, a retrying client or several users sharing the same YouTube link would
+otherwise each enqueue a celery_transcribe job doing identical work. Every submission is
+keyed by what it processes: the upload's content hash or the YouTube video ID (plus an
+explicitly requested model). The first submission claims the key with SET NX and becomes
+the single flight; later ones attach to its task ID for as long as that task is queued,
+running or holding a result. Attached submissions are counted, so a submission that
+abandons its task (an early upload superseded by its options) can leave it running for
+the others. Submissions are also rate limited per client with a
+sliding window kept in Redis.
+
+    python -m app.utils.submissions report
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import redis
+
+from app.utils.result_store import RESULT_TTL_SECONDS, TASK_KEY_PREFIX
+from app.utils.transcription import REDIS_URL
+
+DEDUP_KEY_PREFIX = 'dedup:'
+# Count of the later submissions attached to a task
+ATTACHED_KEY_PREFIX = 'attached:'
+RATE_KEY_PREFIX = 'ratelimit:'
+STATS_KEY = 'submissions:stats'
+
+# Submissions allowed per client within the window
+RATE_LIMIT = int(os.environ.get('SUBMIT_RATE_LIMIT', 10))
+RATE_WINDOW_SECONDS = int(os.environ.get('SUBMIT_RATE_WINDOW_SECONDS', 60))
+
+# A finished task is reused while its result is kept
+DEDUP_TTL_SECONDS = int(os.environ.get('DEDUP_TTL', RESULT_TTL_SECONDS))
+# A claim this fresh belongs to a submission still being scheduled, before its job
+# record exists, and is never treated as stale
+CLAIM_GRACE_SECONDS = 120
+
+HASH_CHUNK_BYTES = 1024 * 1024
+YOUTUBE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# Replace a stale claim only if no one else has replaced it in the meantime
+REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+# Attach to a claim only while it still names the task that was checked
+ATTACH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+# Detach a submission that no longer waits for its task
+DETACH_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+# Release the owner's claim, unless submissions are attached to its task
+ABANDON_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') > 0 then
+    return 0
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+# Release a claim whose submission failed, unless it already belongs to someone else
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _redis(redis_url: Optional[str] = None):
+    return redis.Redis.from_url(redis_url or os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+
+
+def youtube_video_id(url: str) -> Optional[str]:
+    """
+    The 11-character video ID of a YouTube URL (watch, youtu.be, shorts, embed and live links).
+    """
+    parsed = urlparse(url.strip() if '//' in url else f'https://{url.strip()}')
+    host = (parsed.hostname or '').lower()
+    candidate = None
+    if host == 'youtu.be':
+        candidate = parsed.path.strip('/').split('/')[0]
+    elif host.endswith('youtube.com') or host.endswith('youtube-nocookie.com'):
+        if parsed.path == '/watch':
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        else:
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+                candidate = parts[1]
+    return candidate if candidate and YOUTUBE_ID_PATTERN.match(candidate) else None
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def submission_key(kind: str, identity: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Deduplication key of a submission.
+
+    Args:
+        kind: 'upload', 'upload-head' (hash of a faststart upload's header) or 'youtube'
+        identity: Content hash or video ID
+        options: Transcription options; only an explicit model changes the work done
+
+    Returns:
+        The key
+    """
+    key = f'{kind}:{identity}'
+    if options and options.get('model_size'):
+        key += f":model={options['model_size']}"
+    return key
+
+
+def youtube_key(url: str, options: Optional[Dict[str, Any]] = None) -> str:
+    video_id = youtube_video_id(url)
+    if video_id:
+        return submission_key('youtube', video_id, options)
+    # Not a recognizable video link: only the exact same URL is a duplicate
+    return submission_key('url', hashlib.sha256(url.strip().encode('utf-8')).hexdigest(), options)
+
+
+def _task_alive(r, task_id: str, claim_ttl: int) -> bool:
+    """
+    Whether a deduplicated task can still be attached to: scheduled, running or finished
+    with its result kept, and not failed.
+    """
+    from app.utils.scheduler import JOBS_KEY
+    pipe = r.pipeline()
+    pipe.hmget(f'{TASK_KEY_PREFIX}{task_id}', ['status', 'error'])
+    pipe.hexists(JOBS_KEY, task_id)
+    (status, error), scheduled = pipe.execute()
+    if status in (b'failure', b'error') or error:
+        return False
+    if status is not None or scheduled:
+        return True
+    # Claimed moments ago and not scheduled yet
+    return claim_ttl > DEDUP_TTL_SECONDS - CLAIM_GRACE_SECONDS
+
+
+def single_flight(key: str, submit: Callable[[str], str], redis_url: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Run a submission unless an identical one is already in flight or finished.
+
+    Args:
+        key: Deduplication key from submission_key or youtube_key
+        submit: Callable scheduling the job under the task ID it is given
+        redis_url: Optional Redis URL
+
+    Returns:
+        Tuple of (task ID, whether it belongs to an earlier identical submission)
+    """
+    task_id = str(uuid.uuid4())
+    dedup_key = f'{DEDUP_KEY_PREFIX}{key}'
+    try:
+        r = _redis(redis_url)
+        # A few rounds settle races with submissions replacing the same stale claim
+        for _ in range(3):
+            if r.set(dedup_key, task_id, nx=True, ex=DEDUP_TTL_SECONDS):
+                break
+            pipe = r.pipeline()
+            pipe.get(dedup_key)
+            pipe.ttl(dedup_key)
+            existing, claim_ttl = pipe.execute()
+            if existing is None:
+                continue
+            if _task_alive(r, existing.decode('utf-8'), claim_ttl):
+                if not r.eval(ATTACH_SCRIPT, 2, dedup_key, f'{ATTACHED_KEY_PREFIX}{existing.decode("utf-8")}',
+                              existing, DEDUP_TTL_SECONDS):
+                    continue
+                r.hincrby(STATS_KEY, 'duplicates', 1)
+                print(f"Duplicate submission {key}: attached to {existing.decode('utf-8')}")
+                return existing.decode('utf-8'), True
+            if r.eval(REPLACE_SCRIPT, 1, dedup_key, existing, task_id, DEDUP_TTL_SECONDS):
+                break
+        r.hincrby(STATS_KEY, 'submitted', 1)
+    except redis.RedisError as e:
+        # Deduplication is best effort; the job still runs
+        print(f"Error deduplicating submission {key}: {str(e)}")
+        return submit(task_id), False
+
+    try:
+        return submit(task_id), False
+    except Exception:
+        try:
+            r.eval(RELEASE_SCRIPT, 1, dedup_key, task_id)
+        except redis.RedisError as e:
+            print(f"Error releasing submission {key}: {str(e)}")
+        raise
+
+
+def claim(key: str, task_id: str, redis_url: Optional[str] = None) -> bool:
+    """
+    Register a task that is already scheduled under another key as well, e.g. an upload
+    processed early under the hash of its content once the whole file has arrived.
+
+    Returns:
+        Whether the key was free and now names task_id
+    """
+    try:
+        return bool(_redis(redis_url).set(f'{DEDUP_KEY_PREFIX}{key}', task_id, nx=True, ex=DEDUP_TTL_SECONDS))
+    except redis.RedisError as e:
+        print(f"Error claiming submission {key}: {str(e)}")
+        return False
+
+
+def detach(task_id: str, redis_url: Optional[str] = None):
+    """
+    Stop counting a submission attached to task_id, e.g. an upload aborted before it completed.
+    """
+    try:
+        _redis(redis_url).eval(DETACH_SCRIPT, 1, f'{ATTACHED_KEY_PREFIX}{task_id}')
+    except redis.RedisError as e:
+        print(f"Error detaching from {task_id}: {str(e)}")
+
+
+def abandon(key: str, task_id: str, redis_url: Optional[str] = None) -> bool:
+    """
+    Release the claim of a submission that no longer wants its task, so the next identical
+    submission is scheduled afresh.
+
+    Args:
+        key: Deduplication key the task was submitted under
+        task_id: The task
+        redis_url: Optional Redis URL
+
+    Returns:
+        True if no other submission is attached to the task and it can be cancelled;
+        False if the task was left in place for the attached submissions
+    """
+    try:
+        return bool(_redis(redis_url).eval(ABANDON_SCRIPT, 2, f'{DEDUP_KEY_PREFIX}{key}',
+                                           f'{ATTACHED_KEY_PREFIX}{task_id}', task_id))
+    except redis.RedisError as e:
+        # Nothing is known about attached submissions; cancel as before deduplication
+        print(f"Error abandoning submission {key}: {str(e)}")
+        return True
+
+
+def check_rate_limit(client: str, redis_url: Optional[str] = None) -> Optional[int]:
+    """
+    Count a submission against the client's sliding-window limit.
+
+    Args:
+        client: Client identifier (tenant or address)
+        redis_url: Optional Redis URL
+
+    Returns:
+        None if the submission is allowed, otherwise the seconds until it would be
+    """
+    if RATE_LIMIT <= 0:
+        return None
+    key = f'{RATE_KEY_PREFIX}{client}'
+    now = time.time()
+    member = f'{now}:{uuid.uuid4().hex[:8]}'
+    try:
+        r = _redis(redis_url)
+        pipe = r.pipeline()
+        pipe.zremrangebyscore(key, 0, now - RATE_WINDOW_SECONDS)
+        pipe.zadd(key, {member: now})
+        pipe.zcard(key)
+        pipe.expire(key, RATE_WINDOW_SECONDS)
+        _, _, count, _ = pipe.execute()
+        if count <= RATE_LIMIT:
+            return None
+        # Rejected submissions do not count toward the limit
+        pipe = r.pipeline()
+        pipe.zrem(key, member)
+        pipe.zrange(key, 0, 0, withscores=True)
+        pipe.hincrby(STATS_KEY, 'rate_limited', 1)
+        _, oldest, _ = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Error checking the submission rate: {str(e)}")
+        return None
+    retry_after = oldest[0][1] + RATE_WINDOW_SECONDS - now if oldest else RATE_WINDOW_SECONDS
+    print(f"Rate limited {client}: more than {RATE_LIMIT} submissions in {RATE_WINDOW_SECONDS}s")
+    return max(1, int(retry_after + 0.999))
+
+
+def submission_report(redis_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Counts of submissions scheduled, attached to an earlier identical one, and rate limited.
+    """
+    r = _redis(redis_url)
+    stats = {name.decode('utf-8'): int(value) for name, value in r.hgetall(STATS_KEY).items()}
+    total = stats.get('submitted', 0) + stats.get('duplicates', 0)
+    return {
+        'submitted': stats.get('submitted', 0),
+        'duplicates': stats.get('duplicates', 0),
+        'rate_limited': stats.get('rate_limited', 0),
+        'duplicate_share': round(stats.get('duplicates', 0) / total, 4) if total else 0.0,
+        'rate_limit': {'submissions': RATE_LIMIT, 'window_seconds': RATE_WINDOW_SECONDS},
+    }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if command == 'report':
+        print(json.dumps(submission_report(), indent=2))
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
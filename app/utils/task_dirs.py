@@ -0,0 +1,80 @@
+"""
+Directories holding one subdirectory per task, deleted once older than a TTL.
+Shared by the frame store and the checkpoint store, which differ only in what they
+keep inside each task's directory.
+"""
+
+import os
+import shutil
+import time
+from typing import List, Optional
+
+GC_MARKER = '.last_gc'
+GC_INTERVAL_SECONDS = 3600
+
+
+class TaskDirectoryStore:
+    """
+    Root directory with one subdirectory per task, garbage collected after ttl_seconds.
+    """
+
+    # Names the store in garbage collection messages
+    label = 'Task directory'
+
+    def __init__(self, root: str, ttl_seconds: int):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.root, exist_ok=True)
+
+    def task_dir(self, task_id: str) -> str:
+        # Task IDs become directory names, so never let one escape the root
+        safe_id = os.path.basename(str(task_id))
+        if not safe_id or safe_id in ('.', '..'):
+            raise ValueError(f"Invalid task ID: {task_id!r}")
+        return os.path.join(self.root, safe_id)
+
+    def collect_garbage(self, now: Optional[float] = None) -> int:
+        """
+        Delete task directories older than the TTL.
+
+        Returns:
+            Number of task directories removed
+        """
+        now = now or time.time()
+        removed = []
+        for name in os.listdir(self.root):
+            task_dir = os.path.join(self.root, name)
+            if not os.path.isdir(task_dir):
+                continue
+            try:
+                age = now - os.path.getmtime(task_dir)
+            except OSError:
+                continue
+            if age > self.ttl_seconds:
+                shutil.rmtree(task_dir, ignore_errors=True)
+                removed.append(name)
+        with open(os.path.join(self.root, GC_MARKER), 'w') as f:
+            f.write(str(now))
+        if removed:
+            self.on_collected(removed)
+        return len(removed)
+
+    def on_collected(self, task_ids: List[str]):
+        """
+        Called with the IDs of the tasks whose directories garbage collection removed.
+        """
+
+    def maybe_collect_garbage(self) -> int:
+        """
+        Run garbage collection if it has not run within the last GC_INTERVAL_SECONDS.
+        """
+        marker = os.path.join(self.root, GC_MARKER)
+        try:
+            if time.time() - os.path.getmtime(marker) < GC_INTERVAL_SECONDS:
+                return 0
+        except OSError:
+            pass
+        removed = self.collect_garbage()
+        if removed:
+            print(f"{self.label} garbage collection removed {removed} task directories")
+        return removed
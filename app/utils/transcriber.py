@@ -0,0 +1,144 @@
+"""
+Speech recognition backends behind one transcriber interface.
+'whisper' runs openai-whisper in PyTorch; 'faster-whisper' runs the same Whisper weights
+converted to CTranslate2, with int8 inference on CPU, a built-in voice activity filter
+and segments streamed as they are decoded. ASR_BACKEND selects the backend for every
+worker and the Streamlit app; both return the same result structure.
+"""
+
+import os
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+BACKENDS = ('whisper', 'faster-whisper')
+ASR_BACKEND = os.environ.get('ASR_BACKEND', 'whisper')
+
+# Let faster-whisper skip non-speech with its Silero VAD filter before decoding
+FASTER_WHISPER_VAD = os.environ.get('FASTER_WHISPER_VAD', '1') != '0'
+
+
+def backend_name(backend: Optional[str] = None) -> str:
+    backend = backend or ASR_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+class Transcriber:
+    """
+    A loaded speech recognition model.
+    Subclasses implement stream(); transcribe() collects what it yields.
+    """
+    backend = None
+
+    def __init__(self, model, model_size: str):
+        self.model = model
+        self.model_size = model_size
+
+    def stream(self, audio_path: str, task: str = 'transcribe',
+               options: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Iterator[Dict[str, Any]]]:
+        """
+        Start decoding audio.
+
+        Args:
+            audio_path: Path to the audio file
+            task: 'transcribe', or 'translate' to translate the speech to English
+            options: Decoding options (beam_size, condition_on_previous_text, fp16)
+
+        Returns:
+            Tuple of (detected language, iterator of segments with 'start', 'end' and 'text')
+        """
+        raise NotImplementedError
+
+    def transcribe(self, audio_path: str, task: str = 'transcribe', options: Optional[Dict[str, Any]] = None,
+                   progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Transcribe audio.
+
+        Args:
+            audio_path: Path to the audio file
+            task: 'transcribe', or 'translate' to translate the speech to English
+            options: Decoding options (beam_size, condition_on_previous_text, fp16)
+            progress_callback: Optional callable receiving the audio seconds decoded so far
+
+        Returns:
+            Dictionary with 'text', 'language' and 'segments'
+        """
+        language, segments = self.stream(audio_path, task=task, options=options)
+        collected = []
+        for segment in segments:
+            collected.append(segment)
+            if progress_callback:
+                progress_callback(segment['end'])
+        return {"text": ''.join(segment['text'] for segment in collected), "language": language,
+                "segments": collected}
+
+
+class WhisperTranscriber(Transcriber):
+    """
+    openai-whisper. Segments are only available once the whole file is decoded, so
+    progress comes from Whisper's own progress bar instead.
+    """
+    backend = 'whisper'
+
+    def stream(self, audio_path, task='transcribe', options=None):
+        result = self.model.transcribe(audio_path, task=task, **(options or {}))
+        segments = (
+            {"start": float(seg['start']), "end": float(seg['end']), "text": seg['text']}
+            for seg in result.get('segments', [])
+        )
+        return result.get('language'), segments
+
+    def transcribe(self, audio_path, task='transcribe', options=None, progress_callback=None):
+        from app.utils.transcription import whisper_progress
+        with whisper_progress(progress_callback):
+            return super().transcribe(audio_path, task=task, options=options)
+
+
+class FasterWhisperTranscriber(Transcriber):
+    """
+    faster-whisper (CTranslate2). Segments are decoded lazily as the iterator is consumed.
+    """
+    backend = 'faster-whisper'
+
+    def stream(self, audio_path, task='transcribe', options=None):
+        options = dict(options or {})
+        # Precision is fixed when the model is loaded
+        options.pop('fp16', None)
+        # openai-whisper decodes greedily without a beam size; faster-whisper defaults to 5
+        options['beam_size'] = options.get('beam_size') or 1
+        segments, info = self.model.transcribe(audio_path, task=task, vad_filter=FASTER_WHISPER_VAD, **options)
+        segments = (
+            {"start": float(seg.start), "end": float(seg.end), "text": seg.text}
+            for seg in segments
+        )
+        return info.language, segments
+
+
+def as_transcriber(model, model_size: str = 'base') -> Transcriber:
+    """
+    Wrap a bare openai-whisper model, as loaded by earlier callers, in a Transcriber.
+    """
+    if isinstance(model, Transcriber):
+        return model
+    return WhisperTranscriber(model, model_size)
+
+
+def get_transcriber(model_size: str = 'base', precision: Optional[str] = None,
+                    backend: Optional[str] = None) -> Transcriber:
+    """
+    Return a transcriber backed by the cached model.
+
+    Args:
+        model_size: Whisper model size
+        precision: 'fp32', 'fp16' or 'int8' (default: the backend's default for the device)
+        backend: 'whisper' or 'faster-whisper' (default: ASR_BACKEND)
+
+    Returns:
+        The Transcriber
+    """
+    backend = backend_name(backend)
+    if backend == 'faster-whisper':
+        from app.utils.model_registry import get_faster_whisper_model
+        return FasterWhisperTranscriber(get_faster_whisper_model(model_size, precision), model_size)
+    from app.utils.model_registry import get_whisper_model
+    return WhisperTranscriber(get_whisper_model(model_size, precision=precision), model_size)
@@ -0,0 +1,199 @@
+"""
+Full-text transcript search.
+Transcript segments of every processed video are kept in a SQLite database with an FTS5
+index over their text, so phrase and keyword queries across all videos return ranked,
+highlighted snippets with the segment timestamps. Tasks are indexed as they complete;
+re-indexing a task replaces its segments.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, 'transcript_index.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    task_id TEXT PRIMARY KEY,
+    language TEXT,
+    segment_count INTEGER,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_task ON segments(task_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Quoted phrases or single words of a user query
+QUERY_TERM_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Turn a user query into FTS5 syntax: "quoted phrases" stay phrases, other words must
+    all appear, and everything is quoted so user input never reaches the FTS5 parser raw.
+    """
+    terms = []
+    for phrase, word in QUERY_TERM_PATTERN.findall(query):
+        term = (phrase or word).replace('"', '').strip()
+        if term:
+            terms.append(f'"{term}"')
+    return ' '.join(terms)
+
+
+class TranscriptIndex:
+    """
+    SQLite FTS5 index over transcript segments.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index, creating the database on first use.
+
+        Args:
+            path: Database file (default: TRANSCRIPT_INDEX_PATH or <project>/transcript_index.sqlite3)
+        """
+        self.path = path or os.environ.get('TRANSCRIPT_INDEX_PATH', DEFAULT_PATH)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        # WAL lets the web process search while a worker is indexing
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def index_transcript(self, task_id: str, segments: List[Dict[str, Any]], language: Optional[str] = None) -> int:
+        """
+        Index (or re-index) the segments of one task.
+
+        Args:
+            task_id: Task the transcript belongs to
+            segments: Segments with start, end and text keys
+            language: Detected source language
+
+        Returns:
+            Number of segments indexed
+        """
+        rows = [(task_id, seg.get("start"), seg.get("end"), seg["text"].strip())
+                for seg in segments if seg.get("text", "").strip()]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM segments WHERE task_id = ?', (task_id,))
+                conn.executemany('INSERT INTO segments(task_id, start, end, text) VALUES (?, ?, ?, ?)', rows)
+                conn.execute(
+                    'INSERT OR REPLACE INTO transcripts(task_id, language, segment_count, indexed_at) VALUES (?, ?, ?, ?)',
+                    (task_id, language, len(rows), time.time())
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def delete(self, task_id: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM segments WHERE task_id = ?', (task_id,))
+                conn.execute('DELETE FROM transcripts WHERE task_id = ?', (task_id,))
+        finally:
+            conn.close()
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Return the best matching segments across all transcripts.
+
+        Args:
+            query: Words and "quoted phrases", all of which must match
+            limit: Maximum number of segments
+            offset: Number of top segments to skip, for paging
+
+        Returns:
+            Segments ordered by BM25 rank, each with task_id, start, end, a highlighted
+            snippet and its score (lower is better)
+        """
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT s.task_id, s.start, s.end,
+                       snippet(segments_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                       bm25(segments_fts) AS score
+                FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid
+                WHERE segments_fts MATCH ?
+                ORDER BY score LIMIT ? OFFSET ?
+                """,
+                (fts_query, limit, offset)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row, score=round(row["score"], 4)) for row in rows]
+
+    def search_videos(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Return the videos whose transcripts match, with their hit count and best segment.
+
+        Returns:
+            One entry per task ordered by its best segment's rank, with task_id, language,
+            hits, and the start, end and snippet of the best segment
+        """
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                WITH hits AS (
+                    SELECT s.task_id, s.start, s.end,
+                           snippet(segments_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                           bm25(segments_fts) AS score
+                    FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid
+                    WHERE segments_fts MATCH ?
+                ), ranked AS (
+                    SELECT *, COUNT(*) OVER (PARTITION BY task_id) AS hits,
+                           ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY score) AS position
+                    FROM hits
+                )
+                SELECT r.task_id, t.language, r.hits, r.start, r.end, r.snippet, r.score
+                FROM ranked r LEFT JOIN transcripts t ON t.task_id = r.task_id
+                WHERE r.position = 1
+                ORDER BY r.score LIMIT ?
+                """,
+                (fts_query, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row, score=round(row["score"], 4)) for row in rows]
+
+
+def index_transcript(task_id: str, segments: List[Dict[str, Any]], language: Optional[str] = None) -> int:
+    """
+    Index a finished task's transcript, logging instead of failing the task on errors.
+    """
+    try:
+        return TranscriptIndex().index_transcript(task_id, segments, language)
+    except Exception as e:
+        print(f"Error indexing transcript: {str(e)}")
+        return 0
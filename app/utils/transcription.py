@@ -1,10 +1,13 @@
 import os
 import tempfile
 import subprocess
-import json
-from pytube import YouTube
-import whisper
-import traceback
+import wave
+import types
+import importlib
+import contextlib
+
+# Heavy ML libraries (whisper, torch, transformers) are imported inside the functions
+# that use them, so the web process can import celery_transcribe without loading them.
 
 # Download YouTube video and return the path to the downloaded file
 
@@ -77,21 +80,105 @@ def extract_audio(video_path, audio_path):
     subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
     return audio_path
 
-# Transcribe audio using OpenAI Whisper
+# Duration of a PCM WAV file in seconds
+
+def get_audio_duration(audio_path):
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception as e:
+        print(f"Could not read audio duration: {str(e)}")
+        return None
+
+# Whisper reports decoding progress through a tqdm bar counted in mel frames (100 per second)
+
+WHISPER_FRAMES_PER_SECOND = 100
+
+
+@contextlib.contextmanager
+def whisper_progress(progress_callback):
+    """
+    Route Whisper's internal progress bar to a callback receiving audio seconds decoded.
+    """
+    if progress_callback is None:
+        yield
+        return
+
+    whisper_transcribe_module = importlib.import_module('whisper.transcribe')
+
+    class _ProgressBar:
+        def __init__(self, total=None, **kwargs):
+            self.n = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def update(self, n=1):
+            self.n += n
+            progress_callback(self.n / WHISPER_FRAMES_PER_SECOND)
+
+    original_tqdm = whisper_transcribe_module.tqdm
+    whisper_transcribe_module.tqdm = types.SimpleNamespace(tqdm=_ProgressBar)
+    try:
+        yield
+    finally:
+        whisper_transcribe_module.tqdm = original_tqdm
+
+# Transcribe audio with the configured backend, keeping the timestamped segments
+
+def transcribe_audio_segments(audio_path, model_size='base', progress_callback=None, task='transcribe', model=None,
+                              options=None, vad=None):
+    """
+    Transcribe audio and return the text with Whisper's segments.
+    With task='translate', Whisper translates the speech to English instead.
+    A preloaded model may be passed in, either a Transcriber from app.utils.transcriber
+    or a bare openai-whisper model; otherwise the cached one of the ASR_BACKEND backend
+    is used. Decoding options (beam_size, condition_on_previous_text, fp16) are passed to
+    the backend as given, e.g. from app.utils.asr_policy.DecodingPlan.options().
+    Unless vad is False (default: the VAD setting), non-speech spans are cut before
+    transcription (see app.utils.vad); timestamps still refer to the original audio.
+
+    Returns:
+        Dictionary with 'text', 'language' (as detected by Whisper) and 'segments'
+        (each with 'start', 'end' and 'text')
+    """
+    from app.utils.transcriber import as_transcriber, get_transcriber
+    transcriber = as_transcriber(model, model_size) if model is not None else get_transcriber(model_size)
+
+    from app.utils import vad as speech_activity
+    if not (speech_activity.VAD_ENABLED if vad is None else vad):
+        return transcriber.transcribe(audio_path, task=task, options=options, progress_callback=progress_callback)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        speech_path = os.path.join(tmpdir, 'speech.wav')
+        try:
+            speech_map = speech_activity.trim_non_speech(audio_path, speech_path)
+        except Exception as e:
+            print(f"Speech activity detection failed, transcribing the full audio: {str(e)}")
+            speech_map = None
+        if speech_map is None:
+            return transcriber.transcribe(audio_path, task=task, options=options,
+                                          progress_callback=progress_callback)
+        transcription = transcriber.transcribe(speech_path, task=task, options=options,
+                                               progress_callback=speech_map.progress(progress_callback))
+    return speech_map.remap(transcription)
 
-def transcribe_audio(audio_path, model_size='base'):
-    model = whisper.load_model(model_size)
-    result = model.transcribe(audio_path)
-    return result['text']
+# Transcribe audio with the configured backend
+
+def transcribe_audio(audio_path, model_size='base', progress_callback=None):
+    return transcribe_audio_segments(audio_path, model_size, progress_callback)['text']
 
 # Main entry point for transcription
-from celery import current_task
 import redis
 
 REDIS_URL = 'redis://localhost:6379/0'
 
+from app.utils.result_store import RESULT_TTL_SECONDS, maybe_sweep, write_task_fields
+
 
-def set_task_progress(task_id, progress, status_msg=None, result=None):
+def set_task_progress(task_id, progress, status_msg=None, result=None, eta_seconds=None):
     """
     Set the progress of a task in Redis.
     
@@ -100,6 +187,7 @@ def set_task_progress(task_id, progress, status_msg=None, result=None):
         progress: The progress percentage (0-100)
         status_msg: A status message (optional)
         result: Optional result data
+        eta_seconds: Estimated seconds of work remaining (optional)
     """
     try:
         r = redis.Redis.from_url(REDIS_URL)
@@ -117,6 +205,9 @@ def set_task_progress(task_id, progress, status_msg=None, result=None):
         
         if status_msg:
             task_data['status_msg'] = status_msg
+
+        if eta_seconds is not None:
+            task_data['eta_seconds'] = eta_seconds
             
         if result:
             task_data['result'] = result
@@ -124,145 +215,177 @@ def set_task_progress(task_id, progress, status_msg=None, result=None):
             if progress == 100:
                 task_data['status'] = 'success'
         
-        # Store all data as a hash
-        r.hset(task_key, mapping=task_data)
+        # Store all data as a hash; every update re-arms the expiry
+        pipe = r.pipeline()
+        pipe.hset(task_key, mapping=task_data)
+        pipe.expire(task_key, RESULT_TTL_SECONDS)
+        pipe.execute()
     except Exception as e:
         print(f"Error setting task progress: {str(e)}")
 
-from app import create_app
+def store_task_result(task_id, result):
+    """
+    Store a finished pipeline result in the task's Redis hash and mark it complete.
+    Large fields are compressed or spilled to the object store (see app.utils.result_store),
+    and the hash expires after RESULT_TTL seconds.
+    
+    Args:
+        task_id: The ID of the task
+        result: Dictionary returned by app.utils.pipeline.run_pipeline
+    """
+    r = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+    task_data = {
+        'progress': 100,
+        'status': 'success',
+        'status_msg': 'Completed',
+        'eta_seconds': 0,
+        'transcript': result['transcript'],
+        'structured_transcript': result['structured_transcript'],
+        'spanish_script': result['spanish_script'],
+        'scenes': result['scenes'],
+    }
+    if result.get('language'):
+        task_data['language'] = result['language']
+    write_task_fields(r, task_id, task_data)
+    maybe_sweep(r)
+
+def mark_task_failed(task_id, message):
+    """
+    Record a task's final failure in its Redis hash.
+    """
+    try:
+        r = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+        write_task_fields(r, task_id, {'progress': 100, 'status': 'failure', 'status_msg': message})
+    except Exception as e:
+        print(f"Error recording task failure: {str(e)}")
+
+def cancel_task(task_id, message):
+    """
+    Cancel a submitted task from outside the worker, e.g. when the upload it was started
+    for early is aborted. The task stops at its next cancellation check.
+    """
+    try:
+        r = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+        write_task_fields(r, task_id, {'progress': 100, 'status': 'failure', 'status_msg': message,
+                                       'error': message})
+    except Exception as e:
+        print(f"Error cancelling task {task_id}: {str(e)}")
+
+def task_cancellation(task_id):
+    """
+    The message a task was cancelled with, or None if it was not cancelled.
+    """
+    r = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL))
+    error = r.hget(f'celery-task-meta-{task_id}', 'error')
+    return error.decode('utf-8') if error else None
 
 from celery import shared_task
 
-@shared_task(bind=True)
-def celery_transcribe(self, source_path_or_url, is_youtube=False, model_size='base'):
-    set_task_progress(self.request.id, 5, 'Starting transcription')
-    with tempfile.TemporaryDirectory() as tmpdir:
-        try:
-            if is_youtube:
-                set_task_progress(self.request.id, 10, 'Downloading YouTube video and audio')
-                # Now returns a tuple of (video_path, audio_path)
-                video_path, audio_path = download_youtube_video(source_path_or_url, tmpdir)
+# Retries after a crash, timeout or lost worker resume from the last checkpointed stage
+MAX_TASK_RETRIES = int(os.environ.get('MAX_TASK_RETRIES', 2))
+
+# The task hash above is the single record of a result; letting Celery's backend store the
+# return value as well would overwrite it with an unmanaged copy that never expires
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=MAX_TASK_RETRIES,
+             ignore_result=True)
+def celery_transcribe(self, source_path_or_url, is_youtube=False, model_size=None, slo_seconds=None):
+    """
+    Process one video. The Whisper model and decoding options are chosen per job by
+    app.utils.asr_policy unless a model_size is requested; slo_seconds is the latency
+    target from submission to completion that the policy plans for.
+    """
+    import threading
+    from app.utils import early_scenes as early
+    from app.utils.asr_policy import choose_plan
+    from app.utils.checkpoints import CheckpointStore, source_content_hash
+    from app.utils.transcript_index import index_transcript
+    from app.utils.progress import ProgressTracker
+    from app.utils.pipeline import DEFAULT_INTERVAL_SECONDS, DEFAULT_MAX_FRAMES, pipeline_stages, run_pipeline
+    asr_plan = choose_plan(self.request.id, model_size=model_size, slo_seconds=slo_seconds,
+                           source=source_path_or_url, is_youtube=is_youtube)
+    model_size = asr_plan.model_size
+    tracker = ProgressTracker(self.request.id, pipeline_stages(is_youtube, model_size))
+    set_task_progress(self.request.id, 0, 'Starting transcription')
+    store = CheckpointStore()
+    store.maybe_collect_garbage()
+
+    def early_progress(status_msg):
+        def report(covered, planned):
+            tracker.status_msg = f'{status_msg} ({covered} of {planned} scenes captioned early)'
+            tracker.report(force=True)
+        return report
+
+    early_scenes = None
+    try:
+        if not is_youtube and early.upload_in_progress(source_path_or_url):
+            # Submitted as soon as the upload's index arrived; caption scenes while the rest comes in
+            tracker.start_stage('extract_audio', 'Receiving upload')
+            early_scenes = early.watch_upload(self.request.id, source_path_or_url, DEFAULT_INTERVAL_SECONDS,
+                                              DEFAULT_MAX_FRAMES, on_progress=early_progress('Receiving upload'))
+            early_scenes.wait_for_transfer()
+        if not is_youtube:
+            # An upload that was aborted, or superseded by options sent after its early
+            # submission, is cancelled before its in-progress marker is cleared
+            cancelled = task_cancellation(self.request.id)
+            if cancelled:
+                if early_scenes is not None:
+                    early_scenes.discard()
+                print(f"Task {self.request.id} cancelled: {cancelled}")
+                mark_task_failed(self.request.id, cancelled)
+                return {"task_id": self.request.id, "cancelled": cancelled}
+
+        checkpoints = store.for_task(self.request.id, source_content_hash(source_path_or_url, is_youtube))
+        media = checkpoints.load('media')
+        media_ready = media is not None and all(os.path.exists(path) for path in media)
+        if is_youtube:
+            if media_ready:
+                tracker.restore_stage('download', 'Downloading YouTube video and audio')
             else:
-                set_task_progress(self.request.id, 10, 'Processing uploaded video')
-                video_path = source_path_or_url
-                audio_path = os.path.join(tmpdir, 'audio.wav')
-                set_task_progress(self.request.id, 40, 'Extracting audio')
-                extract_audio(video_path, audio_path)
-                
-            set_task_progress(self.request.id, 60, 'Transcribing audio')
-            transcript = transcribe_audio(audio_path, model_size=model_size)
-            
-            # Generate Spanish script
-            set_task_progress(self.request.id, 70, 'Generating Spanish script')
-            try:
-                from app.utils.script_generation import generate_structured_scripts
-                structured_scripts = generate_structured_scripts(transcript)
-                # Extract both original structured transcript and Spanish script
-                structured_transcript = structured_scripts["original"]
-                spanish_script = structured_scripts["spanish"]
-                # Ensure the scripts have the expected structure
-                if not isinstance(structured_transcript, dict) or 'sections' not in structured_transcript:
-                    structured_transcript = {
-                        "sections": [
-                            {
-                                "id": "error",
-                                "title": "Error",
-                                "description": "Error in transcript structure",
-                                "content": "The transcript does not have the expected structure."
-                            }
-                        ]
-                    }
-                
-                if not isinstance(spanish_script, dict) or 'sections' not in spanish_script:
-                    spanish_script = {
-                        "sections": [
-                            {
-                                "id": "error",
-                                "title": "Error",
-                                "description": "Error en la estructura del guión",
-                                "content": "El guión no tiene la estructura esperada."
-                            }
-                        ]
-                    }
-                
-                # Convert to JSON
-                structured_transcript_json = json.dumps(structured_transcript)
-                spanish_script_json = json.dumps(spanish_script)
-            except Exception as e:
-                print(f"Error generating Spanish script: {str(e)}")
-                traceback.print_exc()
-                # Create a valid JSON structure even on error
-                structured_transcript_json = json.dumps({
-                    "sections": [
-                        {
-                            "id": "error",
-                            "title": "Error",
-                            "description": "Error in transcript structure",
-                            "content": str(e)
-                        }
-                    ]
-                })
-                spanish_script_json = json.dumps({
-                    "sections": [
-                        {
-                            "id": "error",
-                            "title": "Error",
-                            "description": "Error en la estructura del guión",
-                            "content": str(e)
-                        }
-                    ]
-                })
-                
-            # Extract and describe scenes from the video
-            set_task_progress(self.request.id, 75, 'Extracting and describing scenes')
-            try:
-                from app.utils.scene_extraction import SceneExtractor
-                scene_extractor = SceneExtractor()
-                scenes = scene_extractor.extract_and_describe(
-                    video_path, 
-                    interval_seconds=30,  # Extract a frame every 30 seconds
-                    max_frames=6,         # Maximum 6 frames to avoid long processing
-                    task_id=self.request.id  # Pass the task ID for frame directory naming
-                )
-                
-                # Generate AI prompts for each scene
-                set_task_progress(self.request.id, 90, 'Generating AI prompts for scenes')
-                from app.utils.prompt_generation import PromptGenerator
-                prompt_generator = PromptGenerator()
-                scenes_with_prompts = prompt_generator.generate_prompts_for_scenes(scenes)
-                scenes_json = json.dumps(scenes_with_prompts)
-            except Exception as e:
-                print(f"Error extracting scenes: {str(e)}")
-                traceback.print_exc()
-                # Create a valid JSON structure even on error
-                scenes_json = json.dumps([{
-                    "index": 0,
-                    "timestamp": 0,
-                    "timestamp_formatted": "00:00",
-                    "description": f"Error extracting scenes: {str(e)}"
-                }])
-            
-            # Store the result in Redis
-            r = redis.Redis.from_url(os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'))
-            r.hset(f'celery-task-meta-{self.request.id}', 'progress', 100)
-            r.hset(f'celery-task-meta-{self.request.id}', 'status', 'SUCCESS')
-            r.hset(f'celery-task-meta-{self.request.id}', 'transcript', transcript)
-            r.hset(f'celery-task-meta-{self.request.id}', 'structured_transcript', structured_transcript_json)
-            r.hset(f'celery-task-meta-{self.request.id}', 'spanish_script', spanish_script_json)
-            r.hset(f'celery-task-meta-{self.request.id}', 'scenes', scenes_json)
-            
-            # Also use the helper function for consistency
-            set_task_progress(self.request.id, 100, 'Completed', result=transcript)
-            
-            # Return transcript, Spanish script, and scenes
-            return {
-                "transcript": transcript, 
-                "spanish_script": spanish_script,
-                "scenes": scenes
-            }
-        except Exception as e:
-            set_task_progress(self.request.id, 100, f'Failed: {str(e)}')
-            raise
+                tracker.start_stage('download', 'Downloading YouTube video and audio')
+                media_dir = checkpoints.media_dir(clean=True)
+                downloaded = threading.Event()
+                if early.EARLY_SCENES_ENABLED and checkpoints.load('scenes') is None:
+                    early_scenes = early.watch_download(self.request.id, media_dir, downloaded,
+                                                        DEFAULT_INTERVAL_SECONDS, DEFAULT_MAX_FRAMES,
+                                                        on_progress=early_progress('Downloading YouTube video and audio'))
+                try:
+                    # Now returns a tuple of (video_path, audio_path)
+                    media = download_youtube_video(source_path_or_url, media_dir)
+                finally:
+                    downloaded.set()
+                checkpoints.save('media', media)
+        else:
+            if media_ready:
+                tracker.restore_stage('extract_audio', 'Extracting audio')
+            else:
+                tracker.start_stage('extract_audio', 'Extracting audio')
+                audio_path = os.path.join(checkpoints.media_dir(clean=True), 'audio.wav')
+                extract_audio(source_path_or_url, audio_path)
+                media = (source_path_or_url, audio_path)
+                checkpoints.save('media', media)
+        video_path, audio_path = media
+
+        result = run_pipeline(video_path, audio_path, model_size=model_size,
+                              task_id=self.request.id, tracker=tracker, checkpoints=checkpoints,
+                              early_scenes=early_scenes, asr_plan=asr_plan)
+        
+        # Store the result in Redis
+        store_task_result(self.request.id, result)
+        index_transcript(self.request.id, result['segments'], result['language'])
+        checkpoints.delete()
+        
+        # The result itself lives in the task hash; only return a small summary
+        return {
+            "task_id": self.request.id,
+            "language": result['language'],
+            "scenes": len(result['scenes'])
+        }
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            set_task_progress(self.request.id, tracker.progress(), f'Retrying after error: {str(e)}')
+            raise self.retry(exc=e, countdown=10 * (self.request.retries + 1))
+        mark_task_failed(self.request.id, f'Failed: {str(e)}')
+        raise
 
 def transcribe_video(source_path_or_url, is_youtube=False, model_size='base'):
     with tempfile.TemporaryDirectory() as tmpdir:
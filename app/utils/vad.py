@@ -0,0 +1,341 @@
+"""
+Speech activity detection ahead of transcription.
+Long silences and noisy stretches cost Whisper as much compute as speech does, and are
+where it tends to hallucinate. This module finds speech in the 16 kHz PCM from
+extract_audio with two vectorized per-frame features: energy relative to the
+recording's noise floor, and spectral flatness over the speech band (voiced speech is
+harmonic and far from flat; noise and hiss are flat). Non-speech spans are cut, only
+the speech regions are transcribed, and segment timestamps are mapped back to the
+original timeline. The audio is streamed in blocks, so memory use does not grow with
+its length.
+
+Limitation: the gate separates harmonic sound from silence and noise, not speech from
+music. Tonal music (instrumental or sung) is harmonic too, so music beds and intros
+above the noise floor pass as speech and are transcribed. What is cut is silence and
+noise-like sound such as hiss, though short stretches of loud broadband noise can
+still slip through.
+
+    python -m app.utils.vad audio.wav
+"""
+
+import bisect
+import json
+import os
+import subprocess
+import sys
+import wave
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+VAD_ENABLED = os.environ.get('VAD', '1') != '0'
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Frames analysed per vectorized block, bounding the FFT's memory use on long audio
+BLOCK_FRAMES = 4096
+SPEECH_BAND_HZ = (100, 4000)
+
+# A frame is active when it is this far above the noise floor (the quietest decile of
+# frames) and above an absolute floor, and its speech band is not flat like noise
+ENERGY_MARGIN_DB = float(os.environ.get('VAD_ENERGY_MARGIN_DB', 12.0))
+MIN_ENERGY_DB = -55.0
+MAX_FLATNESS = float(os.environ.get('VAD_MAX_FLATNESS', 0.45))
+
+# Pauses shorter than this stay inside a speech region; only longer spans are cut
+MIN_SILENCE_SECONDS = float(os.environ.get('VAD_MIN_SILENCE_SECONDS', 1.0))
+# Active runs shorter than this are clicks and thumps, not speech
+MIN_SPEECH_SECONDS = 0.25
+# Context kept around each speech region so word onsets and tails are not clipped
+PAD_SECONDS = 0.3
+# Silence inserted between regions in the trimmed audio, so Whisper sees a boundary
+GAP_SECONDS = 0.2
+# Audio with less non-speech than this is transcribed as is
+MIN_TRIM_SHARE = float(os.environ.get('VAD_MIN_TRIM_SHARE', 0.1))
+
+# Samples read per block when streaming audio: one feature block's worth of frames
+PCM_BLOCK_SAMPLES = BLOCK_FRAMES * int(SAMPLE_RATE * FRAME_SECONDS)
+
+
+def iter_pcm(audio_path: str, block_samples: Optional[int] = None) -> Iterator[np.ndarray]:
+    """
+    Read audio as blocks of 16 kHz mono int16 samples.
+    WAVs from extract_audio are read directly; anything else is resampled by ffmpeg
+    and read from its output pipe as it decodes.
+
+    Args:
+        audio_path: Audio file to read
+        block_samples: Samples per block (default PCM_BLOCK_SAMPLES)
+    """
+    block_samples = block_samples or PCM_BLOCK_SAMPLES
+    try:
+        wav = wave.open(audio_path, 'rb')
+    except (wave.Error, EOFError):
+        wav = None
+    if wav is not None:
+        with wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, 2, SAMPLE_RATE):
+                for data in iter(lambda: wav.readframes(block_samples), b''):
+                    yield np.frombuffer(data, dtype=np.int16)
+                return
+    command = [
+        'ffmpeg', '-v', 'error', '-nostdin', '-i', audio_path,
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for data in iter(lambda: process.stdout.read(2 * block_samples), b''):
+            yield np.frombuffer(data, dtype=np.int16)
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    finally:
+        if process.poll() is None:
+            # The reader stopped early; do not leave ffmpeg decoding into a full pipe
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def read_pcm(audio_path: str) -> np.ndarray:
+    """
+    Read a whole recording as 16 kHz mono int16 samples (see iter_pcm).
+    """
+    return np.concatenate([np.empty(0, dtype=np.int16)] + list(iter_pcm(audio_path)))
+
+
+def frame_features(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Energy and speech-band spectral flatness of consecutive non-overlapping frames.
+
+    Args:
+        samples: Mono int16 samples
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        Tuple of (energy in dBFS, flatness between 0 and 1), one value per frame
+    """
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length)
+    window = np.hanning(frame_length).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+
+    energy = np.empty(count, dtype=np.float32)
+    flatness = np.empty(count, dtype=np.float32)
+    for start in range(0, count, BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES].astype(np.float32) / 32768.0
+        energy[start:start + len(block)] = 10.0 * np.log10(np.mean(block * block, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(block * window, axis=1))[:, band] ** 2 + 1e-12
+        flatness[start:start + len(block)] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy, flatness
+
+
+def _runs(active: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    (start, end) frame indices of each run of active frames, end exclusive.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def stream_features(blocks: Iterable[np.ndarray], sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Frame features of streamed audio, keeping only the features in memory.
+
+    Args:
+        blocks: Consecutive blocks of mono int16 samples, e.g. from iter_pcm
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        Tuple of (energy, flatness, number of samples read), as for frame_features
+    """
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    energies = [np.empty(0, dtype=np.float32)]
+    flatnesses = [np.empty(0, dtype=np.float32)]
+    carry = np.empty(0, dtype=np.int16)
+    total = 0
+    for block in blocks:
+        total += len(block)
+        samples = np.concatenate((carry, block)) if len(carry) else block
+        # Frames never straddle blocks: the partial frame at the end waits for the next block
+        usable = len(samples) // frame_length * frame_length
+        energy, flatness = frame_features(samples[:usable], sample_rate)
+        energies.append(energy)
+        flatnesses.append(flatness)
+        carry = samples[usable:]
+    return np.concatenate(energies), np.concatenate(flatnesses), total
+
+
+def regions_from_features(energy: np.ndarray, flatness: np.ndarray, duration: float) -> List[Tuple[float, float]]:
+    """
+    Find the speech regions from per-frame features.
+
+    Args:
+        energy: Energy in dBFS per frame
+        flatness: Speech-band spectral flatness per frame
+        duration: Length of the recording in seconds
+
+    Returns:
+        Sorted, non-overlapping (start, end) regions in seconds, padded for context
+    """
+    if not len(energy):
+        return []
+    threshold = max(float(np.percentile(energy, 10)) + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+    active = (energy > threshold) & (flatness < MAX_FLATNESS)
+
+    regions: List[List[float]] = []
+    for start, end in _runs(active):
+        start, end = start * FRAME_SECONDS, end * FRAME_SECONDS
+        if regions and start - regions[-1][1] < MIN_SILENCE_SECONDS:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    padded: List[Tuple[float, float]] = []
+    for start, end in regions:
+        if end - start < MIN_SPEECH_SECONDS:
+            continue
+        start, end = max(0.0, start - PAD_SECONDS), min(duration, end + PAD_SECONDS)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def speech_regions(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Tuple[float, float]]:
+    """
+    Find the speech regions of a recording held in memory.
+
+    Args:
+        samples: Mono int16 samples
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        Sorted, non-overlapping (start, end) regions in seconds, padded for context
+    """
+    energy, flatness = frame_features(samples, sample_rate)
+    return regions_from_features(energy, flatness, len(samples) / float(sample_rate))
+
+
+def detect_speech(audio_path: str) -> Tuple[List[Tuple[float, float]], float]:
+    """
+    Find the speech regions of an audio file, streaming it in blocks.
+
+    Returns:
+        Tuple of (speech regions as returned by speech_regions, duration in seconds)
+    """
+    energy, flatness, total = stream_features(iter_pcm(audio_path))
+    duration = total / float(SAMPLE_RATE)
+    return regions_from_features(energy, flatness, duration), duration
+
+
+@dataclass
+class SpeechMap:
+    """
+    Where each speech region sits in the trimmed audio and in the original recording.
+    """
+    regions: List[Tuple[float, float]]
+    duration: float
+    trimmed_starts: List[float] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.trimmed_starts:
+            position = 0.0
+            for start, end in self.regions:
+                self.trimmed_starts.append(position)
+                position += end - start + GAP_SECONDS
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(end - start for start, end in self.regions)
+
+    def to_original(self, seconds: float) -> float:
+        """
+        Map a time in the trimmed audio to the original timeline.
+        Times inside an inserted gap map to the end of the region before it.
+        """
+        if not self.regions:
+            return seconds
+        i = max(0, bisect.bisect_right(self.trimmed_starts, seconds) - 1)
+        start, end = self.regions[i]
+        return min(start + max(0.0, seconds - self.trimmed_starts[i]), end)
+
+    def remap(self, transcription: dict) -> dict:
+        """
+        Move a transcription's segment timestamps back onto the original timeline.
+        """
+        for segment in transcription['segments']:
+            segment['start'] = round(self.to_original(segment['start']), 3)
+            segment['end'] = round(self.to_original(segment['end']), 3)
+        return transcription
+
+    def progress(self, progress_callback: Optional[Callable]) -> Optional[Callable]:
+        """
+        Wrap a callback receiving trimmed seconds decoded so it receives original seconds.
+        """
+        if progress_callback is None:
+            return None
+        return lambda seconds: progress_callback(self.to_original(seconds))
+
+
+def trim_non_speech(audio_path: str, output_path: str) -> Optional[SpeechMap]:
+    """
+    Write the speech regions of a recording to a new 16 kHz mono WAV.
+    The audio is streamed twice, once to find the regions and once to copy them,
+    so neither pass holds the whole recording in memory.
+
+    Args:
+        audio_path: Audio to analyse
+        output_path: Where the trimmed WAV is written
+
+    Returns:
+        SpeechMap for the trimmed audio, or None when the audio should be transcribed
+        as is (no speech found, or too little non-speech to be worth cutting)
+    """
+    regions, duration = detect_speech(audio_path)
+    speech_map = SpeechMap(regions, duration)
+    if not regions or duration - speech_map.speech_seconds < duration * MIN_TRIM_SHARE:
+        return None
+
+    gap = np.zeros(int(GAP_SECONDS * SAMPLE_RATE), dtype=np.int16).tobytes()
+    bounds = [(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)) for start, end in regions]
+    with wave.open(output_path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        position = 0
+        region = 0
+        for block in iter_pcm(audio_path):
+            block_end = position + len(block)
+            while region < len(bounds) and bounds[region][0] < block_end:
+                start, end = bounds[region]
+                wav.writeframes(block[max(start - position, 0):min(end, block_end) - position].tobytes())
+                if end > block_end:
+                    # The region continues in the next block
+                    break
+                region += 1
+                if region < len(bounds):
+                    wav.writeframes(gap)
+            position = block_end
+    print(f"Speech activity: {speech_map.speech_seconds:.0f}s of {duration:.0f}s in {len(regions)} regions; "
+          f"transcribing {speech_map.speech_seconds / duration:.0%} of the audio")
+    return speech_map
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m app.utils.vad <audio>")
+        sys.exit(1)
+    found, total = detect_speech(sys.argv[1])
+    speech = sum(end - start for start, end in found)
+    print(json.dumps({
+        'duration': round(total, 2),
+        'speech_seconds': round(speech, 2),
+        'speech_share': round(speech / total, 3) if total else 0.0,
+        'regions': [[round(start, 2), round(end, 2)] for start, end in found],
+    }, indent=2))
@@ -0,0 +1,149 @@
+"""
+Thread configuration for Celery worker processes.
+By default every prefork child sizes torch's, OpenMP's and MKL's thread pools to the
+whole machine, so N children run N times as many compute threads as there are cores and
+throughput collapses as they thrash. Each child is instead given an equal share of the
+cores (cores // concurrency intra-op threads, one inter-op thread), and can optionally
+be pinned to its own core set so children never compete for a core.
+
+    python -m app.utils.worker_runtime plan 4
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+from celery.signals import celeryd_init, worker_process_init
+
+# Intra-op threads per worker process (default: the cores divided evenly between processes)
+WORKER_THREADS = int(os.environ.get('WORKER_THREADS', 0))
+# Inter-op threads per worker process; the pipeline runs one model call at a time
+WORKER_INTEROP_THREADS = int(os.environ.get('WORKER_INTEROP_THREADS', 1))
+# Pin each prefork child to its own block of cores
+WORKER_PIN_CORES = os.environ.get('WORKER_PIN_CORES', '0') == '1'
+
+# Read by the OpenMP, MKL and OpenBLAS runtimes when torch, CTranslate2 or NumPy first load
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+_concurrency: Optional[int] = None
+_threads: int = 0
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def thread_plan(concurrency: int, cores: Optional[int] = None, threads: Optional[int] = None,
+                interop_threads: Optional[int] = None) -> Dict[str, int]:
+    """
+    Threads for each of concurrency worker processes sharing a host.
+
+    Args:
+        concurrency: Number of worker processes
+        cores: Cores available (default: this process's CPU affinity)
+        threads: Intra-op threads per process (default: WORKER_THREADS, or an even share of the cores)
+        interop_threads: Inter-op threads per process (default: WORKER_INTEROP_THREADS)
+
+    Returns:
+        Dictionary with 'intra_op' and 'inter_op' thread counts
+    """
+    cores = cores or len(available_cores())
+    threads = threads or WORKER_THREADS or max(1, cores // max(1, concurrency))
+    return {'intra_op': threads, 'inter_op': interop_threads or WORKER_INTEROP_THREADS}
+
+
+def core_set(index: int, threads: int, cores: Optional[List[int]] = None) -> List[int]:
+    """
+    The block of cores for the index-th process, wrapping around when processes
+    outnumber the blocks.
+    """
+    cores = cores or available_cores()
+    start = (index * threads) % len(cores)
+    return [cores[(start + i) % len(cores)] for i in range(min(threads, len(cores)))]
+
+
+def configure_process(intra_op: int, inter_op: int = 1, cores: Optional[List[int]] = None):
+    """
+    Apply a thread configuration to the current process.
+    Must run before the process does any parallel work with torch.
+
+    Args:
+        intra_op: Threads used inside one operator (matrix multiplies, convolutions)
+        inter_op: Threads running independent operators concurrently
+        cores: Optional cores to pin the process to
+    """
+    global _threads
+    _threads = intra_op
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(intra_op)
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError as e:
+        # Only possible before the inter-op pool has started
+        print(f"Could not set torch inter-op threads: {str(e)}")
+
+
+def intra_op_threads() -> int:
+    """
+    Intra-op threads configured for this process, or 0 when left to the libraries.
+    """
+    return _threads
+
+
+def _process_index() -> int:
+    from billiard.process import current_process
+    index = getattr(current_process(), 'index', None)
+    return index if index is not None else os.getpid()
+
+
+def _configure_worker(index: int, pin: bool = WORKER_PIN_CORES):
+    plan = thread_plan(_concurrency or 1)
+    cores = core_set(index, plan['intra_op']) if pin else None
+    configure_process(plan['intra_op'], plan['inter_op'], cores)
+    pinned = f", cores {cores}" if cores else ""
+    print(f"Worker process {index}: {plan['intra_op']} intra-op / {plan['inter_op']} inter-op threads{pinned}")
+
+
+@celeryd_init.connect
+def _record_concurrency(sender=None, conf=None, options=None, **kwargs):
+    # Runs in the parent before the pool forks, so children inherit the concurrency
+    global _concurrency
+    options = options or {}
+    _concurrency = int(options.get('concurrency') or getattr(conf, 'worker_concurrency', None) or os.cpu_count() or 1)
+    pool = str(options.get('pool_cls') or getattr(conf, 'worker_pool', '') or '').lower()
+    if 'solo' in pool:
+        # One task at a time in this process: it gets every core
+        _concurrency = 1
+        _configure_worker(0, pin=False)
+    elif 'thread' in pool:
+        # Concurrent tasks share this process and its thread settings
+        _configure_worker(0, pin=False)
+
+
+@worker_process_init.connect
+def _configure_child(**kwargs):
+    _configure_worker(_process_index())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'plan':
+        print("Usage: python -m app.utils.worker_runtime plan <concurrency>")
+        sys.exit(1)
+    processes = int(sys.argv[2])
+    per_process = thread_plan(processes)
+    print(json.dumps({
+        'cores': len(available_cores()),
+        'concurrency': processes,
+        'threads': per_process,
+        'core_sets': [core_set(i, per_process['intra_op']) for i in range(processes)] if WORKER_PIN_CORES else None,
+    }, indent=2))
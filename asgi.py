@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# ASGI entry point: gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+app = create_asgi_app()
@@ -0,0 +1,184 @@
+"""
+Compare the speech recognition backends on fixture audio.
+
+Every backend transcribes the same files. The benchmark reports each backend's time and
+real-time factor, its word error rate against a reference transcript when the fixture
+has one, and its drift: the word error rate of its output measured against the baseline
+backend's output. Fixtures are audio files in --fixtures; a sidecar .txt file of the same
+name holds the reference transcript. benchmarks/fixtures/asr ships a short English clip
+synthesized with eSpeak NG from its reference text:
+
+    python -m benchmarks.bench_asr_backends --fixtures benchmarks/fixtures/asr
+    python -m benchmarks.bench_asr_backends --backends whisper faster-whisper --max-drift 0.05
+
+The command exits non-zero when a backend drifts from the baseline by more than --max-drift.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.utils.transcriber import BACKENDS
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm', '.mp4')
+
+
+def normalize_words(text):
+    """
+    Lower-cased words without punctuation, so WER only counts recognition differences.
+    """
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level edit distance between two transcripts divided by the reference length.
+
+    Args:
+        reference: Reference transcript
+        hypothesis: Transcript being scored
+
+    Returns:
+        The word error rate (0.0 for two empty transcripts)
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def find_fixtures(fixtures_dir, work_dir, duration):
+    """
+    Fixture audio paths with their reference transcripts.
+    Without fixtures (an empty --fixtures directory) a synthetic tone is used; it has no
+    words, so only timing and drift (hallucinated text on non-speech) are meaningful for it.
+
+    Returns:
+        List of (audio path, reference text or None)
+    """
+    fixtures = []
+    if fixtures_dir and os.path.isdir(fixtures_dir):
+        for name in sorted(os.listdir(fixtures_dir)):
+            if not name.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            path = os.path.join(fixtures_dir, name)
+            reference_path = os.path.splitext(path)[0] + '.txt'
+            reference = None
+            if os.path.exists(reference_path):
+                with open(reference_path, encoding='utf-8') as f:
+                    reference = f.read()
+            fixtures.append((path, reference))
+    if not fixtures:
+        from benchmarks.synthetic_media import write_audio
+        print(f"No fixture audio in {fixtures_dir}; using a {duration}s synthetic clip")
+        fixtures.append((write_audio(os.path.join(work_dir, 'synthetic.wav'), duration), None))
+    return fixtures
+
+
+def run_backend(backend, model_size, fixtures):
+    """
+    Transcribe every fixture with one backend.
+
+    Returns:
+        Dictionary with the model load time and per-fixture text, timing and WER
+    """
+    from app.utils.transcriber import get_transcriber
+    from app.utils.transcription import get_audio_duration
+
+    setup_start = time.perf_counter()
+    transcriber = get_transcriber(model_size, backend=backend)
+    result = {"setup_seconds": round(time.perf_counter() - setup_start, 4), "fixtures": {}}
+    for path, reference in fixtures:
+        start = time.perf_counter()
+        transcription = transcriber.transcribe(path)
+        elapsed = time.perf_counter() - start
+        duration = get_audio_duration(path)
+        entry = {
+            "seconds": round(elapsed, 4),
+            "rtf": round(elapsed / duration, 4) if duration else None,
+            "language": transcription['language'],
+            "text": transcription['text'],
+        }
+        if reference is not None:
+            entry["wer"] = round(word_error_rate(reference, transcription['text']), 4)
+        result["fixtures"][os.path.basename(path)] = entry
+        print(f"  {backend} {os.path.basename(path)}: {elapsed:.2f}s, RTF {entry['rtf']}, WER {entry.get('wer', '-')}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare speech recognition backends for speed and WER drift")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends to run; the first is the drift baseline")
+    parser.add_argument('--model-size', default='base', help="Whisper model size")
+    parser.add_argument('--fixtures', default=os.path.join(PROJECT_ROOT, 'benchmarks', 'fixtures', 'asr'),
+                        help="Directory of fixture audio with optional .txt reference transcripts")
+    parser.add_argument('--duration', type=int, default=60, help="Synthetic clip length when there are no fixtures")
+    parser.add_argument('--max-drift', type=float, default=0.05,
+                        help="Allowed WER of a backend's output against the baseline's")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {"model_size": args.model_size, "backends": args.backends},
+        },
+        "backends": {},
+        "drift": {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixtures = find_fixtures(args.fixtures, work_dir, args.duration)
+        for backend in args.backends:
+            print(f"Running backend: {backend}")
+            results["backends"][backend] = run_backend(backend, args.model_size, fixtures)
+
+    baseline_name = args.backends[0]
+    baseline = results["backends"][baseline_name]["fixtures"]
+    drifted = []
+    print(f"\n{'backend':<18}{'fixture':<30}{'speedup':>10}{'drift':>10}")
+    for backend in args.backends[1:]:
+        results["drift"][backend] = {}
+        for name, entry in results["backends"][backend]["fixtures"].items():
+            drift = word_error_rate(baseline[name]["text"], entry["text"])
+            speedup = baseline[name]["seconds"] / entry["seconds"] if entry["seconds"] else 0.0
+            results["drift"][backend][name] = {"wer_vs_baseline": round(drift, 4), "speedup": round(speedup, 2)}
+            flag = " !" if drift > args.max_drift else ""
+            print(f"{backend:<18}{name[:29]:<30}{speedup:>9.2f}x{drift:>10.1%}{flag}")
+            if drift > args.max_drift:
+                drifted.append(f"{backend}/{name}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if drifted:
+        print(f"\nDrift from {baseline_name} beyond {args.max_drift:.0%}: {', '.join(drifted)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
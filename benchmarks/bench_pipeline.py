@@ -0,0 +1,322 @@
+"""
+Benchmark the video pipeline end to end and stage by stage.
+
+Each stage is timed independently on a synthetic video so results are reproducible
+offline. Results are written as a JSON baseline that can be compared across commits:
+
+    python -m benchmarks.bench_pipeline --output benchmarks/results/baseline.json
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.synthetic_media import make_test_video
+
+STAGES = [
+    "extract_audio",
+    "transcribe_audio",
+    "translate_text",
+    "extract_frames",
+    "describe_frames",
+    "generate_prompts_for_scenes",
+    "celery_transcribe",
+]
+
+# Fixed English text for the translation stage; synthetic audio has no real words
+SAMPLE_TRANSCRIPT = (
+    "What if I told you that you have been editing your videos the hard way? "
+    "Welcome back to the channel, where we break down video production in bite-sized steps. "
+    "Today we are looking at three techniques that professional editors use every day. "
+    "First, plan your shots before you start recording so the edit has a clear structure. "
+    "Second, cut on action to hide transitions and keep the viewer engaged. "
+    "Third, use B-roll to cover jump cuts and illustrate what you are talking about. "
+    "Lighting matters more than the camera, so spend your budget on a good key light. "
+    "Audio matters even more, because viewers forgive bad video but not bad sound. "
+    "If this helped you, hit that like button and subscribe for more editing tips. "
+    "Thanks for watching, and I will see you in the next one."
+)
+
+
+class StageSkipped(Exception):
+    """Raised by a stage setup when the stage cannot run in this environment."""
+
+
+class BenchmarkContext:
+    """
+    Holds the inputs shared between stages so each stage can be timed on its own.
+    Inputs a stage depends on are prepared lazily and are never part of its timing.
+    """
+
+    def __init__(self, video_path, work_dir, model_size, interval_seconds, max_frames):
+        self.video_path = video_path
+        self.work_dir = work_dir
+        self.model_size = model_size
+        self.interval_seconds = interval_seconds
+        self.max_frames = max_frames
+        self._audio_path = None
+        self._scene_extractor = None
+        self._script_generator = None
+        self._frames = None
+        self._scenes = None
+
+    @property
+    def audio_path(self):
+        if self._audio_path is None:
+            from app.utils.transcription import extract_audio
+            self._audio_path = extract_audio(self.video_path, os.path.join(self.work_dir, 'audio.wav'))
+        return self._audio_path
+
+    @property
+    def scene_extractor(self):
+        if self._scene_extractor is None:
+            from app.utils.scene_extraction import SceneExtractor
+            self._scene_extractor = SceneExtractor()
+        return self._scene_extractor
+
+    @property
+    def script_generator(self):
+        if self._script_generator is None:
+            from app.utils.script_generation import ScriptGenerator
+            self._script_generator = ScriptGenerator()
+        return self._script_generator
+
+    @property
+    def frames(self):
+        if self._frames is None:
+            self._frames = self.extract_frames()
+        return self._frames
+
+    @property
+    def scenes(self):
+        if self._scenes is None:
+            self._scenes = self.scene_extractor.describe_frames(copy.deepcopy(self.frames))
+        return self._scenes
+
+    def extract_frames(self):
+        return self.scene_extractor.extract_frames(
+            self.video_path,
+            interval_seconds=self.interval_seconds,
+            max_frames=self.max_frames,
+            task_id='benchmark'
+        )
+
+
+def _stage_extract_audio(ctx):
+    from app.utils.transcription import extract_audio
+    return lambda: extract_audio(ctx.video_path, os.path.join(ctx.work_dir, 'audio_bench.wav'))
+
+
+def _stage_transcribe_audio(ctx):
+    from app.utils.transcription import transcribe_audio
+    audio_path = ctx.audio_path
+    return lambda: transcribe_audio(audio_path, model_size=ctx.model_size)
+
+
+def _stage_translate_text(ctx):
+    generator = ctx.script_generator
+    return lambda: generator.translate_text(SAMPLE_TRANSCRIPT)
+
+
+def _stage_extract_frames(ctx):
+    ctx.scene_extractor  # Load the captioning model outside the timed runs
+    return ctx.extract_frames
+
+
+def _stage_describe_frames(ctx):
+    extractor = ctx.scene_extractor
+    frames = ctx.frames
+    return lambda: extractor.describe_frames(copy.deepcopy(frames))
+
+
+def _stage_generate_prompts_for_scenes(ctx):
+    from app.utils.prompt_generation import PromptGenerator
+    generator = PromptGenerator()
+    scenes = ctx.scenes
+    return lambda: generator.generate_prompts_for_scenes(copy.deepcopy(scenes))
+
+
+def _stage_celery_transcribe(ctx):
+    import redis
+    redis_url = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+    try:
+        redis.Redis.from_url(redis_url).ping()
+    except Exception as e:
+        raise StageSkipped(f"Redis not reachable at {redis_url}: {str(e)}")
+
+    from app import create_app
+    flask_app = create_app()
+    flask_app.celery.conf.update(task_always_eager=True, task_eager_propagates=True)
+    from app.utils.transcription import celery_transcribe
+    return lambda: celery_transcribe.apply_async(
+        args=[ctx.video_path, False], kwargs={'model_size': ctx.model_size}
+    ).get()
+
+
+STAGE_SETUP = {
+    "extract_audio": _stage_extract_audio,
+    "transcribe_audio": _stage_transcribe_audio,
+    "translate_text": _stage_translate_text,
+    "extract_frames": _stage_extract_frames,
+    "describe_frames": _stage_describe_frames,
+    "generate_prompts_for_scenes": _stage_generate_prompts_for_scenes,
+    "celery_transcribe": _stage_celery_transcribe,
+}
+
+
+def run_stage(name, ctx, repeat, warmup):
+    """
+    Time a single stage.
+
+    Args:
+        name: Stage name from STAGES
+        ctx: BenchmarkContext with the shared inputs
+        repeat: Number of timed runs
+        warmup: Number of untimed runs before timing
+
+    Returns:
+        Dictionary with setup time, per-run timings and summary statistics
+    """
+    setup_start = time.perf_counter()
+    try:
+        fn = STAGE_SETUP[name](ctx)
+    except StageSkipped as e:
+        return {"skipped": str(e)}
+    setup_seconds = time.perf_counter() - setup_start
+
+    for _ in range(warmup):
+        fn()
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+
+    return {
+        "setup_seconds": round(setup_seconds, 4),
+        "runs": [round(r, 4) for r in runs],
+        "median": round(statistics.median(runs), 4),
+        "min": round(min(runs), 4),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        ).stdout.decode('utf-8').strip()
+    except Exception:
+        return None
+
+
+def compare_results(current, baseline, tolerance):
+    """
+    Print a per-stage comparison against a baseline.
+
+    Args:
+        current: Results dictionary from this run
+        baseline: Results dictionary loaded from a previous run
+        tolerance: Allowed slowdown as a fraction (0.1 = 10%)
+
+    Returns:
+        List of stage names that regressed beyond the tolerance
+    """
+    regressions = []
+    print(f"\n{'stage':<30}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current["stages"].items():
+        base = baseline.get("stages", {}).get(name, {})
+        if "median" not in result or "median" not in base:
+            print(f"{name:<30}{'-':>12}{'-':>12}{'n/a':>10}")
+            continue
+        change = (result["median"] - base["median"]) / base["median"] if base["median"] else 0.0
+        flag = " !" if change > tolerance else ""
+        print(f"{name:<30}{base['median']:>12.4f}{result['median']:>12.4f}{change:>+9.1%}{flag}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the video pipeline stages.")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="Stages to run (default: all)")
+    parser.add_argument('--duration', type=int, default=60, help="Synthetic video length in seconds")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--model-size', default='base', help="Whisper model size")
+    parser.add_argument('--interval-seconds', type=int, default=10)
+    parser.add_argument('--max-frames', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs per stage")
+    parser.add_argument('--media-dir', default=os.path.join(PROJECT_ROOT, 'benchmarks', 'media'),
+                        help="Where synthetic videos are cached")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args(argv)
+
+    video_path = make_test_video(args.media_dir, args.duration, width=args.width, height=args.height)
+    print(f"Using synthetic video: {video_path}")
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "duration": args.duration,
+                "resolution": f"{args.width}x{args.height}",
+                "model_size": args.model_size,
+                "interval_seconds": args.interval_seconds,
+                "max_frames": args.max_frames,
+                "repeat": args.repeat,
+                "warmup": args.warmup,
+            },
+        },
+        "stages": {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = BenchmarkContext(video_path, work_dir, args.model_size, args.interval_seconds, args.max_frames)
+        for name in STAGES:
+            if name not in args.stages:
+                continue
+            print(f"Running stage: {name}")
+            results["stages"][name] = run_stage(name, ctx, args.repeat, args.warmup)
+            print(f"  {json.dumps(results['stages'][name])}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
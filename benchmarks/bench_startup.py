@@ -0,0 +1,94 @@
+"""
+Benchmark cold start of the web and worker processes.
+
+Each run imports the entry point in a fresh interpreter, so timings include every
+module import, and checks that the web tier never loads the heavy ML libraries:
+
+    python -m benchmarks.bench_startup --output benchmarks/results/startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules that only inference code may import
+HEAVY_MODULES = ['torch', 'whisper', 'faster_whisper', 'ctranslate2', 'transformers', 'cv2', 'nltk']
+
+TARGETS = {
+    # The gunicorn entry point: builds the Flask app and registers the routes
+    "web": "import main",
+    # The async entry point: the Flask app plus the Quart app for the hot routes
+    "web-async": "import asgi",
+    # The Celery entry point, up to the point where the worker would start consuming
+    "worker": "import celery_worker",
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy}}))
+"""
+
+
+def measure(statement, repeat):
+    """
+    Import a target in fresh interpreters and time it.
+
+    Args:
+        statement: Python statement that imports the target
+        repeat: Number of fresh interpreters to start
+
+    Returns:
+        Dictionary with per-run timings, their median and any heavy modules loaded
+    """
+    runs = []
+    heavy = set()
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=PROJECT_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+        # The entry points print configuration, so the probe result is the last line
+        result = json.loads(completed.stdout.decode('utf-8').strip().splitlines()[-1])
+        runs.append(result["seconds"])
+        heavy.update(result["heavy_modules"])
+    return {
+        "runs": [round(r, 4) for r in runs],
+        "median": round(statistics.median(runs), 4),
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark web and worker cold start.")
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = {"stages": {}}
+    for name in args.targets:
+        results["stages"][name] = measure(TARGETS[name], args.repeat)
+        print(f"{name}: {json.dumps(results['stages'][name])}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if results["stages"].get("web", {}).get("heavy_modules"):
+        print(f"Web startup imported heavy modules: {', '.join(results['stages']['web']['heavy_modules'])}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Sweep worker concurrency against threads per worker.
+
+For every combination, that many processes are started as a prefork worker host would
+run them, each configured with app.utils.worker_runtime, and all run the same model
+workload at once. Throughput is the work finished by all processes per second of wall
+time, so oversubscription shows up as throughput falling while concurrency grows:
+
+    python -m benchmarks.bench_worker_threads --workloads whisper marian blip
+    python -m benchmarks.bench_worker_threads --concurrency 1 2 4 --threads 0 1 2 4 --pin
+
+A threads value of 0 means the even share of the cores that workers use by default.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+WORKLOADS = ['whisper', 'marian', 'blip']
+
+
+def _load_workload(name, model_size, audio_path):
+    """
+    Load a workload's model and return a callable running one unit of work.
+    """
+    if name == 'whisper':
+        from app.utils.transcriber import get_transcriber
+        transcriber = get_transcriber(model_size)
+        return lambda: transcriber.transcribe(audio_path)
+    if name == 'marian':
+        from app.utils.script_generation import ScriptGenerator
+        from benchmarks.bench_pipeline import SAMPLE_TRANSCRIPT
+        generator = ScriptGenerator()
+        return lambda: generator.translate_text(SAMPLE_TRANSCRIPT)
+    if name == 'blip':
+        import numpy as np
+        from app.utils.scene_extraction import SceneExtractor
+        extractor = SceneExtractor()
+        images = [np.random.default_rng(i).integers(0, 255, (384, 384, 3), dtype=np.uint8) for i in range(4)]
+        return lambda: extractor.caption_images(images)
+    raise ValueError(f"Unknown workload: {name}")
+
+
+def _worker(index, workload, threads, pin, model_size, audio_path, items, barrier, results):
+    # Runs in a fresh interpreter, so the thread settings apply before torch loads
+    from app.utils.worker_runtime import configure_process, core_set
+    configure_process(threads, 1, core_set(index, threads) if pin else None)
+    run = _load_workload(workload, model_size, audio_path)
+    run()  # Warm up outside the timed section
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(items):
+        run()
+    results.put(time.perf_counter() - start)
+
+
+def run_config(workload, concurrency, threads, pin, model_size, audio_path, items):
+    """
+    Run one workload with concurrency processes of threads intra-op threads each.
+
+    Returns:
+        Dictionary with the wall time and throughput in items per second
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(concurrency)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(i, workload, threads, pin, model_size, audio_path, items,
+                                              barrier, results))
+        for i in range(concurrency)
+    ]
+    for process in processes:
+        process.start()
+    elapsed = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    wall = max(elapsed)
+    return {
+        "wall_seconds": round(wall, 4),
+        "throughput": round(concurrency * items / wall, 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep worker concurrency x threads per worker")
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--threads', nargs='+', type=int, default=[0, 1, 2, 4],
+                        help="Intra-op threads per process; 0 is the default even share")
+    parser.add_argument('--pin', action='store_true', help="Pin each process to its own cores")
+    parser.add_argument('--model-size', default='base', help="Whisper model size")
+    parser.add_argument('--audio-seconds', type=int, default=30, help="Synthetic clip length for whisper")
+    parser.add_argument('--items', type=int, default=3, help="Timed units of work per process")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cores": os.cpu_count(),
+            "params": {"model_size": args.model_size, "pin": args.pin, "items": args.items,
+                       "audio_seconds": args.audio_seconds},
+        },
+        "workloads": {},
+    }
+
+    from app.utils.worker_runtime import thread_plan
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_path = None
+        if 'whisper' in args.workloads:
+            from benchmarks.synthetic_media import write_audio
+            audio_path = write_audio(os.path.join(work_dir, 'audio.wav'), args.audio_seconds)
+        for workload in args.workloads:
+            print(f"\n{workload}")
+            print(f"{'concurrency':>12}{'threads':>10}{'wall':>10}{'items/s':>10}")
+            runs = []
+            for concurrency in args.concurrency:
+                # 0 may resolve to a thread count that is also listed explicitly
+                thread_counts = sorted({thread_plan(concurrency, threads=threads or None)['intra_op']
+                                        for threads in args.threads})
+                for threads in thread_counts:
+                    result = dict(run_config(workload, concurrency, threads, args.pin, args.model_size,
+                                             audio_path, args.items), concurrency=concurrency, threads=threads)
+                    runs.append(result)
+                    print(f"{concurrency:>12}{result['threads']:>10}{result['wall_seconds']:>10.2f}"
+                          f"{result['throughput']:>10.3f}")
+            best = max(runs, key=lambda run: run["throughput"])
+            print(f"Best: concurrency {best['concurrency']} x {best['threads']} threads "
+                  f"({best['throughput']:.3f} items/s)")
+            results["workloads"][workload] = {"runs": runs, "best": best}
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
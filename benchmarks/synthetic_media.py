@@ -0,0 +1,135 @@
+"""
+Synthetic media generation for the benchmark suite.
+Builds deterministic test videos (color-changing frames plus tone and speech-like audio)
+so every stage of the pipeline can be timed offline without real footage.
+"""
+
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+# Palette cycled through by the synthetic video (BGR)
+COLORS = [
+    (40, 40, 200),
+    (40, 180, 40),
+    (200, 60, 40),
+    (30, 200, 220),
+    (180, 40, 180),
+    (220, 220, 220),
+]
+
+# Speech-like signal: a pitch-modulated harmonic stack gated at a syllable rate
+SPEECH_EXPR = (
+    "0.35*(sin(2*PI*(140+30*sin(2*PI*2.5*t))*t)"
+    "+0.5*sin(4*PI*(140+30*sin(2*PI*2.5*t))*t)"
+    "+0.25*sin(6*PI*(140+30*sin(2*PI*2.5*t))*t))"
+    "*(0.5+0.5*sin(2*PI*4*t))*gt(sin(2*PI*0.4*t),-0.3)"
+)
+
+
+def _require_ffmpeg():
+    ffmpeg_path = shutil.which("ffmpeg")
+    if not ffmpeg_path:
+        raise RuntimeError("ffmpeg is not installed or not found in PATH.")
+    return ffmpeg_path
+
+
+def write_color_frames(path, duration, fps=25, width=1280, height=720, scene_seconds=5):
+    """
+    Write a silent video whose background color changes every `scene_seconds`,
+    with a moving square so consecutive frames are not identical.
+
+    Args:
+        path: Output video path
+        duration: Length of the video in seconds
+        fps: Frames per second
+        width: Frame width in pixels
+        height: Frame height in pixels
+        scene_seconds: Seconds between background color changes
+
+    Returns:
+        The output path
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for: {path}")
+
+    total_frames = int(duration * fps)
+    square = max(16, height // 6)
+    for i in range(total_frames):
+        t = i / fps
+        color = COLORS[int(t // scene_seconds) % len(COLORS)]
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = color
+        x = int((width - square) * (0.5 + 0.5 * np.sin(t)))
+        y = int((height - square) * (0.5 + 0.5 * np.cos(t * 0.7)))
+        frame[y:y + square, x:x + square] = 255 - np.array(color, dtype=np.uint8)
+        writer.write(frame)
+
+    writer.release()
+    return path
+
+
+def write_audio(path, duration, sample_rate=16000):
+    """
+    Write a mono WAV alternating between a 440 Hz tone and speech-like audio every 10 seconds.
+
+    Args:
+        path: Output WAV path
+        duration: Length of the audio in seconds
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        The output path
+    """
+    ffmpeg_path = _require_ffmpeg()
+    expr = f"if(lt(mod(t,20),10),0.3*sin(2*PI*440*t),{SPEECH_EXPR})"
+    command = [
+        ffmpeg_path, "-y",
+        "-f", "lavfi", "-i", f"aevalsrc={expr}:s={sample_rate}:d={duration}",
+        "-ac", "1", "-acodec", "pcm_s16le", path
+    ]
+    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return path
+
+
+def make_test_video(output_dir, duration=60, fps=25, width=1280, height=720):
+    """
+    Build a synthetic MP4 with color-changing frames and tone/speech-like audio.
+    Files are cached by their parameters so repeated runs reuse the same input.
+
+    Args:
+        output_dir: Directory for the generated files
+        duration: Length of the video in seconds
+        fps: Frames per second
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        Path to the generated video
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = f"synthetic_{duration}s_{width}x{height}_{fps}fps"
+    video_path = os.path.join(output_dir, f"{name}.mp4")
+    if os.path.exists(video_path):
+        return video_path
+
+    silent_path = os.path.join(output_dir, f"{name}_silent.mp4")
+    audio_path = os.path.join(output_dir, f"{name}.wav")
+    write_color_frames(silent_path, duration, fps, width, height)
+    write_audio(audio_path, duration)
+
+    command = [
+        _require_ffmpeg(), "-y",
+        "-i", silent_path, "-i", audio_path,
+        "-c:v", "copy", "-c:a", "aac", "-shortest",
+        "-movflags", "+faststart",
+        video_path
+    ]
+    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    os.remove(silent_path)
+    os.remove(audio_path)
+    return video_path
@@ -1,8 +1,13 @@
 import nltk
 import os
+from create_collocations_tab import create_collocations_tab
 
 def download_nltk_data():
-    """Download required NLTK data packages."""
+    """Download required NLTK data packages.
+
+    Run once at build time (see Dockerfile, render.yaml and railway.json); the
+    application only reads the data from <project>/nltk_data and never downloads it.
+    """
     print("Downloading NLTK data packages...")
     
     # Create nltk_data directory in the project root
@@ -13,27 +18,31 @@ def download_nltk_data():
     nltk.data.path.append(nltk_data_dir)
     
     # Download required packages
-    packages = ['punkt']
+    packages = ['punkt', 'punkt_tab']
     for package in packages:
         print(f"Downloading {package}...")
         nltk.download(package, download_dir=nltk_data_dir, quiet=False)
         
-    # Create punkt_tab directory structure and files
-    print("Creating punkt_tab resources...")
+    # Create punkt_tab directory structure and files if the punkt_tab package was unavailable
     punkt_dir = os.path.join(nltk_data_dir, 'tokenizers', 'punkt')
     punkt_tab_dir = os.path.join(nltk_data_dir, 'tokenizers', 'punkt_tab', 'english')
-    os.makedirs(punkt_tab_dir, exist_ok=True)
-    
-    # Copy punkt files to punkt_tab location
-    import shutil
-    for file in os.listdir(punkt_dir):
-        if file.endswith('.pickle'):
-            src = os.path.join(punkt_dir, file)
-            dst = os.path.join(punkt_tab_dir, file)
-            shutil.copy2(src, dst)
-            print(f"Copied {src} to {dst}")
-    
-    print("Created punkt_tab resources successfully.")
+    if not os.path.isdir(punkt_tab_dir):
+        print("Creating punkt_tab resources...")
+        os.makedirs(punkt_tab_dir, exist_ok=True)
+        
+        # Copy punkt files to punkt_tab location
+        import shutil
+        for file in os.listdir(punkt_dir):
+            if file.endswith('.pickle'):
+                src = os.path.join(punkt_dir, file)
+                dst = os.path.join(punkt_tab_dir, file)
+                shutil.copy2(src, dst)
+                print(f"Copied {src} to {dst}")
+        
+        print("Created punkt_tab resources successfully.")
+
+    if not os.path.exists(os.path.join(punkt_tab_dir, 'collocations.tab')):
+        create_collocations_tab()
     
     print("NLTK data packages downloaded successfully.")
     print(f"Data stored in: {nltk_data_dir}")
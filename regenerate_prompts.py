@@ -0,0 +1,210 @@
+"""
+Regenerate AI prompts for stored scenes without reprocessing the videos.
+
+Streams scene lists from the Redis task hashes (or from an exported JSONL file) in chunks,
+runs PromptGenerator over each chunk in a process pool, and writes the new prompts back.
+Finished task IDs are appended to a state file, so an interrupted run picks up where it
+stopped when started again with the same state file:
+
+    python regenerate_prompts.py --redis --workers 4
+    python regenerate_prompts.py --jsonl scenes.jsonl --output scenes.regenerated.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+TASK_KEY_PATTERN = 'celery-task-meta-*'
+
+_generator = None
+
+
+def _init_worker(seed: Optional[int]):
+    global _generator
+    from app.utils.prompt_generation import PromptGenerator
+    _generator = PromptGenerator(seed=seed)
+
+
+def regenerate_chunk(chunk: List[Tuple[str, list]], seed: Optional[int] = None) -> Tuple[List[Tuple[str, list]], int]:
+    """
+    Regenerate the prompts of a chunk of tasks.
+
+    Args:
+        chunk: List of (task ID, scene list) pairs
+        seed: When set, each task's prompts are seeded from the seed and its task ID,
+              so output does not depend on how tasks were chunked
+
+    Returns:
+        Tuple of (list of (task ID, updated scene list) pairs, number of scenes)
+    """
+    results = []
+    scene_count = 0
+    for task_id, scenes in chunk:
+        if seed is not None:
+            _generator.rng.seed(f"{seed}:{task_id}")
+        _generator.generate_prompts_for_scenes(scenes)
+        scene_count += len(scenes)
+        results.append((task_id, scenes))
+    return results, scene_count
+
+
+def _chunked(records: Iterator[Tuple[str, list]], chunk_size: int) -> Iterator[List[Tuple[str, list]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def redis_records(r, done: set, scan_count: int = 500) -> Iterator[Tuple[str, list]]:
+    """
+    Stream (task ID, scene list) pairs from the Redis task hashes that have scenes.
+    """
+    from app.utils.result_store import decode_field
+    batch = []
+
+    def fetch(keys):
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.hget(key, 'scenes')
+        for key, scenes in zip(keys, pipe.execute()):
+            if scenes:
+                yield key.decode('utf-8'), decode_field('scenes', scenes)
+
+    for key in r.scan_iter(match=TASK_KEY_PATTERN, count=scan_count, _type='hash'):
+        if key.decode('utf-8') in done:
+            continue
+        batch.append(key)
+        if len(batch) >= scan_count:
+            yield from fetch(batch)
+            batch = []
+    if batch:
+        yield from fetch(batch)
+
+
+def redis_writer(r):
+    from app.utils.result_store import encode_field
+
+    def write(results: List[Tuple[str, list]]):
+        # One round trip per chunk
+        pipe = r.pipeline(transaction=False)
+        for key, scenes in results:
+            pipe.hset(key, 'scenes', encode_field('scenes', scenes))
+        pipe.execute()
+    return write
+
+
+def jsonl_records(path: str, done: set) -> Iterator[Tuple[str, list]]:
+    """
+    Stream (task ID, scene list) pairs from a JSONL export with task_id and scenes keys.
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['task_id'] in done:
+                continue
+            yield record['task_id'], record['scenes']
+
+
+def jsonl_writer(f):
+    def write(results: List[Tuple[str, list]]):
+        for task_id, scenes in results:
+            f.write(json.dumps({"task_id": task_id, "scenes": scenes}) + '\n')
+        f.flush()
+    return write
+
+
+def load_state(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def run(records, write, state_file, workers: int, chunk_size: int, seed: Optional[int] = None) -> dict:
+    """
+    Regenerate prompts for every record and write them back chunk by chunk.
+
+    Returns:
+        Dictionary with task and scene counts, elapsed seconds and throughput
+    """
+    start = time.perf_counter()
+    tasks = scenes = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(seed,)) as pool:
+        chunks = _chunked(records, chunk_size)
+        # Keep a bounded number of chunks in flight so the input is streamed, not loaded
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(regenerate_chunk, chunk, seed))
+            if len(pending) < workers * 2:
+                continue
+            tasks, scenes = _drain(pending.pop(0), write, state_file, tasks, scenes, start)
+        while pending:
+            tasks, scenes = _drain(pending.pop(0), write, state_file, tasks, scenes, start)
+    elapsed = time.perf_counter() - start
+    return {
+        "tasks": tasks,
+        "scenes": scenes,
+        "seconds": round(elapsed, 3),
+        "scenes_per_second": round(scenes / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _drain(future, write, state_file, tasks, scenes, start):
+    results, scene_count = future.result()
+    write(results)
+    # Record progress only after the results are written back
+    state_file.write(''.join(f"{task_id}\n" for task_id, _ in results))
+    state_file.flush()
+    tasks += len(results)
+    scenes += scene_count
+    elapsed = time.perf_counter() - start
+    print(f"{tasks} tasks, {scenes} scenes, {scenes / elapsed:.1f} scenes/s")
+    return tasks, scenes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate AI prompts for stored scenes.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--redis', action='store_true', help="Read and update the Redis task hashes")
+    source.add_argument('--jsonl', help="Read scenes from a JSONL export with task_id and scenes keys")
+    parser.add_argument('--output', help="JSONL output path (required with --jsonl)")
+    parser.add_argument('--redis-url', default=os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'))
+    parser.add_argument('--state', help="File of finished task IDs used to resume (default: derived from the source)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=200, help="Tasks per chunk")
+    parser.add_argument('--seed', type=int, help="Seed for reproducible prompts")
+    args = parser.parse_args(argv)
+
+    if args.jsonl and not args.output:
+        parser.error("--output is required with --jsonl")
+    state_path = args.state or (f"{args.output}.done" if args.jsonl else 'regenerate_prompts.redis.done')
+    done = load_state(state_path)
+    if done:
+        print(f"Resuming: skipping {len(done)} tasks already regenerated")
+
+    with open(state_path, 'a') as state_file:
+        if args.redis:
+            import redis
+            r = redis.Redis.from_url(args.redis_url)
+            summary = run(redis_records(r, done), redis_writer(r), state_file,
+                          args.workers, args.chunk_size, args.seed)
+        else:
+            with open(args.output, 'a') as out:
+                summary = run(jsonl_records(args.jsonl, done), jsonl_writer(out), state_file,
+                              args.workers, args.chunk_size, args.seed)
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""
+Shared fixtures. Tests run against an in-memory Redis (fakeredis) and temporary
+directories, so no Redis server, models or media tools are needed.
+
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+
+import fakeredis
+import pytest
+import redis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Route every client created with redis.Redis.from_url to one fakeredis server.
+
+    Returns:
+        A client connected to that server
+    """
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, 'from_url',
+                        classmethod(lambda cls, *args, **kwargs: fakeredis.FakeRedis(server=server)))
+    return fakeredis.FakeRedis(server=server)
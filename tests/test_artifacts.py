@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from app.utils import artifacts
+
+TRANSCRIPTION = {
+    'text': 'Hello there. General Kenobi.',
+    'language': 'en',
+    'segments': [
+        {'start': 0.0, 'end': 1.5, 'text': 'Hello there.'},
+        {'start': 1.5, 'end': 3.25, 'text': 'General Kenobi.'},
+    ],
+}
+SCRIPT = {
+    'sections': [
+        {'id': 'intro', 'title': 'Introducción', 'description': 'Saludo', 'content': 'Hola.'},
+        {'id': 'main', 'title': 'Desarrollo', 'description': 'Respuesta', 'content': 'General Kenobi.'},
+    ],
+}
+SCENES = [
+    {'index': 0, 'timestamp': 0.0, 'timestamp_formatted': '00:00', 'description': 'a desert',
+     'task_id': 'task', 'url': '/frames/task/0', 'image_prompt': 'desert, sunset', 'video_prompt': 'slow pan'},
+    {'index': 1, 'timestamp': 5.0, 'timestamp_formatted': '00:05'},
+]
+
+
+@pytest.fixture(params=['msgpack', 'json'])
+def codec(request, monkeypatch):
+    # Every kind must round-trip with msgpack and with the JSON fallback used without it
+    if request.param == 'json':
+        monkeypatch.setattr(artifacts, 'msgpack', None)
+    elif artifacts.msgpack is None:
+        pytest.skip('msgpack is not installed')
+    return request.param
+
+
+@pytest.mark.parametrize('kind, value', [
+    ('transcription', TRANSCRIPTION),
+    ('script', SCRIPT),
+    ('scripts', [SCRIPT, SCRIPT]),
+    ('scenes', SCENES),
+    ('plain', {'video': '/tmp/video.mp4', 'sizes': [1, 2]}),
+])
+def test_round_trip(codec, kind, value):
+    data = artifacts.encode(kind, value)
+    assert artifacts.is_artifact(data)
+    assert artifacts.decode(kind, data) == value
+
+
+def test_encoding_uses_the_available_codec(codec):
+    marker = artifacts.MSGPACK_MARKER if codec == 'msgpack' else artifacts.JSON_MARKER
+    assert artifacts.encode('scenes', SCENES).startswith(marker)
+
+
+def test_absent_optional_scene_fields_stay_absent():
+    decoded = artifacts.decode('scenes', artifacts.encode('scenes', SCENES))
+    assert set(decoded[1]) == {'index', 'timestamp', 'timestamp_formatted'}
+
+
+def test_scene_rows_do_not_repeat_field_names(codec):
+    data = artifacts.encode('scenes', SCENES * 20)
+    assert b'timestamp_formatted' not in data
+    assert len(data) < len(json.dumps(SCENES * 20))
+
+
+def test_legacy_json_is_decoded_as_is():
+    assert artifacts.decode('transcription', json.dumps(TRANSCRIPTION).encode('utf-8')) == TRANSCRIPTION
+    assert not artifacts.is_artifact(json.dumps(TRANSCRIPTION).encode('utf-8'))
+
+
+def test_unknown_schema_version_is_rejected():
+    data = artifacts.JSON_MARKER + json.dumps([artifacts.SCHEMA_VERSION + 1, []]).encode('utf-8')
+    with pytest.raises(ValueError):
+        artifacts.decode('scenes', data)
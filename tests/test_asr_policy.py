@@ -0,0 +1,109 @@
+import json
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.routes import InvalidOptionsError, transcription_options
+from app.utils import asr_policy
+from app.utils.asr_policy import BACKLOG_STEP, DECISIONS_KEY, INT8_BACKLOG, RTF_KEY, RTF_SMOOTHING, choose_plan
+from app.utils.scheduler import JOBS_KEY
+
+
+@pytest.fixture(autouse=True)
+def whisper_backend(monkeypatch):
+    monkeypatch.setattr(asr_policy, 'backend_name', lambda: 'whisper')
+
+
+def plan(**kwargs):
+    kwargs.setdefault('device', 'cpu')
+    return choose_plan(**kwargs)
+
+
+def enqueue(client, count):
+    for i in range(count):
+        client.hset(JOBS_KEY, f'waiting-{i}', json.dumps({'cost': 60.0, 'enqueued': 0.0}))
+
+
+def test_generous_slo_gets_the_most_accurate_configuration(fake_redis):
+    chosen = plan(duration=60.0, slo_seconds=3600)
+    assert (chosen.model_size, chosen.beam_size, chosen.condition_on_previous_text) == ('small', 5, True)
+    assert chosen.precision == 'fp32'
+    assert chosen.estimated_seconds <= chosen.budget_seconds
+
+
+def test_tight_slo_steps_down_the_ladder(fake_redis):
+    chosen = plan(duration=600.0, slo_seconds=200)
+    assert chosen.model_size != 'small'
+    assert chosen.estimated_seconds <= chosen.budget_seconds
+
+
+def test_nothing_fitting_falls_back_to_the_fastest(fake_redis):
+    chosen = plan(duration=3600.0, slo_seconds=1)
+    assert (chosen.model_size, chosen.beam_size, chosen.precision) == ('tiny', None, 'int8')
+    assert chosen.reason.startswith('fastest')
+
+
+def test_requested_model_is_kept(fake_redis):
+    chosen = plan(duration=60.0, model_size='medium', slo_seconds=1)
+    assert chosen.model_size == 'medium'
+    assert chosen.reason == 'requested'
+
+
+def test_unsupported_requested_model_falls_back_to_the_ladder(fake_redis):
+    chosen = plan(duration=60.0, model_size='large-v3', slo_seconds=3600)
+    assert chosen.model_size == 'small'
+    assert chosen.reason != 'requested'
+
+
+def test_submissions_may_only_request_allowed_models():
+    assert transcription_options(MultiDict({'model_size': 'small', 'slo_seconds': '90'})) == {
+        'model_size': 'small', 'slo_seconds': 90.0}
+    with pytest.raises(InvalidOptionsError):
+        transcription_options(MultiDict({'model_size': 'large-v3'}))
+
+
+def test_backlog_starts_the_search_further_down(fake_redis):
+    enqueue(fake_redis, BACKLOG_STEP)
+    chosen = plan(duration=60.0, slo_seconds=3600)
+    assert chosen.backlog_depth == BACKLOG_STEP
+    assert chosen.model_size == 'base'
+    assert 'from step 1' in chosen.reason
+
+
+def test_deep_backlog_uses_int8_on_cpu(fake_redis):
+    enqueue(fake_redis, INT8_BACKLOG)
+    assert plan(duration=60.0, slo_seconds=3600).precision == 'int8'
+
+
+def test_gpu_uses_fp16(fake_redis):
+    assert plan(duration=60.0, device='cuda').precision == 'fp16'
+
+
+def test_learned_real_time_factors_override_the_defaults(fake_redis):
+    assert plan(duration=600.0, slo_seconds=200).model_size != 'small'
+    fake_redis.hset(RTF_KEY, 'small:b5:c1:fp32:cpu', 0.01)
+    chosen = plan(duration=600.0, slo_seconds=200)
+    assert (chosen.model_size, chosen.beam_size, chosen.precision) == ('small', 5, 'fp32')
+    assert chosen.estimated_seconds == pytest.approx(6.0)
+
+
+def test_probed_duration_comes_from_the_job_record(fake_redis):
+    fake_redis.hset(JOBS_KEY, 'task', json.dumps({'cost': 1234.0, 'enqueued': 0.0}))
+    assert plan(task_id='task').duration == 1234.0
+
+
+def test_record_updates_the_moving_average_and_logs_the_decision(fake_redis):
+    chosen = plan(duration=100.0, slo_seconds=3600)
+    chosen.record(100.0, 20.0)
+    assert float(fake_redis.hget(RTF_KEY, chosen.key)) == pytest.approx(0.2)
+    chosen.record(100.0, 40.0)
+    assert float(fake_redis.hget(RTF_KEY, chosen.key)) == pytest.approx((1 - RTF_SMOOTHING) * 0.2 + RTF_SMOOTHING * 0.4)
+
+    decision = json.loads(fake_redis.lindex(DECISIONS_KEY, 0))
+    assert decision['rtf'] == pytest.approx(0.4)
+    assert decision['model_size'] == chosen.model_size
+
+
+def test_decoding_options_follow_the_plan(fake_redis):
+    options = plan(duration=60.0, device='cuda', model_size='base').options()
+    assert options == {'beam_size': None, 'condition_on_previous_text': True, 'fp16': True}
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+
+from app.utils import pipeline
+from app.utils.checkpoints import CheckpointStore, TaskCheckpoints, source_content_hash
+
+TRANSCRIPTION = {'text': 'Hola.', 'language': 'es', 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'Hola.'}]}
+SCRIPTS = ({'sections': [{'id': 's1', 'title': 'T', 'description': 'D', 'content': 'Hello.'}]},
+           {'sections': [{'id': 's1', 'title': 'T', 'description': 'D', 'content': 'Hola.'}]})
+SCENES = [{'index': 0, 'timestamp': 0.0, 'timestamp_formatted': '00:00', 'description': 'a street'}]
+
+
+class RecordingTracker(pipeline.NullTracker):
+    def __init__(self):
+        self.started, self.restored = [], []
+
+    def start_stage(self, stage, status_msg=None, total=None, learn=True):
+        self.started.append(stage)
+
+    def restore_stage(self, stage, status_msg=None):
+        self.restored.append(stage)
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """
+    Replace the pipeline's stages with fakes that count their calls; 'fail' lists the
+    stages that raise.
+    """
+    calls = {'transcribe': 0, 'scripts': 0, 'scenes': 0, 'fail': set()}
+
+    def run(stage, result):
+        calls[stage] += 1
+        if stage in calls['fail']:
+            raise RuntimeError(f'{stage} failed')
+        return result
+
+    monkeypatch.setattr(pipeline, 'get_audio_duration', lambda path: 60.0)
+    monkeypatch.setattr(pipeline, 'transcribe_audio_segments', lambda *args, **kwargs: run('transcribe', TRANSCRIPTION))
+    monkeypatch.setattr(pipeline, 'generate_scripts', lambda *args, **kwargs: run('scripts', SCRIPTS))
+    monkeypatch.setattr(pipeline, 'generate_scenes', lambda *args, **kwargs: run('scenes', SCENES))
+    return calls
+
+
+def run_pipeline(checkpoints, tracker=None):
+    return pipeline.run_pipeline('video.mp4', 'audio.wav', task_id='task', tracker=tracker, checkpoints=checkpoints)
+
+
+def test_saved_stages_load_in_a_new_attempt(tmp_path):
+    first = TaskCheckpoints(str(tmp_path / 'task'), 'hash')
+    first.save('transcribe', TRANSCRIPTION)
+    first.save('scenes', SCENES)
+
+    second = TaskCheckpoints(str(tmp_path / 'task'), 'hash')
+    assert second.load('transcribe') == TRANSCRIPTION
+    assert second.load('scenes') == SCENES
+    assert second.load('scripts') is None
+
+
+def test_checkpoints_of_other_content_are_discarded(tmp_path):
+    TaskCheckpoints(str(tmp_path / 'task'), 'old').save('transcribe', TRANSCRIPTION)
+    assert TaskCheckpoints(str(tmp_path / 'task'), 'new').load('transcribe') is None
+
+
+def test_retry_resumes_after_the_completed_stages(tmp_path, stages):
+    stages['fail'].add('scripts')
+    result = run_pipeline(TaskCheckpoints(str(tmp_path / 'task'), 'hash'))
+    assert result['structured_transcript']['sections'][0]['id'] == 'error'
+    assert stages['transcribe'] == stages['scripts'] == stages['scenes'] == 1
+
+    stages['fail'].clear()
+    tracker = RecordingTracker()
+    result = run_pipeline(TaskCheckpoints(str(tmp_path / 'task'), 'hash'), tracker)
+
+    # Only the failed stage runs again; its error placeholder was never checkpointed
+    assert (stages['transcribe'], stages['scripts'], stages['scenes']) == (1, 2, 1)
+    assert (result['structured_transcript'], result['spanish_script']) == SCRIPTS
+    assert result['scenes'] == SCENES
+    assert tracker.started == ['translate']
+    assert tracker.restored == ['transcribe:base', 'describe', 'prompts']
+
+
+def test_failed_scenes_are_not_checkpointed(tmp_path, stages):
+    stages['fail'].add('scenes')
+    run_pipeline(TaskCheckpoints(str(tmp_path / 'task'), 'hash'))
+    assert TaskCheckpoints(str(tmp_path / 'task'), 'hash').load('scenes') is None
+
+
+def test_media_dir_survives_unless_cleaned(tmp_path):
+    checkpoints = TaskCheckpoints(str(tmp_path / 'task'), 'hash')
+    media = checkpoints.media_dir()
+    open(os.path.join(media, 'audio.wav'), 'wb').close()
+    assert os.listdir(checkpoints.media_dir()) == ['audio.wav']
+    assert os.listdir(checkpoints.media_dir(clean=True)) == []
+
+
+def test_content_hash_depends_on_file_bytes(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'first')
+    first = source_content_hash(str(path))
+    path.write_bytes(b'second')
+    assert source_content_hash(str(path)) != first
+    assert source_content_hash('https://youtu.be/x', is_youtube=True) != first
+
+
+def test_abandoned_checkpoints_are_collected_after_the_ttl(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'checkpoints'), ttl_seconds=60)
+    store.for_task('old', 'hash')
+    store.for_task('new', 'hash')
+    then = time.time() - 120
+    os.utime(store.task_dir('old'), (then, then))
+
+    assert store.collect_garbage() == 1
+    assert sorted(name for name in os.listdir(store.root) if not name.startswith('.')) == ['new']
+    with pytest.raises(ValueError):
+        store.task_dir('..')
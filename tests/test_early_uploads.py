@@ -0,0 +1,90 @@
+import hashlib
+
+import pytest
+
+from app import routes
+from app.utils.scheduler import JOBS_KEY
+from app.utils.transcription import task_cancellation
+
+
+class Upload:
+    """
+    Stands in for a StreamingUpload of the given content, written in full.
+    """
+
+    def __init__(self, path, content):
+        path.write_bytes(content)
+        self.path = str(path)
+        self.digest = hashlib.sha256(content)
+        self.task_id = None
+        self.duplicate = False
+        self.options = None
+        self.dedup_key = None
+        self.closed = False
+
+    def head_digest(self):
+        return hashlib.sha256(b'moov').hexdigest()
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def scheduled(fake_redis, monkeypatch):
+    """
+    Replace scheduling with a record of (task ID, source, options) of every job submitted.
+    """
+    jobs = []
+
+    def submit(task, args, durations, tenant, kwargs=None, task_id=None):
+        fake_redis.hset(JOBS_KEY, task_id, '{}')
+        jobs.append((task_id, args[0], kwargs))
+        return task_id
+
+    monkeypatch.setattr(routes.scheduler, 'submit', submit)
+    monkeypatch.setattr(routes.scheduler, 'probe_duration', lambda *args, **kwargs: None)
+    return jobs
+
+
+def test_aborted_first_upload_does_not_take_an_attached_one_with_it(scheduled, tmp_path):
+    first, second = Upload(tmp_path / 'a.mp4', b'video'), Upload(tmp_path / 'b.mp4', b'video')
+    routes.submit_early(first, 'a', {})
+    routes.submit_early(second, 'b', {})
+    early_task = first.task_id
+    assert second.task_id == early_task and second.duplicate
+
+    routes.abort_upload(first)
+    assert task_cancellation(early_task) == 'Upload aborted before it completed'
+    assert routes.build_status(early_task, 'hash', {'progress': 100, 'status': 'failure',
+                                                    'error': 'Upload aborted before it completed'})['status'] == 'failure'
+
+    task_id, duplicate = routes.complete_upload(second, 'b', {})
+    assert not duplicate and task_id != early_task
+    assert scheduled[-1] == (task_id, second.path, {})
+    assert (tmp_path / 'b.mp4').exists()
+
+
+def test_superseded_early_task_keeps_running_for_attached_uploads(scheduled, tmp_path):
+    first, second = Upload(tmp_path / 'a.mp4', b'video'), Upload(tmp_path / 'b.mp4', b'video')
+    routes.submit_early(first, 'a', {})
+    routes.submit_early(second, 'b', {})
+    early_task = first.task_id
+
+    task_id, duplicate = routes.complete_upload(first, 'a', {'model_size': 'small'})
+    assert not duplicate and task_id != early_task
+    assert task_cancellation(early_task) is None
+    assert scheduled[-1] == (task_id, first.path, {'model_size': 'small'})
+
+    assert routes.complete_upload(second, 'b', {}) == (early_task, True)
+    assert not (tmp_path / 'b.mp4').exists()
+    assert (tmp_path / 'a.mp4').exists()
+
+
+def test_superseded_early_task_is_cancelled_when_nothing_is_attached(scheduled, tmp_path):
+    upload = Upload(tmp_path / 'a.mp4', b'video')
+    routes.submit_early(upload, 'a', {})
+    early_task = upload.task_id
+
+    task_id, duplicate = routes.complete_upload(upload, 'a', {'model_size': 'small'})
+    assert not duplicate and task_id != early_task
+    assert task_cancellation(early_task) == 'Superseded by the options sent after the video'
@@ -0,0 +1,102 @@
+import types
+from collections import OrderedDict
+
+import pytest
+
+from app.utils import model_registry, script_generation
+from app.utils.model_registry import LOAD_RETRY_SECONDS, ModelUnavailableError, get_model
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(model_registry, '_models', OrderedDict())
+    monkeypatch.setattr(model_registry, '_groups', {})
+    monkeypatch.setattr(model_registry, '_unavailable', {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_registry, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+class Loader:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'model'
+
+
+def test_models_are_loaded_once():
+    load = Loader()
+    assert get_model('m', load) == get_model('m', load) == 'model'
+    assert load.calls == 1
+
+
+def test_failed_loads_are_retried_after_a_while(clock):
+    load = Loader(OSError('connection reset'))
+    with pytest.raises(ModelUnavailableError) as error:
+        get_model('m', load)
+    assert not error.value.missing
+    with pytest.raises(ModelUnavailableError):
+        get_model('m', load)
+    assert load.calls == 1
+
+    clock[0] += LOAD_RETRY_SECONDS
+    assert get_model('m', load) == 'model'
+
+
+def test_missing_models_are_not_retried(clock):
+    hub_utils = pytest.importorskip('huggingface_hub.utils')
+    # Raised by the hub for an unknown repository; its constructor wants an HTTP response
+    missing = hub_utils.RepositoryNotFoundError.__new__(hub_utils.RepositoryNotFoundError)
+    load = Loader(OSError('not a valid model identifier'))
+    load.errors[0].__cause__ = missing
+    with pytest.raises(ModelUnavailableError) as error:
+        get_model('m', load)
+    assert error.value.missing
+
+    clock[0] += LOAD_RETRY_SECONDS * 10
+    with pytest.raises(ModelUnavailableError):
+        get_model('m', load)
+    assert load.calls == 1
+
+
+def test_only_the_most_recently_used_models_of_a_group_are_kept():
+    loads = []
+
+    def loader(name):
+        def load():
+            loads.append(name)
+            return name
+        return load
+
+    get_model('small', loader('small'), group='asr', capacity=2)
+    get_model('base', loader('base'), group='asr', capacity=2)
+    get_model('small', loader('small'), group='asr', capacity=2)
+    get_model('tiny', loader('tiny'), group='asr', capacity=2)
+    get_model('marian', loader('marian'))
+    assert list(model_registry._models) == ['small', 'tiny', 'marian']
+
+    # The unloaded model is loaded again when it is next needed
+    assert get_model('base', loader('base'), group='asr', capacity=2) == 'base'
+    assert loads == ['small', 'base', 'tiny', 'marian', 'base']
+    assert 'marian' in model_registry._models
+
+
+@pytest.mark.parametrize('missing, route', [(True, 'whisper'), (False, 'marian')])
+def test_only_a_missing_model_routes_through_whisper(monkeypatch, missing, route):
+    def unavailable(model_name, device):
+        raise ModelUnavailableError('no model', missing)
+
+    monkeypatch.setattr(script_generation, 'get_translation_model', unavailable)
+    monkeypatch.setattr(script_generation, 'default_device', lambda: 'cpu')
+    assert script_generation.translation_route('de') == route
+    assert script_generation.translation_route('en') == 'marian'
+    assert script_generation.translation_route('es') == 'skip'
@@ -0,0 +1,90 @@
+import types
+
+import pytest
+
+from app.utils import progress
+from app.utils.progress import COST_SMOOTHING, DEFAULT_STAGE_COSTS, STAGE_COSTS_KEY, ProgressTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(progress, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def make_tracker(stages, reports=None):
+    reports = [] if reports is None else reports
+    return ProgressTracker('task', stages, min_interval=0,
+                           reporter=lambda task_id, value, status_msg, eta_seconds: reports.append(value))
+
+
+def stored_cost(client, stage):
+    value = client.hget(STAGE_COSTS_KEY, stage)
+    return None if value is None else float(value)
+
+
+def test_finished_stage_moves_the_average_towards_the_observed_cost(fake_redis, clock):
+    tracker = make_tracker([('translate', 10)])
+    tracker.start_stage('translate')
+    clock[0] += 20.0
+    tracker.finish_stage()
+
+    expected = (1 - COST_SMOOTHING) * DEFAULT_STAGE_COSTS['translate'] + COST_SMOOTHING * 2.0
+    assert tracker.costs['translate'] == pytest.approx(expected)
+    assert stored_cost(fake_redis, 'translate') == pytest.approx(expected)
+
+
+def test_average_converges_over_runs(fake_redis, clock):
+    for _ in range(40):
+        tracker = make_tracker([('describe', 5)])
+        tracker.start_stage('describe')
+        clock[0] += 5.0
+        tracker.finish_stage()
+    assert stored_cost(fake_redis, 'describe') == pytest.approx(1.0, abs=0.01)
+
+
+def test_learned_costs_are_loaded_per_stage_key(fake_redis):
+    fake_redis.hset(STAGE_COSTS_KEY, 'transcribe:small', 0.9)
+    tracker = make_tracker([('transcribe:small', 60), ('transcribe:base', 60)])
+    assert tracker.costs['transcribe:small'] == pytest.approx(0.9)
+    # Variants without a learned cost start from their base stage's default
+    assert tracker.costs['transcribe:base'] == DEFAULT_STAGE_COSTS['transcribe']
+
+
+def test_restored_stage_completes_without_learning(fake_redis, clock):
+    reports = []
+    tracker = make_tracker([('transcribe', 100), ('translate', 10)], reports)
+    tracker.restore_stage('transcribe')
+
+    assert tracker.done['transcribe'] == 100
+    assert stored_cost(fake_redis, 'transcribe') is None
+    assert reports[-1] == int(100 * 100 * 0.5 / (100 * 0.5 + 10 * 4.0))
+
+
+def test_stage_started_without_learning_records_no_cost(fake_redis, clock):
+    tracker = make_tracker([('describe', 10)])
+    tracker.start_stage('describe', learn=False)
+    clock[0] += 0.1
+    tracker.finish_stage()
+    assert stored_cost(fake_redis, 'describe') is None
+
+
+def test_progress_is_weighted_by_cost_and_never_goes_backwards(fake_redis, clock):
+    tracker = make_tracker([('download', 1), ('transcribe', 100)])
+    tracker.start_stage('download')
+    clock[0] += DEFAULT_STAGE_COSTS['download']
+    tracker.start_stage('transcribe')
+    assert tracker.progress() == int(100 * 20.0 / (20.0 + 100 * 0.5))
+
+    tracker.update(50)
+    reached = tracker.progress()
+    tracker.set_total('transcribe', 1000)
+    assert tracker.progress() == reached
+
+
+def test_progress_stays_below_100_until_the_task_completes(fake_redis, clock):
+    tracker = make_tracker([('prompts', 3)])
+    tracker.start_stage('prompts')
+    tracker.finish_stage()
+    assert tracker.progress() == 99
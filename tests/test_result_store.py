@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import string
+import time
+
+import pytest
+
+from app.utils import result_store
+from app.utils.result_store import (COMPRESS_MIN_BYTES, REF_MARKER, RESULT_TTL_SECONDS, TASK_KEY_PREFIX,
+                                    ObjectStore, decode_value, encode_value, read_task_fields, sweep,
+                                    write_task_fields)
+
+SCENES = [{'index': i, 'timestamp': i * 5.0, 'timestamp_formatted': f'00:{i * 5:02d}',
+           'description': f'scene {i}'} for i in range(5)]
+
+
+def noise(length, seed=0):
+    # Random letters barely compress, so long strings end up spilled
+    rng = random.Random(seed)
+    return ''.join(rng.choice(string.ascii_letters) for _ in range(length))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ObjectStore(str(tmp_path / 'objects'))
+    monkeypatch.setattr(result_store, '_object_store', store)
+    return store
+
+
+def age(store, digest, seconds):
+    path = store.path(digest)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_values_are_kept_compressed_or_spilled_by_size(store):
+    small, medium, large = 'short transcript', 'word ' * 2000, noise(200_000)
+
+    assert encode_value(small) == small.encode('utf-8')
+    compressed = encode_value(medium)
+    assert compressed.startswith(b'\x00') and not compressed.startswith(REF_MARKER)
+    assert len(compressed) < len(medium)
+    spilled = encode_value(large)
+    assert spilled.startswith(REF_MARKER)
+    assert store.usage()['objects'] == 1
+
+    for value, raw in ((small, encode_value(small)), (medium, compressed), (large, spilled)):
+        assert decode_value(raw).decode('utf-8') == value
+
+
+def test_identical_payloads_are_stored_once(store):
+    payload = noise(200_000)
+    assert encode_value(payload) == encode_value(payload)
+    assert store.usage()['objects'] == 1
+
+
+def test_task_fields_round_trip_with_a_ttl(fake_redis, store):
+    transcript = noise(150_000, seed=1)
+    write_task_fields(fake_redis, 'task', {'status': 'success', 'progress': 100,
+                                          'transcript': transcript, 'scenes': SCENES})
+
+    fields = read_task_fields(fake_redis, 'task')
+    assert fields['transcript'] == transcript
+    assert fields['scenes'] == SCENES
+    assert fields['status'] == 'success'
+    assert 0 < fake_redis.ttl(f'{TASK_KEY_PREFIX}task') <= RESULT_TTL_SECONDS
+
+
+def test_sweep_compacts_legacy_hashes_and_sets_missing_ttls(fake_redis, store):
+    key = f'{TASK_KEY_PREFIX}legacy'
+    transcript = 'legacy transcript ' * 200
+    fake_redis.hset(key, mapping={'transcript': transcript, 'result': transcript,
+                                  'scenes': json.dumps(SCENES), 'status': 'success'})
+    assert len(transcript) >= COMPRESS_MIN_BYTES
+
+    stats = sweep(fake_redis, store)
+
+    assert stats['scanned'] == 1 and stats['ttl_set'] == 1 and stats['compacted'] == 2
+    assert fake_redis.ttl(key) > 0
+    assert not fake_redis.hexists(key, 'result')
+    assert fake_redis.hget(key, 'transcript').startswith(b'\x00')
+    fields = read_task_fields(fake_redis, 'legacy')
+    assert fields['transcript'] == transcript
+    assert fields['scenes'] == SCENES
+
+
+def test_sweep_removes_only_old_unreferenced_objects(fake_redis, store):
+    write_task_fields(fake_redis, 'live', {'transcript': noise(150_000, seed=2)})
+    live = result_store.referenced_digest(fake_redis.hget(f'{TASK_KEY_PREFIX}live', 'transcript'))
+    orphan = result_store.referenced_digest(encode_value(noise(150_000, seed=3)))
+    young = result_store.referenced_digest(encode_value(noise(150_000, seed=4)))
+    for digest in (live, orphan):
+        age(store, digest, 2 * result_store.GC_GRACE_SECONDS)
+
+    assert sweep(fake_redis, store)['objects_removed'] == 1
+    assert not os.path.exists(store.path(orphan))
+    assert os.path.exists(store.path(live)) and os.path.exists(store.path(young))
+
+
+def test_sweep_runs_at_most_once_per_interval(fake_redis, store):
+    assert result_store.maybe_sweep(fake_redis) is not None
+    assert result_store.maybe_sweep(fake_redis) is None
+
+
+def test_object_digests_cannot_escape_the_store(store):
+    with pytest.raises(ValueError):
+        store.path('../' + '0' * 61)
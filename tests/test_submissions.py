@@ -0,0 +1,132 @@
+import types
+
+import fakeredis
+import pytest
+import redis
+
+from app.utils import submissions
+from app.utils.result_store import TASK_KEY_PREFIX
+from app.utils.scheduler import JOBS_KEY
+from app.utils.submissions import (CLAIM_GRACE_SECONDS, DEDUP_KEY_PREFIX, DEDUP_TTL_SECONDS, check_rate_limit,
+                                   single_flight, submission_key, submission_report, youtube_key)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(submissions, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+class Scheduler:
+    """
+    Stands in for scheduler.submit: records the task IDs it schedules.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self.scheduled = []
+
+    def __call__(self, task_id):
+        self.scheduled.append(task_id)
+        if self.client is not None:
+            self.client.hset(JOBS_KEY, task_id, '{}')
+        return task_id
+
+
+def test_identical_submissions_share_one_task(fake_redis):
+    schedule = Scheduler(fake_redis)
+    task_id, duplicate = single_flight('upload:abc', schedule)
+    assert not duplicate
+
+    assert single_flight('upload:abc', schedule) == (task_id, True)
+    assert schedule.scheduled == [task_id]
+    assert submission_report()['duplicates'] == 1
+
+
+def test_requested_model_makes_a_separate_job(fake_redis):
+    schedule = Scheduler(fake_redis)
+    first, _ = single_flight(submission_key('upload', 'abc', {'slo_seconds': 60}), schedule)
+    second, duplicate = single_flight(submission_key('upload', 'abc', {'model_size': 'small'}), schedule)
+    assert not duplicate and first != second
+    assert submission_key('upload', 'abc', {'slo_seconds': 60}) == submission_key('upload', 'abc')
+
+
+def test_finished_tasks_are_reused_until_they_fail(fake_redis):
+    schedule = Scheduler()
+    task_id, _ = single_flight('youtube:x', schedule)
+    fake_redis.hset(f'{TASK_KEY_PREFIX}{task_id}', mapping={'status': 'success'})
+    assert single_flight('youtube:x', schedule) == (task_id, True)
+
+    fake_redis.hset(f'{TASK_KEY_PREFIX}{task_id}', mapping={'status': 'failure'})
+    retried, duplicate = single_flight('youtube:x', schedule)
+    assert not duplicate and retried != task_id
+    assert fake_redis.get(f'{DEDUP_KEY_PREFIX}youtube:x').decode('utf-8') == retried
+
+
+def test_fresh_claims_count_as_in_flight_but_stale_ones_are_replaced(fake_redis):
+    key = f'{DEDUP_KEY_PREFIX}upload:abc'
+    fake_redis.set(key, 'claimed', ex=DEDUP_TTL_SECONDS)
+    assert single_flight('upload:abc', Scheduler()) == ('claimed', True)
+
+    # Never scheduled, and claimed longer ago than the grace period
+    fake_redis.set(key, 'claimed', ex=DEDUP_TTL_SECONDS - CLAIM_GRACE_SECONDS - 10)
+    task_id, duplicate = single_flight('upload:abc', Scheduler())
+    assert not duplicate and task_id != 'claimed'
+
+
+def test_failed_submit_releases_the_claim(fake_redis):
+    def failing(task_id):
+        raise RuntimeError('broker down')
+
+    with pytest.raises(RuntimeError):
+        single_flight('upload:abc', failing)
+    assert not fake_redis.exists(f'{DEDUP_KEY_PREFIX}upload:abc')
+    assert not single_flight('upload:abc', Scheduler())[1]
+
+
+def test_submissions_still_run_without_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    monkeypatch.setattr(redis.Redis, 'from_url',
+                        classmethod(lambda cls, *args, **kwargs: fakeredis.FakeRedis(server=server)))
+    schedule = Scheduler()
+    task_id, duplicate = single_flight('upload:abc', schedule)
+    assert not duplicate and schedule.scheduled == [task_id]
+    assert check_rate_limit('client') is None
+
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ',
+])
+def test_youtube_links_key_on_the_video_id(url):
+    assert youtube_key(url) == 'youtube:dQw4w9WgXcQ'
+
+
+def test_other_urls_key_on_the_exact_url():
+    assert youtube_key('https://example.com/a.mp4') == youtube_key(' https://example.com/a.mp4 ')
+    assert youtube_key('https://example.com/a.mp4') != youtube_key('https://example.com/b.mp4')
+
+
+def test_rate_limit_uses_a_sliding_window_per_client(fake_redis, monkeypatch, clock):
+    monkeypatch.setattr(submissions, 'RATE_LIMIT', 3)
+    assert [check_rate_limit('a') for _ in range(3)] == [None, None, None]
+
+    clock[0] += 10
+    assert check_rate_limit('a') == submissions.RATE_WINDOW_SECONDS - 10
+    # Rejected submissions do not extend the wait
+    assert check_rate_limit('a') == submissions.RATE_WINDOW_SECONDS - 10
+    assert fake_redis.zcard(f'{submissions.RATE_KEY_PREFIX}a') == 3
+    assert check_rate_limit('b') is None
+    assert submission_report()['rate_limited'] == 2
+
+
+def test_window_slides(fake_redis, monkeypatch, clock):
+    monkeypatch.setattr(submissions, 'RATE_LIMIT', 1)
+    assert check_rate_limit('a') is None
+    assert check_rate_limit('a') is not None
+    clock[0] += submissions.RATE_WINDOW_SECONDS + 1
+    assert check_rate_limit('a') is None
@@ -0,0 +1,91 @@
+import os
+import types
+
+import pytest
+
+from app.utils.transcriber import FasterWhisperTranscriber, WhisperTranscriber, as_transcriber, backend_name
+from benchmarks.bench_asr_backends import PROJECT_ROOT, find_fixtures, word_error_rate
+
+SEGMENTS = [(0.0, 2.5, ' Welcome to the project.'), (2.5, 4.0, ' Thank you.')]
+
+
+class WhisperModel:
+    """
+    Stands in for an openai-whisper model: returns SEGMENTS and records its call.
+    """
+
+    def transcribe(self, audio_path, task='transcribe', **options):
+        self.call = (audio_path, task, options)
+        return {'text': ''.join(text for _, _, text in SEGMENTS), 'language': 'en',
+                'segments': [{'id': i, 'start': start, 'end': end, 'text': text, 'tokens': []}
+                             for i, (start, end, text) in enumerate(SEGMENTS)]}
+
+
+class FasterWhisperModel:
+    """
+    Stands in for a faster-whisper model: returns SEGMENTS lazily and records its call.
+    """
+
+    def transcribe(self, audio_path, task='transcribe', **options):
+        self.call = (audio_path, task, options)
+        segments = (types.SimpleNamespace(start=start, end=end, text=text, words=None) for start, end, text in SEGMENTS)
+        return segments, types.SimpleNamespace(language='en', language_probability=0.99)
+
+
+def test_backends_return_the_same_result():
+    whisper = WhisperTranscriber(WhisperModel(), 'base').transcribe('a.wav')
+    faster = FasterWhisperTranscriber(FasterWhisperModel(), 'base').transcribe('a.wav')
+    assert whisper == faster == {
+        'text': ' Welcome to the project. Thank you.',
+        'language': 'en',
+        'segments': [{'start': 0.0, 'end': 2.5, 'text': ' Welcome to the project.'},
+                     {'start': 2.5, 'end': 4.0, 'text': ' Thank you.'}],
+    }
+
+
+def test_whisper_passes_options_through():
+    model = WhisperModel()
+    options = {'beam_size': None, 'condition_on_previous_text': False, 'fp16': False}
+    WhisperTranscriber(model, 'base').transcribe('a.wav', task='translate', options=options)
+    assert model.call == ('a.wav', 'translate', options)
+
+
+@pytest.mark.parametrize('options, mapped', [
+    (None, {'beam_size': 1}),
+    ({'beam_size': None, 'fp16': True, 'condition_on_previous_text': False},
+     {'beam_size': 1, 'condition_on_previous_text': False}),
+    ({'beam_size': 5, 'fp16': False}, {'beam_size': 5}),
+])
+def test_faster_whisper_maps_options(monkeypatch, options, mapped):
+    monkeypatch.setattr('app.utils.transcriber.FASTER_WHISPER_VAD', True)
+    model = FasterWhisperModel()
+    FasterWhisperTranscriber(model, 'base').transcribe('a.wav', options=options)
+    assert model.call == ('a.wav', 'transcribe', dict(mapped, vad_filter=True))
+    # The caller's options are left as they were
+    assert options is None or 'fp16' in options
+
+
+def test_faster_whisper_reports_progress_as_segments_decode():
+    decoded = []
+    FasterWhisperTranscriber(FasterWhisperModel(), 'base').transcribe('a.wav', progress_callback=decoded.append)
+    assert decoded == [2.5, 4.0]
+
+
+def test_bare_models_and_backend_names():
+    transcriber = as_transcriber(WhisperModel(), 'small')
+    assert isinstance(transcriber, WhisperTranscriber) and transcriber.model_size == 'small'
+    assert as_transcriber(transcriber) is transcriber
+    assert backend_name('faster-whisper') == 'faster-whisper'
+    with pytest.raises(ValueError):
+        backend_name('wav2vec')
+
+
+def test_fixture_speech_has_reference_transcripts(tmp_path):
+    fixtures = find_fixtures(os.path.join(PROJECT_ROOT, 'benchmarks', 'fixtures', 'asr'), str(tmp_path), 5)
+    assert fixtures and all(reference and reference.split() for _, reference in fixtures)
+
+
+def test_word_error_rate():
+    assert word_error_rate('The cat sat.', 'the cat sat') == 0.0
+    assert word_error_rate('the cat sat on the mat', 'the cat sat on a mat') == pytest.approx(1 / 6)
+    assert word_error_rate('', '') == 0.0
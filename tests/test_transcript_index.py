@@ -0,0 +1,68 @@
+import pytest
+
+from app.utils.transcript_index import TranscriptIndex, to_fts_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TranscriptIndex(str(tmp_path / 'transcripts.sqlite3'))
+    index.index_transcript('cooking', [
+        {'start': 0.0, 'end': 4.0, 'text': 'Today we bake sourdough bread at home.'},
+        {'start': 4.0, 'end': 9.0, 'text': 'The bread needs a long, slow rise.'},
+        {'start': 9.0, 'end': 12.0, 'text': '   '},
+    ], 'en')
+    index.index_transcript('travel', [
+        {'start': 0.0, 'end': 5.0, 'text': 'We arrived in Málaga by train.'},
+        {'start': 5.0, 'end': 8.0, 'text': 'Breakfast was bread with tomato.'},
+    ], 'en')
+    return index
+
+
+def test_user_input_is_quoted_for_fts5():
+    assert to_fts_query('bread "slow rise"') == '"bread" "slow rise"'
+    assert to_fts_query('NEAR( OR "') == '"NEAR(" "OR"'
+    assert to_fts_query('   ') == ''
+
+
+def test_search_returns_segments_with_timestamps_and_highlights(index):
+    results = index.search('sourdough')
+    assert len(results) == 1
+    assert results[0]['task_id'] == 'cooking'
+    assert (results[0]['start'], results[0]['end']) == (0.0, 4.0)
+    assert '<mark>sourdough</mark>' in results[0]['snippet']
+
+
+def test_every_word_must_match_and_phrases_stay_phrases(index):
+    assert {r['task_id'] for r in index.search('bread')} == {'cooking', 'travel'}
+    assert [r['task_id'] for r in index.search('bread tomato')] == ['travel']
+    assert [r['start'] for r in index.search('"slow rise"')] == [4.0]
+    assert index.search('"rise slow"') == []
+
+
+def test_matching_ignores_case_and_accents(index):
+    assert [r['task_id'] for r in index.search('MALAGA')] == ['travel']
+
+
+def test_search_pages_by_offset(index):
+    first, second = index.search('bread', limit=1), index.search('bread', limit=1, offset=1)
+    assert len(first) == len(second) == 1
+    assert first[0] != second[0]
+
+
+def test_search_videos_groups_hits_per_task(index):
+    videos = {video['task_id']: video for video in index.search_videos('bread')}
+    assert videos['cooking']['hits'] == 2
+    assert videos['travel']['hits'] == 1
+    assert videos['cooking']['language'] == 'en'
+
+
+def test_reindexing_a_task_replaces_its_segments(index):
+    assert index.index_transcript('cooking', [{'start': 1.0, 'end': 2.0, 'text': 'Pasta night.'}]) == 1
+    assert index.search('sourdough') == []
+    assert [r['task_id'] for r in index.search('pasta')] == ['cooking']
+
+
+def test_deleted_tasks_are_not_found(index):
+    index.delete('travel')
+    assert index.search('Málaga') == []
+    assert {r['task_id'] for r in index.search('bread')} == {'cooking'}
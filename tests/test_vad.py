@@ -0,0 +1,119 @@
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils import vad
+from app.utils.vad import GAP_SECONDS, PAD_SECONDS, SAMPLE_RATE, SpeechMap
+
+
+def floor(seconds, seed=0):
+    # Quiet background noise, as any real recording has
+    return np.random.default_rng(seed).normal(0, 30, int(seconds * SAMPLE_RATE))
+
+
+def voiced(seconds, f0=140.0):
+    """
+    Speech-like sound: a harmonic series with a 4 Hz syllable envelope.
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    harmonics = sum(0.2 / k * np.sin(2 * np.pi * f0 * k * t) for k in range(1, 12))
+    return harmonics * 32767 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+
+
+def noise(seconds, amplitude=0.3, seed=1):
+    return np.random.default_rng(seed).normal(0, amplitude * 32767, int(seconds * SAMPLE_RATE))
+
+
+def pcm(*parts):
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+def test_silence_has_no_speech():
+    assert vad.speech_regions(pcm(floor(5))) == []
+
+
+def test_voiced_sound_is_found_with_padding():
+    regions = vad.speech_regions(pcm(floor(2), voiced(3), floor(3)))
+    assert len(regions) == 1
+    start, end = regions[0]
+    assert start == pytest.approx(2 - PAD_SECONDS, abs=0.1)
+    assert end == pytest.approx(5 + PAD_SECONDS, abs=0.1)
+
+
+def test_broadband_noise_is_not_speech():
+    assert vad.speech_regions(pcm(floor(5), noise(20), floor(5))) == []
+
+
+def test_clicks_are_not_speech():
+    assert vad.speech_regions(pcm(floor(2), voiced(0.1), floor(3))) == []
+
+
+def test_short_pauses_stay_inside_a_region():
+    regions = vad.speech_regions(pcm(floor(2), voiced(1), floor(0.5), voiced(1), floor(3)))
+    assert len(regions) == 1
+
+
+def test_long_pauses_split_regions():
+    regions = vad.speech_regions(pcm(floor(2), voiced(1), floor(4), voiced(1), floor(3)))
+    assert len(regions) == 2
+
+
+def test_tonal_music_passes_as_speech():
+    # A known limitation: the gate tells harmonic sound from noise, not speech from music
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    chord = sum(0.15 * np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0)) * 32767
+    assert len(vad.speech_regions(pcm(floor(2), chord, floor(3)))) == 1
+
+
+def test_streamed_features_match_the_in_memory_ones(tmp_path):
+    samples = pcm(floor(2), voiced(3), floor(3))
+    path = write_wav(tmp_path / 'audio.wav', samples)
+    energy, flatness = vad.frame_features(samples)
+    # Blocks that do not divide into whole frames carry the partial frame over
+    streamed_energy, streamed_flatness, total = vad.stream_features(vad.iter_pcm(path, block_samples=1234))
+    assert total == len(samples)
+    np.testing.assert_allclose(streamed_energy, energy, rtol=1e-5)
+    np.testing.assert_allclose(streamed_flatness, flatness, rtol=1e-5)
+    assert vad.detect_speech(path) == (vad.speech_regions(samples), len(samples) / SAMPLE_RATE)
+
+
+def test_trimmed_audio_holds_only_the_speech_regions(tmp_path, monkeypatch):
+    monkeypatch.setattr(vad, 'PCM_BLOCK_SAMPLES', 7777)
+    samples = pcm(floor(3), voiced(2), floor(4), voiced(3), floor(5))
+    source = write_wav(tmp_path / 'audio.wav', samples)
+    output = str(tmp_path / 'speech.wav')
+
+    speech_map = vad.trim_non_speech(source, output)
+
+    assert len(speech_map.regions) == 2
+    gap = np.zeros(int(GAP_SECONDS * SAMPLE_RATE), dtype=np.int16)
+    (s1, e1), (s2, e2) = [(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)) for start, end in speech_map.regions]
+    np.testing.assert_array_equal(vad.read_pcm(output), np.concatenate([samples[s1:e1], gap, samples[s2:e2]]))
+
+
+def test_mostly_speech_is_transcribed_as_is(tmp_path):
+    source = write_wav(tmp_path / 'audio.wav', pcm(floor(0.2), voiced(5), floor(0.2)))
+    assert vad.trim_non_speech(source, str(tmp_path / 'speech.wav')) is None
+
+
+def test_speech_map_moves_timestamps_back_to_the_original_timeline():
+    speech_map = SpeechMap([(10.0, 12.0), (20.0, 25.0)], duration=30.0)
+    assert speech_map.trimmed_starts == [0.0, 2.0 + GAP_SECONDS]
+    assert speech_map.to_original(1.0) == 10.0 + 1.0
+    assert speech_map.to_original(2.0 + GAP_SECONDS + 1.0) == pytest.approx(21.0)
+    # Inside the inserted gap: the end of the region before it
+    assert speech_map.to_original(2.0 + GAP_SECONDS / 2) == 12.0
+
+    transcription = {'segments': [{'start': 0.5, 'end': 3.0}]}
+    speech_map.remap(transcription)
+    assert transcription['segments'][0] == {'start': 10.5, 'end': pytest.approx(20.8)}